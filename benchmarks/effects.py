@@ -0,0 +1,79 @@
+"""
+Compares per-frame throughput of moviepy's effects with their OpenCV replacements.
+
+    python -m benchmarks.effects --frames 30
+
+Frames are decoded once from the synthetic fixtures, then every implementation processes
+the same frames in-process. Reports frames per second and the mean absolute pixel
+difference from moviepy's output. Under NumPy 2, vfx.Painting computes its line darkening
+(255 * edges) in uint8, which wraps, so the OpenCV painting's lines differ from it by design.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+from .fixtures import FIXTURES, make_video
+
+def _implementations():
+    from moviepy import vfx
+    from videoEditor_mcp import effects
+    painting = vfx.Painting()
+    return {
+        "painting": {
+            "moviepy": lambda frame: painting.to_painting(frame, painting.saturation, painting.black),
+            "opencv": lambda frame: effects.paint(frame),
+            "opencv_single_thread": lambda frame: effects.paint(frame, threads=1),
+            "opencv_edges_half": lambda frame: effects.paint(frame, edge_scale=0.5),
+        },
+    }
+
+def _frames(fixture, workdir: str, count: int) -> list:
+    from moviepy import VideoFileClip
+    path = make_video(fixture, workdir)
+    with VideoFileClip(path, audio=False) as clip:
+        return [clip.get_frame(i * clip.duration / count) for i in range(count)]
+
+def run_benchmarks(workdir: str, fixtures: list, count: int) -> dict:
+    results = {}
+    for fixture in fixtures:
+        frames = _frames(fixture, workdir, count)
+        for effect, variants in _implementations().items():
+            baseline = None
+            for variant, apply in variants.items():
+                apply(frames[0])  # warm-up (thread pool, lazy imports)
+                started = time.perf_counter()
+                outputs = [apply(frame) for frame in frames]
+                wall = time.perf_counter() - started
+                if baseline is None:
+                    baseline = outputs
+                diff = sum(abs(o.astype(int) - b).mean() for o, b in zip(outputs, baseline)) / len(outputs)
+                key = f"{effect}:{variant}@{fixture.name}"
+                results[key] = {"fps": round(len(frames) / wall, 2), "mean_abs_diff": round(float(diff), 3)}
+                print(f"{key:55s} {results[key]['fps']:8.1f} fps  diff {results[key]['mean_abs_diff']}", file=sys.stderr)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=30, help="Frames per fixture (default: 30)")
+    parser.add_argument("--fixtures", help="Comma-separated fixture names (default: all)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--workdir", help="Directory for fixtures (default: a temp dir)")
+    args = parser.parse_args(argv)
+
+    fixtures = FIXTURES
+    if args.fixtures:
+        names = args.fixtures.split(",")
+        fixtures = [f for f in FIXTURES if f.name in names]
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="videoeditor_bench_"))
+    os.makedirs(workdir, exist_ok=True)
+    results = run_benchmarks(workdir, fixtures, args.frames)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"cpus": os.cpu_count(), "results": results}, f, indent=2, sort_keys=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+import os
+import subprocess
+from dataclasses import dataclass
+from typing import Optional
+
+@dataclass(frozen=True)
+class MediaFixture:
+    name: str
+    width: int
+    height: int
+    duration: float
+    fps: int = 24
+    audio_channels: Optional[int] = 2
+
+    @property
+    def filename(self) -> str:
+        return f"{self.name}.mp4"
+
+# Small enough for CI, large enough to show the cost of resolution, length and audio
+FIXTURES = [
+    MediaFixture("360p_2s_stereo", 640, 360, 2.0),
+    MediaFixture("720p_5s_mono", 1280, 720, 5.0, fps=30, audio_channels=1),
+    MediaFixture("1080p_5s_silent", 1920, 1080, 5.0, fps=30, audio_channels=None),
+]
+
+def ffmpeg_binary() -> str:
+    from moviepy.config import FFMPEG_BINARY
+    return FFMPEG_BINARY
+
+def make_video(fixture: MediaFixture, directory: str) -> str:
+    """
+    Renders a deterministic test pattern (and sine tone) with ffmpeg's lavfi sources.
+    Existing files are reused, so repeated runs compare identical inputs.
+    """
+    path = os.path.join(directory, fixture.filename)
+    if os.path.exists(path):
+        return path
+    cmd = [
+        ffmpeg_binary(), "-y", "-loglevel", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={fixture.width}x{fixture.height}:rate={fixture.fps}:duration={fixture.duration}",
+    ]
+    if fixture.audio_channels:
+        layout = "stereo" if fixture.audio_channels == 2 else "mono"
+        cmd += ["-f", "lavfi", "-i", f"sine=frequency=440:sample_rate=44100:duration={fixture.duration}",
+                "-af", f"aformat=channel_layouts={layout}", "-c:a", "aac"]
+    cmd += ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", "-g", str(fixture.fps), path]
+    subprocess.run(cmd, check=True)
+    return path
+
+def make_image(directory: str, size: tuple[int, int] = (200, 100)) -> str:
+    path = os.path.join(directory, "overlay.png")
+    if not os.path.exists(path):
+        from PIL import Image
+        Image.new("RGBA", size, (255, 128, 0, 200)).save(path)
+    return path
@@ -0,0 +1,194 @@
+"""
+Benchmarks every video_utils operation against synthetic fixtures.
+
+    python -m benchmarks.operations --output baseline.json
+    python -m benchmarks.operations --compare baseline.json --threshold 0.15
+
+Each measurement runs in a fresh process so peak RSS is attributable to a single operation.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+from .fixtures import FIXTURES, make_image, make_video
+
+# operation name -> (video_utils function, kwargs builder(video, image, fixture))
+OPERATIONS = {
+    "generate_simple_video": ("generate_simple_video", lambda v, img, f: {"text": "Benchmark", "duration": f.duration, "output_file": os.path.join(os.path.dirname(v), "generated.mp4")}),
+    "cut_video": ("process_cut_video", lambda v, img, f: {"video_path": v, "start_time": 0, "end_time": f.duration / 2}),
+    "concatenate_videos": ("process_concatenate_videos", lambda v, img, f: {"video_paths": [v, v]}),
+    "resize_video": ("process_resize_video", lambda v, img, f: {"video_path": v, "scale": 0.5}),
+    "speed_video": ("process_speed_video", lambda v, img, f: {"video_path": v, "factor": 2.0}),
+    "volume_video": ("process_volume_video", lambda v, img, f: {"video_path": v, "factor": 0.5}),
+    "extract_audio": ("process_extract_audio", lambda v, img, f: {"video_path": v}),
+    "composite_stack": ("process_composite_videos", lambda v, img, f: {"video_paths": [v, v], "method": "stack"}),
+    "composite_grid": ("process_composite_videos", lambda v, img, f: {"video_paths": [v] * 4, "method": "grid", "rows": 2, "cols": 2}),
+    "text_overlay": ("process_text_overlay", lambda v, img, f: {"video_path": v, "text": "Benchmark"}),
+    "timed_text_overlay": ("process_text_overlay", lambda v, img, f: {"video_path": v, "text": "Benchmark", "start_time": f.duration / 2, "duration": 0.5}),
+    "image_overlay": ("process_image_overlay", lambda v, img, f: {"video_path": v, "image_path": img}),
+    "color_effect": ("process_color_effect", lambda v, img, f: {"video_path": v, "effect_type": "contrast", "factor": 1.2}),
+    "mirror_video": ("process_mirror_video", lambda v, img, f: {"video_path": v, "axis": "x"}),
+    "rotate_video": ("process_rotate_video", lambda v, img, f: {"video_path": v, "angle": 90}),
+    "crop_video": ("process_crop_video", lambda v, img, f: {"video_path": v, "x1": 0, "y1": 0, "width": f.width // 2, "height": f.height // 2}),
+    "margin_video": ("process_margin_video", lambda v, img, f: {"video_path": v, "margin": 10}),
+    "fade_video": ("process_fade_video", lambda v, img, f: {"video_path": v, "fade_type": "in", "duration": 1.0}),
+    "loop_video": ("process_loop_video", lambda v, img, f: {"video_path": v, "n": 2}),
+    "time_effect_video": ("process_time_effect_video", lambda v, img, f: {"video_path": v, "effect_type": "reverse"}),
+    "freeze_video": ("process_time_effect_video", lambda v, img, f: {"video_path": v, "effect_type": "freeze", "duration": 1.0}),
+    "audio_fade_video": ("process_audio_fade_video", lambda v, img, f: {"video_path": v, "fade_type": "in", "duration": 1.0}),
+    "audio_loop_video": ("process_audio_loop_video", lambda v, img, f: {"video_path": v, "n": 2}),
+    "accel_decel_video": ("process_accel_decel_video", lambda v, img, f: {"video_path": v, "new_duration": f.duration * 0.75}),
+    "blink_video": ("process_blink_video", lambda v, img, f: {"video_path": v, "duration_on": 0.5, "duration_off": 0.5}),
+    "gamma_correction_video": ("process_gamma_correction_video", lambda v, img, f: {"video_path": v, "gamma": 1.5}),
+    "painting_video": ("process_painting_video", lambda v, img, f: {"video_path": v}),
+    "write_gif": ("process_write_gif", lambda v, img, f: {"video_path": v, "fps": 5}),
+    "save_frame": ("process_save_frame", lambda v, img, f: {"video_path": v, "t": f.duration / 2}),
+    "detect_scenes": ("process_detect_scenes", lambda v, img, f: {"video_path": v}),
+    "audio_delay_video": ("process_audio_delay_video", lambda v, img, f: {"video_path": v, "offset": 0.5}),
+    "audio_normalize_video": ("process_audio_normalize_video", lambda v, img, f: {"video_path": v}),
+    "export_ladder": ("process_export_ladder", lambda v, img, f: {"video_path": v}),
+    "transform_video": ("process_transform_video", lambda v, img, f: {"video_path": v, "steps": [
+        {"type": "crop", "width": f.width // 2 * 2 - 64}, {"type": "rotate", "angle": 5}, {"type": "resize", "scale": 0.5}, {"type": "margin", "margin": 8},
+    ]}),
+}
+# process_detect_highlights opens an OpenCV preview window, so it cannot run headless.
+
+VIDEO_EXTENSIONS = (".mp4", ".webm", ".mov", ".mkv")
+
+def _run_one(operation: str, fixture_name: str, workdir: str) -> dict:
+    """
+    Worker body: runs a single operation in this (fresh) process and reports its measurements.
+    """
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+
+    from videoEditor_mcp import video_utils
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+
+    fixture = next(f for f in FIXTURES if f.name == fixture_name)
+    video = os.path.join(workdir, fixture.filename)
+    image = os.path.join(workdir, "overlay.png")
+    func_name, build = OPERATIONS[operation]
+    kwargs = build(video, image, fixture)
+
+    started = time.perf_counter()
+    try:
+        result = getattr(video_utils, func_name)(**kwargs)
+    except ValueError as e:
+        # e.g. audio operations on a fixture without audio
+        return {"status": "skipped", "reason": str(e)}
+    except Exception:
+        return {"status": "error", "reason": traceback.format_exc(limit=3)}
+    wall = time.perf_counter() - started
+
+    record = {
+        "status": "ok",
+        "wall_seconds": round(wall, 4),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "peak_child_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        "output_bytes": None,
+        "fps": None,
+    }
+    if isinstance(result, str) and os.path.isfile(result):
+        record["output_bytes"] = os.path.getsize(result)
+        if result.endswith(VIDEO_EXTENSIONS):
+            frames = ffmpeg_parse_infos(result).get("video_n_frames", 0)
+            record["fps"] = round(frames / wall, 2) if frames else None
+        os.remove(result)
+    elif isinstance(result, str) and os.path.isdir(result):
+        # Multi-file outputs (renditions, HLS packages)
+        record["output_bytes"] = sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(result) for name in names)
+        shutil.rmtree(result)
+    return record
+
+def run_benchmarks(workdir: str, fixtures: list, operations: list, repeat: int = 1) -> dict:
+    os.environ["VIDEO_STORAGE_DIR"] = workdir
+    make_image(workdir)
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for fixture in fixtures:
+        make_video(fixture, workdir)
+        for operation in operations:
+            runs = []
+            for _ in range(repeat):
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                    runs.append(pool.submit(_run_one, operation, fixture.name, workdir).result())
+            ok_runs = [r for r in runs if r["status"] == "ok"]
+            # Keep the fastest run: it is the least disturbed by noise
+            record = min(ok_runs, key=lambda r: r["wall_seconds"]) if ok_runs else runs[0]
+            key = f"{operation}@{fixture.name}"
+            results[key] = record
+            print(f"{key:55s} {record['status']:8s} {record.get('wall_seconds', '')}", file=sys.stderr)
+    return results
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """
+    Returns (key, metric, baseline, current, ratio) for every measurement that got worse by more than threshold.
+    """
+    regressions = []
+    for key, now in current.items():
+        before = baseline.get(key)
+        if not before or before.get("status") != "ok" or now.get("status") != "ok":
+            continue
+        for metric in ("wall_seconds", "peak_rss_mb", "peak_child_rss_mb"):
+            old, new = before.get(metric), now.get(metric)
+            if old and new and new / old > 1 + threshold:
+                regressions.append((key, metric, old, new, new / old))
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="Write results as a JSON baseline to this file")
+    parser.add_argument("--compare", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed relative slowdown before flagging (default: 0.15)")
+    parser.add_argument("--fixtures", help="Comma-separated fixture names (default: all)")
+    parser.add_argument("--ops", help="Comma-separated operation names (default: all)")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per measurement; the fastest is kept")
+    parser.add_argument("--workdir", help="Directory for fixtures and outputs (default: a temp dir)")
+    args = parser.parse_args(argv)
+
+    fixtures = FIXTURES
+    if args.fixtures:
+        names = args.fixtures.split(",")
+        fixtures = [f for f in FIXTURES if f.name in names]
+    operations = args.ops.split(",") if args.ops else list(OPERATIONS)
+    unknown = set(operations) - set(OPERATIONS)
+    if unknown:
+        parser.error(f"Unknown operations: {', '.join(sorted(unknown))}")
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix="videoeditor_bench_"))
+    os.makedirs(workdir, exist_ok=True)
+    results = run_benchmarks(workdir, fixtures, operations, args.repeat)
+
+    report = {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(), "created": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(baseline, results, args.threshold)
+        for key, metric, old, new, ratio in regressions:
+            print(f"REGRESSION {key} {metric}: {old} -> {new} ({ratio:.2f}x)")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+"""
+Measures cold start of both servers, each in a fresh interpreter.
+
+    python -m benchmarks.startup --repeat 5
+
+mcp_tool_list: spawn the MCP server over stdio, initialize and list tools.
+api_first_response: spawn uvicorn with the FastAPI app and poll GET / until it answers.
+import_media_libraries: whether importing the server module pulled in moviepy, cv2 or PIL.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+MEDIA_LIBRARIES = ("moviepy", "cv2", "PIL")
+
+def _env() -> dict:
+    env = dict(os.environ)
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [src, env.get("PYTHONPATH")]))
+    return env
+
+async def _mcp_tool_list() -> tuple[float, int]:
+    from mcp import ClientSession, StdioServerParameters
+    from mcp.client.stdio import stdio_client
+
+    params = StdioServerParameters(command=sys.executable, args=["-m", "videoEditor_mcp.mcp_server"], env=_env())
+    started = time.perf_counter()
+    with open(os.devnull, "w") as devnull:
+        async with stdio_client(params, errlog=devnull) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                tools = await session.list_tools()
+                elapsed = time.perf_counter() - started
+    return elapsed, len(tools.tools)
+
+def mcp_tool_list() -> float:
+    elapsed, count = asyncio.run(_mcp_tool_list())
+    if not count:
+        raise RuntimeError("MCP server listed no tools")
+    return elapsed
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def api_first_response(timeout: float = 30.0) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "videoEditor_mcp.main:app", "--port", str(port), "--log-level", "warning"],
+        env=_env(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("FastAPI app did not answer")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+def imported_media_libraries(module: str) -> list:
+    code = f"import sys, {module}; print(','.join(m for m in {MEDIA_LIBRARIES!r} if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], env=_env(), capture_output=True, text=True, check=True).stdout
+    return [m for m in out.strip().split(",") if m]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3, help="Cold starts per measurement (default: 3)")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name, measure in (("mcp_tool_list", mcp_tool_list), ("api_first_response", api_first_response)):
+        runs = [measure() for _ in range(args.repeat)]
+        results[name] = {"median_seconds": round(statistics.median(runs), 4), "min_seconds": round(min(runs), 4)}
+        print(f"{name:22s} median {results[name]['median_seconds']:.3f}s  min {results[name]['min_seconds']:.3f}s")
+    for module in ("videoEditor_mcp.mcp_server", "videoEditor_mcp.main"):
+        loaded = imported_media_libraries(module)
+        results[f"import_media_libraries@{module}"] = loaded
+        print(f"{module} imports media libraries: {', '.join(loaded) or 'none'}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,226 @@
+import hashlib
+import os
+import struct
+import uuid
+from typing import Iterator, Optional
+import numpy as np
+from . import storage
+from .ffmpeg_utils import stream_ffmpeg
+from .storage import SAFE_DIR
+
+# Audio is analysed as mono float32 at this rate, whatever the source format
+ANALYSIS_SAMPLE_RATE = 16000
+CHUNK_SECONDS = 10
+
+# Finest waveform level: 100 peaks per second; each further level halves the resolution
+SAMPLES_PER_PEAK = 160
+# Levels stop once they are shorter than this many peaks
+MIN_LEVEL_PEAKS = 256
+PEAKS_CACHE_DIR = ".waveforms"
+# Blocks a source fingerprint hashes: the first, the last and evenly spaced ones between
+FINGERPRINT_BLOCKS = 33
+FINGERPRINT_BLOCK_SIZE = 64 << 10
+
+# magic, version, sample rate, samples per peak at level 0, total samples, level count
+_HEADER = struct.Struct("<4sHIIQH")
+_MAGIC = b"WFPK"
+_VERSION = 1
+# Peaks are stored as int16 (min, max, rms) triples scaled from [-1, 1]
+_SCALE = 32767
+
+def has_audio(path: str) -> bool:
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    return bool(ffmpeg_parse_infos(path).get("audio_found"))
+
+def read_audio_chunks(path: str, sample_rate: int = ANALYSIS_SAMPLE_RATE, chunk_seconds: float = CHUNK_SECONDS) -> Iterator[np.ndarray]:
+    """
+    Decodes the first audio stream of path to mono float32 and yields it chunk by chunk.
+    """
+    chunk_bytes = int(sample_rate * chunk_seconds) * 4
+    args = ["-i", path, "-vn", "-map", "0:a:0", "-ac", "1", "-ar", str(sample_rate), "-f", "f32le", "pipe:1"]
+    for chunk in stream_ffmpeg(args, chunk_bytes):
+        yield np.frombuffer(chunk, dtype=np.float32)
+
+def source_fingerprint(path: str) -> str:
+    """
+    Identifies a file's content by its size, modification time and FINGERPRINT_BLOCKS blocks
+    spread over it, so a renamed file keeps its cache and one edited or re-exported in place,
+    even at the same size, does not.
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha256(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+    with open(path, "rb") as f:
+        if stat.st_size <= FINGERPRINT_BLOCKS * FINGERPRINT_BLOCK_SIZE:
+            digest.update(f.read())
+        else:
+            span = stat.st_size - FINGERPRINT_BLOCK_SIZE
+            for i in range(FINGERPRINT_BLOCKS):
+                f.seek(span * i // (FINGERPRINT_BLOCKS - 1))
+                digest.update(f.read(FINGERPRINT_BLOCK_SIZE))
+    return digest.hexdigest()[:32]
+
+def _block_peaks(samples: np.ndarray, block: int):
+    blocks = samples.reshape(-1, block)
+    return blocks.min(axis=1), blocks.max(axis=1), np.square(blocks, dtype=np.float64).mean(axis=1)
+
+def compute_peak_levels(path: str, sample_rate: int = ANALYSIS_SAMPLE_RATE, samples_per_peak: int = SAMPLES_PER_PEAK):
+    """
+    Streams the audio once and returns (total samples, levels) where each level is a
+    (min, max, mean square) tuple of arrays, level n covering samples_per_peak * 2**n samples per peak.
+    """
+    mins, maxs, squares = [], [], []
+    carry = np.empty(0, dtype=np.float32)
+    total = 0
+    for chunk in read_audio_chunks(path, sample_rate):
+        total += len(chunk)
+        samples = np.concatenate([carry, chunk]) if len(carry) else chunk
+        usable = len(samples) - len(samples) % samples_per_peak
+        if usable:
+            low, high, square = _block_peaks(samples[:usable], samples_per_peak)
+            mins.append(low)
+            maxs.append(high)
+            squares.append(square)
+        carry = samples[usable:]
+    if len(carry):
+        mins.append(np.array([carry.min()]))
+        maxs.append(np.array([carry.max()]))
+        squares.append(np.array([np.square(carry, dtype=np.float64).mean()]))
+    if not mins:
+        raise ValueError("Audio stream is empty")
+
+    level = (np.concatenate(mins), np.concatenate(maxs), np.concatenate(squares))
+    levels = [level]
+    while len(level[0]) > MIN_LEVEL_PEAKS:
+        low, high, square = level
+        if len(low) % 2:
+            # Pair the last peak with itself so every parent covers two children
+            low, high, square = (np.append(a, a[-1]) for a in (low, high, square))
+        level = (
+            np.minimum(low[0::2], low[1::2]),
+            np.maximum(high[0::2], high[1::2]),
+            (square[0::2] + square[1::2]) / 2,
+        )
+        levels.append(level)
+    return total, levels
+
+def write_peaks_file(path: str, sample_rate: int, samples_per_peak: int, total_samples: int, levels):
+    tmp = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, sample_rate, samples_per_peak, total_samples, len(levels)))
+        f.write(np.array([len(level[0]) for level in levels], dtype="<u4").tobytes())
+        for low, high, square in levels:
+            triples = np.stack([low, high, np.sqrt(square)], axis=1)
+            f.write(np.round(np.clip(triples, -1, 1) * _SCALE).astype("<i2").tobytes())
+    os.replace(tmp, path)
+
+class PeaksFile:
+    """
+    Memory-mapped view of a peaks file: opening it and slicing a level reads only that slice.
+    """
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            magic, version, self.sample_rate, self.samples_per_peak, self.total_samples, count = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != _MAGIC or version != _VERSION:
+                raise ValueError(f"Not a peaks file: {path}")
+            counts = np.frombuffer(f.read(4 * count), dtype="<u4")
+        offset = _HEADER.size + 4 * count
+        self.levels = []
+        for n in counts:
+            self.levels.append(np.memmap(path, dtype="<i2", mode="r", offset=offset, shape=(int(n), 3)))
+            offset += int(n) * 6
+
+    @property
+    def duration(self) -> float:
+        return self.total_samples / self.sample_rate
+
+    def peaks_per_second(self, level: int) -> float:
+        return self.sample_rate / (self.samples_per_peak * 2 ** level)
+
+def peaks_file(path: str) -> PeaksFile:
+    """
+    Returns the peaks of path, computing and caching them in SAFE_DIR on first use. Cached
+    peaks are indexed by the storage manager, so its quota and TTL eviction cover them.
+    """
+    directory = os.path.join(SAFE_DIR, PEAKS_CACHE_DIR)
+    cached = os.path.join(directory, f"{source_fingerprint(path)}-{ANALYSIS_SAMPLE_RATE}-{SAMPLES_PER_PEAK}.peaks")
+    manager = storage.get_manager()
+    if not os.path.exists(cached):
+        if not has_audio(path):
+            raise ValueError("Video has no audio")
+        total, levels = compute_peak_levels(path)
+        os.makedirs(directory, exist_ok=True)
+        write_peaks_file(cached, ANALYSIS_SAMPLE_RATE, SAMPLES_PER_PEAK, total, levels)
+        manager.register(cached, "waveform", path)
+    else:
+        manager.touch([cached])
+    return PeaksFile(cached)
+
+def waveform_peaks(path: str, start: float = 0.0, end: Optional[float] = None, max_points: int = 2000) -> dict:
+    """
+    min/max/RMS peaks of [start, end] at the finest level that fits in max_points peaks.
+    """
+    peaks = peaks_file(path)
+    end = peaks.duration if end is None else min(end, peaks.duration)
+    start = max(0.0, start)
+    if end <= start:
+        raise ValueError("end must be greater than start")
+    if max_points <= 0:
+        raise ValueError("max_points must be positive")
+
+    level = 0
+    while level < len(peaks.levels) - 1 and (end - start) * peaks.peaks_per_second(level) > max_points:
+        level += 1
+    rate = peaks.peaks_per_second(level)
+    first, last = int(start * rate), min(len(peaks.levels[level]), int(np.ceil(end * rate)))
+    values = np.asarray(peaks.levels[level][first:last], dtype=np.float32) / _SCALE
+    return {
+        "duration": peaks.duration,
+        "peaks_per_second": rate,
+        "start": first / rate,
+        "end": last / rate,
+        "min": np.round(values[:, 0], 4).tolist(),
+        "max": np.round(values[:, 1], 4).tolist(),
+        "rms": np.round(values[:, 2], 4).tolist(),
+    }
+
+def detect_silence(path: str, threshold_db: float = -40.0, min_silence: float = 0.5, window: float = 0.05,
+                   sample_rate: int = ANALYSIS_SAMPLE_RATE) -> list:
+    """
+    Returns (start, end) intervals of at least min_silence seconds whose windowed RMS stays
+    below threshold_db (dBFS). Streams the audio, so memory does not grow with its length.
+    """
+    window_samples = max(1, int(round(window * sample_rate)))
+    threshold = 10 ** (threshold_db / 20)
+    intervals = []
+    silence_start = None
+    carry = np.empty(0, dtype=np.float32)
+    windows_done = 0
+
+    def close(end_sample: int):
+        start = float(silence_start * window_samples / sample_rate)
+        end = float(end_sample / sample_rate)
+        if end - start >= min_silence:
+            intervals.append((round(start, 3), round(end, 3)))
+
+    for chunk in read_audio_chunks(path, sample_rate):
+        samples = np.concatenate([carry, chunk]) if len(carry) else chunk
+        usable = len(samples) - len(samples) % window_samples
+        carry = samples[usable:]
+        if not usable:
+            continue
+        rms = np.sqrt(np.square(samples[:usable].reshape(-1, window_samples), dtype=np.float64).mean(axis=1))
+        silent = rms < threshold
+        # Window indices where silence starts or stops within this chunk
+        edges = np.flatnonzero(np.diff(silent.astype(np.int8), prepend=np.int8(silence_start is not None)))
+        for index in edges:
+            if silent[index]:
+                silence_start = windows_done + index
+            else:
+                close((windows_done + index) * window_samples)
+                silence_start = None
+        windows_done += len(silent)
+
+    if silence_start is not None:
+        # Trailing silence runs to the end, including the last partial window
+        close(windows_done * window_samples + len(carry))
+    return intervals
@@ -0,0 +1,138 @@
+"""
+Single-flight coalescing: a request identical to one already rendering (same operation,
+same parameters, same input contents) attaches to that render and returns its result
+instead of starting its own, e.g. a double-clicked "apply" or a retry after a client timeout.
+"""
+import copy
+import functools
+import hashlib
+import inspect
+import json
+import os
+import threading
+from typing import Callable, Optional
+from . import audio_analysis, jobs, metrics
+
+ENABLED = os.environ.get("VIDEO_COALESCE", "1") != "0"
+WAIT_INTERVAL = 0.5
+
+INPUT_PARAMETERS = ("video_path", "video_paths", "image_path")
+OUTPUT_PARAMETERS = ("output_path", "output_file", "output_dir")
+
+COALESCED = metrics.Counter(
+    "video_requests_coalesced_total", "Requests attached to an identical render already in flight.", ("operation",)
+)
+IN_FLIGHT = metrics.Gauge("video_coalesce_in_flight", "Distinct renders in flight that identical requests can attach to.")
+
+class _Flight:
+    def __init__(self, job: Optional[jobs.Job]):
+        self.job = job
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+_flights = {}
+_lock = threading.Lock()
+
+def request_key(operation: str, arguments: dict, validate: Callable[[str], str]) -> str:
+    """
+    Identity of a request: its operation, its parameters with paths resolved, and the size,
+    modification time and content fingerprint of every file it reads. Raises
+    ValueError/OSError for inputs that cannot be read (the operation reports those itself).
+    """
+    params, inputs = {}, []
+    for name, value in arguments.items():
+        if name in INPUT_PARAMETERS:
+            paths = [validate(path) for path in ([value] if isinstance(value, str) else value or [])]
+            params[name] = paths
+            inputs.extend(paths)
+        elif name in OUTPUT_PARAMETERS:
+            params[name] = validate(value) if value else None
+        elif name == "timeline":
+            from .timeline import input_paths
+            if isinstance(value, str):
+                params[name] = validate(value)
+                inputs.append(params[name])
+            else:
+                params[name] = value.model_dump() if hasattr(value, "model_dump") else value
+            inputs.extend(validate(path) for path in input_paths(value, validate))
+        else:
+            params[name] = value
+    # Size and modification time as well, so a source rewritten in place never joins the old render
+    fingerprints = []
+    for path in inputs:
+        stat = os.stat(path)
+        fingerprints.append([stat.st_size, stat.st_mtime_ns, audio_analysis.source_fingerprint(path)])
+    document = json.dumps([operation, params, fingerprints], sort_keys=True, default=str)
+    return hashlib.sha256(document.encode()).hexdigest()
+
+def _own_error(error: BaseException) -> BaseException:
+    # The leader's error for a follower to raise: same type and arguments, its own traceback
+    try:
+        return copy.copy(error)
+    except Exception:
+        return RuntimeError(f"Identical render failed: {error}")
+
+def _mirror_progress(leader: jobs.Job, follower: jobs.Job):
+    def copy(job: jobs.Job):
+        if not follower.finished and job.progress:
+            follower.update_progress(**job.progress)
+    leader.add_listener(copy)
+    copy(leader)
+
+def track_operation(operation: str, validate: Callable[[str], str]):
+    """
+    Decorator running identical concurrent calls once: the first one renders, the others
+    wait for it and return its result (or raise a copy of its error, chained to it). If the
+    render is cancelled, a waiting call starts over, rendering itself or attaching to another one.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return func(*args, **kwargs)
+            try:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                key = request_key(operation, dict(bound.arguments), validate)
+            except (TypeError, ValueError, OSError):
+                return func(*args, **kwargs)
+
+            job = jobs.current_job()
+            while True:
+                with _lock:
+                    flight = _flights.get(key)
+                    leader = flight is None
+                    if leader:
+                        flight = _flights[key] = _Flight(job)
+                        IN_FLIGHT.set(len(_flights))
+                if leader:
+                    try:
+                        flight.result = func(*args, **kwargs)
+                        return flight.result
+                    except BaseException as e:
+                        flight.error = e
+                        raise
+                    finally:
+                        with _lock:
+                            del _flights[key]
+                            IN_FLIGHT.set(len(_flights))
+                        flight.done.set()
+
+                COALESCED.inc(operation=operation)
+                if job is not None and flight.job is not None:
+                    job.details["coalesced_with"] = flight.job.id
+                    _mirror_progress(flight.job, job)
+                while not flight.done.wait(WAIT_INTERVAL):
+                    if job is not None:
+                        job.raise_if_cancelled()
+                if flight.job is not None and flight.job.cancel_reason:
+                    # Stopped on purpose for its own client, not because the request is bad
+                    continue
+                if flight.error is not None:
+                    raise _own_error(flight.error) from flight.error
+                return flight.result
+        return wrapper
+    return decorator
@@ -0,0 +1,242 @@
+"""
+Mezzanine conform: sources that are slow to seek (long GOPs, variable frame rate, heavy
+B-frame reordering, typical of phone and screen recordings) are transcoded in the
+background to H.264 with short fixed GOPs, no B-frames and a constant frame rate.
+Once a source's mezzanine is ready, open_video reads it instead of the original.
+
+Each source is analysed from its packets alone (no decoding), so the check is cheap
+even for long files. Sources and their mezzanines are recorded in the storage index;
+mezzanines live in SAFE_DIR/CONFORM_DIR and are evicted like any other output.
+"""
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from fractions import Fraction
+from typing import Optional
+from . import audio_analysis, metrics, storage
+from .ffmpeg_utils import run_ffmpeg, video_packets
+from .storage import SAFE_DIR
+
+# "manual": only sources passed to request() are conformed; "auto": every source an
+# operation opens is analysed (and conformed if needed) in the background; "off": never
+MODE = os.environ.get("VIDEO_CONFORM", "manual").lower()
+# A source needs a mezzanine when its longest GOP exceeds this many seconds,
+MAX_GOP_SECONDS = float(os.environ.get("VIDEO_CONFORM_MAX_GOP_SECONDS", 2.0))
+# when more than this share of its frames are reordered B-frames,
+MAX_B_FRAME_SHARE = float(os.environ.get("VIDEO_CONFORM_MAX_B_FRAME_SHARE", 0.8))
+# or when more than this share of its frame intervals are off the typical one by over 10%
+MAX_VFR_SHARE = 0.01
+# GOP length and quality of the mezzanine
+GOP_SECONDS = float(os.environ.get("VIDEO_CONFORM_GOP_SECONDS", 0.5))
+CRF = os.environ.get("VIDEO_CONFORM_CRF", "16")
+PRESET = os.environ.get("VIDEO_CONFORM_PRESET", "veryfast")
+CONFORM_DIR = ".mezzanine"
+
+CONFORMS = metrics.Counter("video_conforms_total", "Sources analysed for conform, by outcome.", ("result",))
+
+_queue = queue.Queue()
+# Sources queued or being conformed by this process
+_pending = set()
+_pending_lock = threading.Lock()
+_worker = None
+
+def analyze(path: str) -> dict:
+    """
+    How edit-friendly path's video stream is, and whether it needs a mezzanine.
+    """
+    tick, packets = video_packets(path)
+    end = max(pts + duration for _, pts, duration, _ in packets)
+    keyframes = sorted(pts for _, pts, _, key in packets if key) + [end]
+    max_gop = max(b - a for a, b in zip(keyframes, keyframes[1:])) * tick if len(keyframes) > 1 else end * tick
+
+    # Frames shown before one decoded earlier were held back for reordering
+    reordered, latest = 0, None
+    for _, pts, _, _ in packets:
+        if latest is not None and pts < latest:
+            reordered += 1
+        latest = pts if latest is None else max(latest, pts)
+    b_frame_share = reordered / len(packets)
+
+    shown = sorted(pts for _, pts, _, _ in packets)
+    intervals = sorted(b - a for a, b in zip(shown, shown[1:]))
+    irregular, frame_rate = 0, None
+    if intervals and intervals[len(intervals) // 2] > 0:
+        typical = intervals[len(intervals) // 2]
+        irregular = sum(abs(i - typical) > 0.1 * typical for i in intervals) / len(intervals)
+        # The rate the source mostly runs at (not its average, which frame drops pull down);
+        # 29.97 and friends are really 30000/1001
+        frame_rate = Fraction(1 / (typical * tick)).limit_denominator(1001)
+
+    reasons = []
+    if max_gop > MAX_GOP_SECONDS:
+        reasons.append("long_gop")
+    if b_frame_share > MAX_B_FRAME_SHARE:
+        reasons.append("b_frames")
+    if irregular > MAX_VFR_SHARE:
+        reasons.append("variable_frame_rate")
+    return {
+        "frames": len(packets),
+        "max_gop_seconds": round(max_gop, 3),
+        "b_frame_share": round(b_frame_share, 3),
+        "irregular_interval_share": round(irregular, 4),
+        "frame_rate": str(frame_rate) if frame_rate else None,
+        "reasons": reasons,
+    }
+
+def transcode(path: str, output_path: str, frame_rate: str):
+    """
+    Writes path's first video and audio streams to output_path as an edit-friendly mezzanine
+    at a constant frame_rate (e.g. "30000/1001").
+    """
+    gop = str(max(1, round(float(Fraction(frame_rate)) * GOP_SECONDS)))
+    run_ffmpeg([
+        "-i", path, "-map", "0:v:0", "-map", "0:a:0?",
+        "-c:v", "libx264", "-preset", PRESET, "-crf", CRF,
+        "-g", gop, "-keyint_min", gop, "-sc_threshold", "0", "-bf", "0",
+        "-r", frame_rate, "-fps_mode", "cfr",
+        "-c:a", "aac", "-b:a", "256k", "-movflags", "+faststart", "-f", "mp4", output_path,
+    ])
+
+def _is_mezzanine(path: str) -> bool:
+    return os.path.dirname(path) == os.path.join(str(SAFE_DIR), CONFORM_DIR)
+
+def _fresh(record: Optional[dict], path: str) -> Optional[dict]:
+    # A record describes the file as it was; an edited or replaced source starts over
+    if record is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if (record["size"], record["mtime"]) != (stat.st_size, stat.st_mtime_ns):
+        return None
+    if record["status"] == "ready" and not os.path.exists(record["mezzanine"] or ""):
+        return None
+    return record
+
+def status(path: str) -> dict:
+    """
+    Conform record of path: status is "none" (never analysed, or the source or its
+    mezzanine changed since), "queued", "running", "ready", "not_needed" or "failed".
+    """
+    path = str(os.path.realpath(path))
+    record = _fresh(storage.get_manager().conform_info(path), path)
+    with _pending_lock:
+        pending = path in _pending
+    if record is None:
+        return {"source": path, "status": "queued" if pending else "none"}
+    if record["status"] in ("queued", "running") and not pending:
+        # Left over from a process that stopped before finishing it
+        record["status"] = "none"
+    return record
+
+def request(path: str, force: bool = False) -> dict:
+    """
+    Queues path for analysis and conform in the background unless it already has a
+    current record (or force is set), and returns its status.
+    """
+    from .video_utils import validate_path
+    path = validate_path(path)
+    if not os.path.exists(path):
+        raise FileNotFoundError("Video file not found")
+    current = status(path)
+    if current["status"] in ("queued", "running") or (current["status"] != "none" and not force):
+        return current
+    stat = os.stat(path)
+    with _pending_lock:
+        if path in _pending:
+            return status(path)
+        _pending.add(path)
+    storage.get_manager().set_conform(path, size=stat.st_size, mtime=stat.st_mtime_ns, status="queued",
+                                      mezzanine=None, analysis=None, error=None)
+    _queue.put(path)
+    _start_worker()
+    return status(path)
+
+def _conform(path: str):
+    manager = storage.get_manager()
+    stat = os.stat(path)
+    manager.set_conform(path, size=stat.st_size, mtime=stat.st_mtime_ns, status="running")
+    analysis = analyze(path)
+    if not analysis["reasons"]:
+        manager.set_conform(path, status="not_needed", analysis=analysis)
+        CONFORMS.inc(result="not_needed")
+        return
+    manager.set_conform(path, analysis=analysis)
+    directory = os.path.join(SAFE_DIR, CONFORM_DIR)
+    os.makedirs(directory, exist_ok=True)
+    output_path = os.path.join(directory, f"{audio_analysis.source_fingerprint(path)}.mp4")
+    partial = f"{output_path}.part"
+    try:
+        transcode(path, partial, analysis["frame_rate"] or "30")
+        os.replace(partial, output_path)
+    finally:
+        if os.path.exists(partial):
+            os.remove(partial)
+    manager.register(output_path, "conform", path)
+    manager.set_conform(path, status="ready", mezzanine=output_path)
+    CONFORMS.inc(result="conformed")
+
+def _run_worker():
+    while True:
+        path = _queue.get()
+        try:
+            _conform(path)
+        except Exception as e:
+            try:
+                storage.get_manager().set_conform(path, status="failed", error=str(e))
+            except (sqlite3.Error, OSError):
+                pass
+            CONFORMS.inc(result="failed")
+        finally:
+            with _pending_lock:
+                _pending.discard(path)
+
+def _start_worker():
+    global _worker
+    with _pending_lock:
+        if _worker is None:
+            _worker = threading.Thread(target=_run_worker, name="conform-worker", daemon=True)
+            _worker.start()
+
+@contextmanager
+def editable(path: str):
+    """
+    Yields the path to decode for path: its mezzanine once one is ready, otherwise path
+    itself. The mezzanine is protected from eviction meanwhile. In "auto" mode an
+    unknown source is queued for conform so later calls can use it.
+    """
+    if MODE == "off":
+        yield path
+        return
+    mezzanine = None
+    try:
+        source = str(os.path.realpath(path))
+        record = _fresh(storage.get_manager().conform_info(source), source)
+        if record is not None and record["status"] == "ready":
+            mezzanine = record["mezzanine"]
+        elif record is None and MODE == "auto" and not _is_mezzanine(source):
+            request(source)
+    except (sqlite3.Error, OSError, ValueError):
+        # The index or the analysis failing must never fail the read itself
+        mezzanine = None
+    if mezzanine is None:
+        yield path
+        return
+    manager = storage.get_manager()
+    # Protected before checking it is still there, so a sweep cannot delete it in between
+    manager.acquire([mezzanine])
+    try:
+        if not os.path.exists(mezzanine):
+            yield path
+            return
+        try:
+            manager.touch([mezzanine])
+        except (sqlite3.Error, OSError):
+            pass
+        yield mezzanine
+    finally:
+        manager.release([mezzanine])
+
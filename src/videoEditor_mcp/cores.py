@@ -0,0 +1,132 @@
+"""
+Core allocator: splits the CPUs between running renders so concurrent encoders do not each
+start a thread per core and thrash the caches. Every admitted render gets a share of the
+cores proportional to its resolution-based core estimate (scheduler.Cost.cpu). Encoders it
+starts get that many threads, and where the OS supports it, its ffmpeg processes are pinned
+to a disjoint set of cores. Shares are recomputed whenever a render starts or finishes:
+running processes are re-pinned; thread counts apply to encoders started afterwards.
+"""
+import contextvars
+import itertools
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import List, Optional
+from . import jobs, metrics
+
+# "affinity": thread counts and CPU pinning; "threads": thread counts only; "off": neither
+MODE = os.environ.get("VIDEO_CORE_ALLOCATION", "affinity").lower()
+
+CORES_ALLOCATED = metrics.Gauge("video_cores_allocated_renders", "Renders holding a share of the cores.")
+
+def available_cores() -> List[int]:
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+@dataclass
+class Allocation:
+    weight: float
+    threads: int = 1
+    # Cores the render's processes are pinned to, None when not pinned
+    cores: Optional[List[int]] = None
+
+    def to_dict(self) -> dict:
+        return {"threads": self.threads, "cores": self.cores}
+
+def split(weights: List[float], cores: List[int]) -> List[List[int]]:
+    """
+    Disjoint runs of cores proportional to weights (at least one each). With more weights
+    than cores, each gets a single core, shared round-robin.
+    """
+    if len(weights) >= len(cores):
+        return [[cores[i % len(cores)]] for i in range(len(weights))]
+    total = sum(weights)
+    exact = [len(cores) * weight / total for weight in weights]
+    counts = [max(1, int(share)) for share in exact]
+    # The minimum of one core is taken from the biggest shares
+    while sum(counts) > len(cores):
+        counts[counts.index(max(counts))] -= 1
+    # Largest remainders get the cores rounding left over
+    order = sorted(range(len(weights)), key=lambda i: int(exact[i]) - exact[i])
+    for i in order[:len(cores) - sum(counts)]:
+        counts[i] += 1
+    starts = [0, *itertools.accumulate(counts)]
+    return [cores[start:start + count] for start, count in zip(starts, counts)]
+
+class CoreAllocator:
+    """
+    Shares of the cores held by running renders, rebalanced on every start and finish.
+    """
+    def __init__(self, cores: List[int] = None, mode: str = MODE):
+        self.cores = cores or available_cores()
+        self.mode = mode
+        self._renders = {}
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def add(self, weight: float, job: Optional[jobs.Job] = None) -> int:
+        with self._lock:
+            key = next(self._counter)
+            self._renders[key] = (Allocation(max(weight, 1)), job)
+            self._rebalance()
+        return key
+
+    def remove(self, key: int):
+        with self._lock:
+            self._renders.pop(key, None)
+            self._rebalance()
+
+    def allocation(self, key: int) -> Optional[Allocation]:
+        with self._lock:
+            entry = self._renders.get(key)
+            return entry[0] if entry else None
+
+    def _rebalance(self):
+        CORES_ALLOCATED.set(len(self._renders))
+        if not self._renders:
+            return
+        entries = list(self._renders.values())
+        shares = split([allocation.weight for allocation, _ in entries], self.cores)
+        for (allocation, job), cores in zip(entries, shares):
+            allocation.threads = len(cores)
+            allocation.cores = cores if self.mode == "affinity" and hasattr(os, "sched_setaffinity") else None
+            if job is not None:
+                job.details["cores"] = allocation.to_dict()
+                if allocation.cores is not None:
+                    job.set_affinity(allocation.cores)
+
+allocator = CoreAllocator()
+_current = contextvars.ContextVar("core_allocation", default=None)
+
+@contextmanager
+def allocate(weight: float, job: Optional[jobs.Job] = None):
+    """
+    Holds a share of the cores for the render running in this context.
+    """
+    if MODE == "off":
+        yield None
+        return
+    key = allocator.add(weight, job)
+    token = _current.set(key)
+    try:
+        yield allocator.allocation(key)
+    finally:
+        _current.reset(token)
+        allocator.remove(key)
+
+def encoder_threads() -> Optional[int]:
+    """
+    Threads for an encoder the current render starts now (None: let ffmpeg decide).
+    """
+    key = _current.get()
+    allocation = allocator.allocation(key) if key is not None else None
+    return allocation.threads if allocation else None
+
+def thread_args() -> List[str]:
+    """
+    encoder_threads() as ffmpeg output options.
+    """
+    threads = encoder_threads()
+    return ["-threads", str(threads)] if threads else []
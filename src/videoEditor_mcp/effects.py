@@ -0,0 +1,95 @@
+"""
+OpenCV implementations of per-frame moviepy effects that are too slow in NumPy/PIL.
+
+They work on uint8 frames with saturating arithmetic and split each frame into horizontal
+bands processed on a thread pool (OpenCV releases the GIL), so a 1080p frame takes a few
+milliseconds instead of tens.
+"""
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+import cv2
+import numpy as np
+from moviepy.Effect import Effect
+from . import cores
+
+# Most threads a single frame is split across, and the size of the pool shared by every render:
+# a frame takes its render's share of the cores (cores.py), as do effect worker processes
+EFFECT_THREADS = int(os.environ.get("VIDEO_EFFECT_THREADS", os.cpu_count() or 1))
+# Bands thinner than this cost more in overhead than they save
+MIN_BAND_ROWS = 64
+
+# PIL's ImageFilter.EDGE_ENHANCE_MORE and FIND_EDGES, which vfx.Painting uses
+_EDGE_ENHANCE = np.array([[-1, -1, -1], [-1, 9, -1], [-1, -1, -1]], dtype=np.float32)
+_FIND_EDGES = np.array([[-1, -1, -1], [-1, 8, -1], [-1, -1, -1]], dtype=np.float32)
+
+_pool = None
+
+def _executor() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ThreadPoolExecutor(max_workers=EFFECT_THREADS, thread_name_prefix="frame-effect")
+    return _pool
+
+def _filter3x3(image: np.ndarray, kernel: np.ndarray, top: bool, bottom: bool) -> np.ndarray:
+    # Like PIL, the outermost pixels of the image are copied rather than filtered
+    out = cv2.filter2D(image, -1, kernel)
+    out[:, 0], out[:, -1] = image[:, 0], image[:, -1]
+    if top:
+        out[0] = image[0]
+    if bottom:
+        out[-1] = image[-1]
+    return out
+
+def _paint_band(frame: np.ndarray, out: np.ndarray, start: int, stop: int, saturation: float, black: float, edge_scale: float):
+    height = frame.shape[0]
+    # Two chained 3x3 filters need two rows of context, more when edges are found at a lower resolution
+    halo = 2 if edge_scale >= 1 else 2 + math.ceil(2 / edge_scale)
+    first, last = max(0, start - halo), min(height, stop + halo)
+    band = frame[first:last]
+    sharp = _filter3x3(band, _EDGE_ENHANCE, first == 0, last == height)
+    luma = cv2.cvtColor(sharp, cv2.COLOR_RGB2GRAY)
+    if edge_scale >= 1:
+        edges = _filter3x3(luma, _FIND_EDGES, first == 0, last == height)
+    else:
+        small = cv2.resize(luma, None, fx=edge_scale, fy=edge_scale, interpolation=cv2.INTER_AREA)
+        edges = _filter3x3(small, _FIND_EDGES, first == 0, last == height)
+        edges = cv2.resize(edges, (luma.shape[1], luma.shape[0]), interpolation=cv2.INTER_LINEAR)
+    rows = slice(start - first, stop - first)
+    cv2.addWeighted(sharp[rows], saturation, cv2.cvtColor(edges[rows], cv2.COLOR_GRAY2RGB), -255 * black, 0, dst=out[start:stop])
+
+def paint(frame: np.ndarray, saturation: float = 1.4, black: float = 0.006, edge_scale: float = 1.0, threads: int = None) -> np.ndarray:
+    """
+    The painting look of vfx.Painting: an edge-enhanced frame scaled by saturation, darkened
+    by black * 255 times its luma edge map. With edge_scale < 1 the edges are found on a
+    luma plane downscaled by that factor and upsampled, which is faster and draws softer lines.
+    The frame is split across threads, by default the current render's share of the cores,
+    the calling thread painting one band and the shared pool the others.
+    """
+    if not 0 < edge_scale <= 1:
+        raise ValueError("edge_scale must be in (0, 1]")
+    frame = np.ascontiguousarray(frame[:, :, :3], dtype=np.uint8)
+    height = frame.shape[0]
+    out = np.empty_like(frame)
+    threads = threads or min(cores.encoder_threads() or EFFECT_THREADS, EFFECT_THREADS)
+    bands = max(1, min(threads, height // MIN_BAND_ROWS))
+    bounds = [height * i // bands for i in range(bands + 1)]
+    futures = [_executor().submit(_paint_band, frame, out, start, stop, saturation, black, edge_scale)
+               for start, stop in zip(bounds[1:-1], bounds[2:])]
+    _paint_band(frame, out, bounds[0], bounds[1], saturation, black, edge_scale)
+    for future in futures:
+        future.result()
+    return out
+
+@dataclass
+class Painting(Effect):
+    """
+    Drop-in replacement for vfx.Painting rendered with OpenCV (see paint).
+    """
+    saturation: float = 1.4
+    black: float = 0.006
+    edge_scale: float = 1.0
+
+    def apply(self, clip):
+        return clip.image_transform(lambda frame: paint(frame, self.saturation, self.black, self.edge_scale))
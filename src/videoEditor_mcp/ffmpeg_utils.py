@@ -0,0 +1,110 @@
+import subprocess
+from fractions import Fraction
+from typing import Iterable, Iterator, List, Optional
+from . import jobs
+
+def ffmpeg_binary() -> str:
+    from moviepy.config import FFMPEG_BINARY
+    return FFMPEG_BINARY
+
+class FFmpegError(RuntimeError):
+    pass
+
+class _Process:
+    # What Job.track_resource expects: something with a .proc to kill on cancel
+    def __init__(self, proc: subprocess.Popen):
+        self.proc = proc
+
+def run_ffmpeg(args: List[str], input: Optional[bytes] = None, outputs: Iterable[str] = ()) -> bytes:
+    """
+    Runs ffmpeg with args (without the binary) and returns its stdout.
+    The process is registered with the current job so a cancel kills it, and outputs are
+    deleted if the job does not complete.
+    """
+    job = jobs.current_job()
+    command = [ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-y"]
+    if input is None:
+        command.append("-nostdin")
+    proc = subprocess.Popen(
+        command + list(args),
+        stdin=subprocess.PIPE if input is not None else subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    handle = _Process(proc)
+    if job is not None:
+        for path in outputs:
+            job.track_output(path)
+        try:
+            job.track_resource(handle)
+        except jobs.RenderCancelled:
+            proc.kill()
+            proc.wait()
+            raise
+    try:
+        stdout, stderr = proc.communicate(input)
+    finally:
+        if job is not None:
+            job.untrack_resource(handle)
+    if job is not None:
+        job.raise_if_cancelled()
+    if proc.returncode != 0:
+        message = stderr.decode(errors="replace").strip().splitlines()
+        raise FFmpegError(f"ffmpeg failed: {message[-1] if message else f'exit code {proc.returncode}'}")
+    return stdout
+
+def stream_ffmpeg(args: List[str], chunk_size: int) -> Iterator[bytes]:
+    """
+    Runs ffmpeg with args writing to pipe:1 and yields its output in chunks of chunk_size
+    bytes (the last one may be shorter), so arbitrarily long media is processed in constant memory.
+    """
+    job = jobs.current_job()
+    proc = subprocess.Popen(
+        [ffmpeg_binary(), "-hide_banner", "-loglevel", "error", "-nostdin", *args],
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    handle = _Process(proc)
+    try:
+        if job is not None:
+            job.track_resource(handle)
+        while True:
+            chunk = proc.stdout.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+        stderr = proc.stderr.read()
+        proc.wait()
+        if job is not None:
+            job.raise_if_cancelled()
+        if proc.returncode != 0:
+            message = stderr.decode(errors="replace").strip().splitlines()
+            raise FFmpegError(f"ffmpeg failed: {message[-1] if message else f'exit code {proc.returncode}'}")
+    finally:
+        # Also reached when the consumer stops early
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+        proc.stderr.close()
+        if job is not None:
+            job.untrack_resource(handle)
+
+def video_packets(path: str) -> tuple:
+    """
+    (seconds per tick, [(dts, pts, duration, keyframe)]) of the first video stream, read
+    by demuxing only.
+    """
+    out = run_ffmpeg(["-i", path, "-map", "0:v:0", "-c", "copy", "-f", "framecrc", "-"])
+    time_base, packets = None, []
+    for line in out.decode(errors="replace").splitlines():
+        if line.startswith("#tb 0:"):
+            time_base = Fraction(line.split(":", 1)[1].strip())
+        elif line and not line.startswith("#"):
+            fields = [field.strip() for field in line.split(",")]
+            flags = next((int(f[2:], 16) for f in fields[6:] if f.startswith("F=")), 1)
+            packets.append((int(fields[1]), int(fields[2]), int(fields[3]), bool(flags & 1)))
+    if time_base is None or not packets:
+        raise ValueError(f"No video stream in {path}")
+    return float(time_base), packets
@@ -0,0 +1,193 @@
+"""
+Shared-memory frame transport for running image effects in worker processes.
+
+Pickling full-resolution frames between processes costs more than most effects, so frames
+never travel through pipes here. The decoder copies each frame into a preallocated slot of a
+ring in shared memory, workers transform the slot in place, and the encoder takes slots back
+in frame order. Only frame numbers, slots and effect times cross process boundaries.
+
+The decoder is a thread of the rendering process, not a process of its own: the clip it
+evaluates (pooled readers, non-image effects, compositing) lives there, and ffmpeg already
+decodes in a separate process. Likewise the encoder is the calling thread feeding ffmpeg's
+encoder process. Each worker keeps to its part of the render's cores (cores.py).
+"""
+import contextvars
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Iterable, Iterator, List, Sequence, Tuple
+import numpy as np
+from . import cores, metrics
+
+# Worker processes per render for frame effects (0 or 1 renders them in-process)
+EFFECT_WORKERS = int(os.environ.get("VIDEO_EFFECT_WORKERS", 0))
+# Slots in flight per worker; more absorbs uneven effect times at the cost of memory
+SLOTS_PER_WORKER = 2
+POLL_INTERVAL = 0.5
+
+class FrameRing:
+    """
+    slots frames of shape (height, width, 3) uint8 in one shared memory block.
+    The creating process owns the block and unlinks it on close; workers attach by name.
+    """
+    def __init__(self, slots: int, shape: Tuple[int, int, int], name: str = None):
+        self.slots = slots
+        self.shape = tuple(shape)
+        self._owner = name is None
+        if self._owner:
+            self._shm = shared_memory.SharedMemory(create=True, size=slots * int(np.prod(self.shape)))
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.frames = np.ndarray((slots, *self.shape), dtype=np.uint8, buffer=self._shm.buf)
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    def __getitem__(self, slot: int) -> np.ndarray:
+        return self.frames[slot]
+
+    def close(self):
+        # The array must go before the mapping can be closed
+        self.frames = None
+        try:
+            self._shm.close()
+        except BufferError:
+            # A view is still alive (a decoder that did not stop in time); the mapping goes with it
+            pass
+        if self._owner:
+            self._shm.unlink()
+
+class _FrameFilter:
+    # Stands in for a clip so an image-only moviepy effect hands over its per-frame function
+    is_mask = False
+
+    def image_transform(self, func, apply_to=None):
+        self.func = func
+        return self
+
+def frame_filters(effects: Sequence) -> list:
+    """
+    The per-frame functions of image-only moviepy effects (Painting, LumContrast, GammaCorrection...).
+    """
+    return [effect.copy().apply(_FrameFilter()).func for effect in effects]
+
+def worker_threads(workers: int) -> List[int]:
+    """
+    Threads each of workers may use: the current render's share of the cores split between them.
+    """
+    threads = cores.encoder_threads() or len(cores.available_cores())
+    return [len(share) for share in cores.split([1.0] * workers, list(range(threads)))]
+
+def _limit_threads(threads: int):
+    # Banded OpenCV effects and OpenCV's own thread pool, which default to every core
+    import cv2
+    from . import effects as opencv_effects
+    opencv_effects.EFFECT_THREADS = threads
+    cv2.setNumThreads(threads)
+
+def _worker(ring_name: str, slots: int, shape: tuple, effects: Sequence, tasks, done, threads: int = 1):
+    ring = FrameRing(slots, shape, name=ring_name)
+    try:
+        _limit_threads(threads)
+        filters = frame_filters(effects)
+        while (task := tasks.get()) is not None:
+            index, slot = task
+            frame = ring[slot]
+            started = time.perf_counter()
+            for apply in filters:
+                frame[:] = apply(frame)
+            done.put(("frame", index, slot, time.perf_counter() - started))
+    except BaseException as e:
+        done.put(("error", f"{type(e).__name__}: {e}", None, 0.0))
+    finally:
+        ring.close()
+
+def map_frames(frames: Iterable[np.ndarray], shape: Tuple[int, int, int], effects: Sequence, workers: int) -> Iterator[np.ndarray]:
+    """
+    Applies image-only moviepy effects to frames in worker processes and yields the results
+    in order. Each yielded array is a ring slot, only valid until the next iteration.
+    """
+    # Servers run threads, which forked children must not inherit
+    context = multiprocessing.get_context("forkserver")
+    ring = FrameRing(workers * SLOTS_PER_WORKER + 1, shape)
+    tasks, done = context.Queue(), context.Queue()
+    procs = [
+        context.Process(target=_worker, args=(ring.name, ring.slots, ring.shape, list(effects), tasks, done, threads), daemon=True)
+        for threads in worker_threads(workers)
+    ]
+    free = queue.Queue()
+    for slot in range(ring.slots):
+        free.put(slot)
+    stop = threading.Event()
+
+    def decode():
+        count, error = 0, None
+        source = iter(frames)
+        try:
+            while True:
+                # Evaluating the clip (compositing, non-image effects) is effect time too
+                with metrics.timed_effects():
+                    frame = next(source, None)
+                if frame is None:
+                    break
+                while True:
+                    if stop.is_set():
+                        return
+                    try:
+                        slot = free.get(timeout=POLL_INTERVAL)
+                        break
+                    except queue.Empty:
+                        continue
+                ring[slot][:] = frame
+                tasks.put((count, slot))
+                count += 1
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+        done.put(("error", error, None, 0.0) if error else ("end", count, None, 0.0))
+
+    # Runs in the caller's context so reader hooks account decode time to this render
+    decoder = threading.Thread(target=contextvars.copy_context().run, args=(decode,), name="frame-decoder", daemon=True)
+    try:
+        for proc in procs:
+            proc.start()
+        decoder.start()
+        pending, expected, total = {}, 0, None
+        while total is None or expected < total:
+            if expected in pending:
+                slot = pending.pop(expected)
+                yield ring[slot]
+                free.put(slot)
+                expected += 1
+                continue
+            try:
+                kind, value, slot, seconds = done.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if not all(proc.is_alive() for proc in procs):
+                    raise RuntimeError("An effect worker exited unexpectedly")
+                continue
+            if kind == "frame":
+                pending[value] = slot
+                metrics.add_effect_seconds(seconds)
+            elif kind == "end":
+                total = value
+            else:
+                raise RuntimeError(f"Frame effect failed: {value}")
+    finally:
+        stop.set()
+        for _ in procs:
+            tasks.put(None)
+        for proc in procs:
+            if proc.pid is None:
+                continue
+            proc.join(timeout=POLL_INTERVAL * 4)
+            if proc.is_alive():
+                proc.kill()
+                proc.join()
+        decoder.join(timeout=POLL_INTERVAL * 4)
+        tasks.close()
+        done.close()
+        ring.close()
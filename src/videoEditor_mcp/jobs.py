@@ -0,0 +1,453 @@
+import asyncio
+import contextvars
+import functools
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Callable, Optional
+from proglog import ProgressBarLogger
+from starlette.responses import JSONResponse
+
+# Finished jobs kept around for status queries
+JOB_HISTORY = 500
+# Minimum seconds between two progress publications for the same job
+PROGRESS_INTERVAL = 0.2
+
+# moviepy bar names -> what they count
+STAGES = {"frame_index": "video", "chunk": "audio"}
+
+def _parse_time_limits(value: str) -> dict:
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        operation, _, seconds = item.partition("=")
+        limits[operation.strip()] = float(seconds)
+    return limits
+
+# Hard wall-clock limit per operation, e.g. VIDEO_TIME_LIMITS="time_effect_video=600,write_gif=120"
+DEFAULT_TIME_LIMIT = float(os.environ.get("VIDEO_OPERATION_TIME_LIMIT", 1800))
+TIME_LIMITS = _parse_time_limits(os.environ.get("VIDEO_TIME_LIMITS", ""))
+
+def time_limit_for(operation: str) -> float:
+    return TIME_LIMITS.get(operation, DEFAULT_TIME_LIMIT)
+
+class RenderCancelled(Exception):
+    """
+    Raised inside a render that was stopped on purpose rather than one that failed.
+    reason is 'cancelled' (explicit cancel), 'client_disconnected' or 'timeout'.
+    """
+    def __init__(self, reason: str = "cancelled", message: str = None):
+        self.reason = reason
+        super().__init__(message or f"Render stopped: {reason.replace('_', ' ')}")
+
+    @property
+    def status_code(self) -> int:
+        # 499 is the de-facto "client closed request" code
+        return 504 if self.reason == "timeout" else 499
+
+class Job:
+    """
+    A single render tracked from request to result, with live progress.
+    """
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.operation = None
+        self.status = "pending"
+        self.progress = {}
+        self.output_path = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.version = 0
+        self.cancel_reason = None
+        # Extra facts about the render (e.g. its admission cost), shown in the status
+        self.details = {}
+        # Cores its ffmpeg processes are pinned to (see cores.py), None when not pinned
+        self.cpu_affinity = None
+        self._listeners = []
+        self._resources = set()
+        self._outputs = set()
+        self._time_limit = None
+        self._timer = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def add_listener(self, callback: Callable[["Job"], None]):
+        self._listeners.append(callback)
+
+    def _changed(self):
+        self.version += 1
+        for callback in list(self._listeners):
+            try:
+                callback(self)
+            except Exception:
+                pass
+
+    def start(self, operation: str, time_limit: float = None):
+        """
+        Marks the job as running the operation. Its time limit counts from admitted().
+        """
+        with self._lock:
+            self.operation = operation
+            self.status = "running"
+            self.started_at = time.time()
+            self._time_limit = time_limit
+        self._changed()
+        self.raise_if_cancelled()
+
+    def admitted(self):
+        """
+        Starts the time limit, once: called when the scheduler admits the job, so time spent
+        queued does not count, and on its first progress report for work the scheduler does not gate.
+        """
+        if self._timer is not None or not self._time_limit:
+            return
+        with self._lock:
+            if self._timer is not None or self.finished:
+                return
+            self._timer = threading.Timer(self._time_limit, self.cancel, args=("timeout",))
+            self._timer.daemon = True
+            self._timer.start()
+
+    def set_status(self, status: str):
+        """
+        Switches between 'queued' (waiting for admission) and 'running'.
+        """
+        if self.status != status and not self.finished:
+            self.status = status
+            self._changed()
+
+    def cancel(self, reason: str = "cancelled") -> bool:
+        """
+        Stops the job: kills its ffmpeg readers/writers so blocked pipe I/O returns,
+        and makes the next progress callback raise RenderCancelled.
+        """
+        with self._lock:
+            if self.finished or self.cancel_reason:
+                return False
+            self.cancel_reason = reason
+            resources = list(self._resources)
+        for resource in resources:
+            proc = getattr(resource, "proc", None)
+            if proc is not None and proc.poll() is None:
+                proc.kill()
+        self._changed()
+        return True
+
+    def raise_if_cancelled(self):
+        if self.cancel_reason:
+            raise RenderCancelled(self.cancel_reason)
+
+    def track_resource(self, resource):
+        """
+        Registers a moviepy ffmpeg reader/writer (anything with a .proc) to stop on cancel.
+        """
+        self.raise_if_cancelled()
+        with self._lock:
+            self._resources.add(resource)
+            affinity = self.cpu_affinity
+        if affinity:
+            _pin(resource, affinity)
+
+    def set_affinity(self, cores):
+        """
+        Pins the ffmpeg processes the job is running, and those it starts later, to cores.
+        """
+        with self._lock:
+            self.cpu_affinity = list(cores)
+            resources = list(self._resources)
+        for resource in resources:
+            _pin(resource, self.cpu_affinity)
+
+    def untrack_resource(self, resource):
+        with self._lock:
+            self._resources.discard(resource)
+
+    def track_output(self, path: str):
+        with self._lock:
+            self._outputs.add(path)
+
+    def update_progress(self, **progress):
+        with self._lock:
+            self.progress = progress
+        self._changed()
+
+    def finish(self, output_path=None, error: Optional[BaseException] = None):
+        with self._lock:
+            if self.finished:
+                return
+            self.finished_at = time.time()
+            if self._timer is not None:
+                self._timer.cancel()
+            if error is None:
+                self.status = "succeeded"
+                self.output_path = output_path if isinstance(output_path, str) else None
+            else:
+                self.status = "cancelled" if isinstance(error, RenderCancelled) else "failed"
+                self.error = str(error)
+                # Whatever the writers produced is incomplete
+                for path in self._outputs:
+                    try:
+                        if os.path.isdir(path):
+                            shutil.rmtree(path)
+                        else:
+                            os.remove(path)
+                    except OSError:
+                        pass
+            self._resources.clear()
+            self._outputs.clear()
+        self._changed()
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "operation": self.operation,
+            "status": self.status,
+            "progress": self.progress,
+            "output_path": self.output_path,
+            "error": self.error,
+            "cancel_reason": self.cancel_reason,
+            "details": self.details,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+def _pin(resource, cores):
+    proc = getattr(resource, "proc", None)
+    if proc is None or proc.poll() is not None:
+        return
+    # Affinity is per thread on Linux, and ffmpeg starts its codec threads right away
+    try:
+        tasks = [int(task) for task in os.listdir(f"/proc/{proc.pid}/task")]
+    except OSError:
+        tasks = [proc.pid]
+    for task in tasks:
+        try:
+            os.sched_setaffinity(task, cores)
+        except (OSError, AttributeError):
+            pass
+
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+_current_job = contextvars.ContextVar("current_job", default=None)
+
+class JobIdInUse(ValueError):
+    """
+    The requested job id belongs to a render that is queued or running.
+    """
+
+def create_job(job_id: str = None) -> Job:
+    """
+    Registers a job and prunes old finished jobs. An id naming a pending job reuses it and
+    one naming a finished job replaces it; JobIdInUse is raised while that job is queued or running.
+    """
+    with _jobs_lock:
+        existing = _jobs.get(job_id) if job_id else None
+        if existing is not None and existing.status == "pending":
+            return existing
+        if existing is not None and not existing.finished:
+            raise JobIdInUse(f"Job {job_id} is already {existing.status}")
+        job = Job(job_id or uuid.uuid4().hex)
+        _jobs[job.id] = job
+        finished = [key for key, value in _jobs.items() if value.finished]
+        for key in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del _jobs[key]
+        return job
+
+def get_job(job_id: str) -> Optional[Job]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+def list_jobs() -> list:
+    with _jobs_lock:
+        return list(_jobs.values())
+
+def current_job() -> Optional[Job]:
+    return _current_job.get()
+
+@contextmanager
+def bind(job: Job):
+    """
+    Makes job the current job for this context (worker threads inherit it).
+    """
+    token = _current_job.set(job)
+    try:
+        yield job
+    finally:
+        _current_job.reset(token)
+
+def track_operation(operation: str):
+    """
+    Decorator marking the current job (if any) as running the operation and recording its outcome.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            job = _current_job.get()
+            if job is None:
+                return func(*args, **kwargs)
+            try:
+                job.start(operation, time_limit_for(operation))
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if job.cancel_reason and not isinstance(e, RenderCancelled):
+                    # Killing ffmpeg surfaces as broken pipes/IO errors; report it as the cancellation it is
+                    error = RenderCancelled(job.cancel_reason)
+                    job.finish(error=error)
+                    raise error from e
+                job.finish(error=e)
+                raise
+            job.finish(output_path=result)
+            return result
+        return wrapper
+    return decorator
+
+class JobProgressLogger(ProgressBarLogger):
+    """
+    proglog logger publishing moviepy's per-frame (and per audio chunk) callbacks to a job.
+    """
+    def __init__(self, job: Job):
+        super().__init__()
+        self.job = job
+        self._bar_started = {}
+        self._last_published = 0.0
+
+    def bars_callback(self, bar, attr, value, old_value=None):
+        self.job.admitted()
+        self.job.raise_if_cancelled()
+        if attr != "index":
+            return
+        now = time.perf_counter()
+        started = self._bar_started.setdefault(bar, now)
+        total = self.bars[bar].get("total")
+        done = value + 1
+        if done != total and now - self._last_published < PROGRESS_INTERVAL:
+            return
+        self._last_published = now
+        elapsed = now - started
+        rate = done / elapsed if elapsed > 0 else None
+        eta = (total - done) / rate if rate and total else None
+        self.job.update_progress(
+            stage=STAGES.get(bar, bar),
+            frames_done=done,
+            total_frames=total,
+            fps=round(rate, 2) if rate else None,
+            eta_seconds=round(eta, 2) if eta is not None else None,
+        )
+
+def progress_logger():
+    """
+    Logger to pass to moviepy writers: reports to the current job, or the default console bar.
+    """
+    job = _current_job.get()
+    return JobProgressLogger(job) if job is not None else "bar"
+
+def _track_on_start(cls, method: str, output_attribute: str = None):
+    original = getattr(cls, method)
+
+    @functools.wraps(original)
+    def wrapper(self, *args, **kwargs):
+        job = _current_job.get()
+        if job is not None:
+            job.raise_if_cancelled()
+        original(self, *args, **kwargs)
+        if job is not None:
+            if output_attribute:
+                job.track_output(getattr(self, output_attribute))
+            job.track_resource(self)
+
+    setattr(cls, method, wrapper)
+
+_hooks_installed = False
+_hooks_lock = threading.Lock()
+
+def install_hooks():
+    """
+    Patches moviepy's ffmpeg readers and writers so the current job knows every
+    subprocess it starts (to kill on cancel) and every file it writes (to delete if it never completes).
+    """
+    global _hooks_installed
+    with _hooks_lock:
+        if _hooks_installed:
+            return
+        from moviepy.audio.io.ffmpeg_audiowriter import FFMPEG_AudioWriter
+        from moviepy.audio.io.readers import FFMPEG_AudioReader
+        from moviepy.video.io.ffmpeg_reader import FFMPEG_VideoReader
+        from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+        # Readers restart their ffmpeg process on every backward/long seek
+        _track_on_start(FFMPEG_VideoReader, "initialize")
+        _track_on_start(FFMPEG_AudioReader, "initialize")
+        _track_on_start(FFMPEG_VideoWriter, "__init__", output_attribute="filename")
+        _track_on_start(FFMPEG_AudioWriter, "__init__", output_attribute="filename")
+        _hooks_installed = True
+
+def discard_job(job: Job):
+    with _jobs_lock:
+        if _jobs.get(job.id) is job:
+            del _jobs[job.id]
+
+def _valid_job_id(value: str) -> bool:
+    return 0 < len(value) <= 64 and all(c.isalnum() or c in "-_" for c in value)
+
+class JobMiddleware:
+    """
+    ASGI middleware binding a job to every POST request.
+    Clients may choose the id with an X-Job-ID header so they can follow /jobs/{id}/events
+    while the request runs; the id is always echoed back in the X-Job-ID response header.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"].startswith("/jobs"):
+            await self.app(scope, receive, send)
+            return
+
+        requested = dict(scope["headers"]).get(b"x-job-id", b"").decode("latin-1")
+        try:
+            job = create_job(requested if _valid_job_id(requested) else None)
+        except JobIdInUse as e:
+            # Two requests sharing a job would share its cancellation, time limit and progress
+            await JSONResponse({"detail": str(e)}, status_code=409)(scope, receive, send)
+            return
+
+        async def send_with_job_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-job-id", job.id.encode())]
+            await send(message)
+
+        body_received = asyncio.Event()
+
+        async def receive_request():
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                job.cancel("client_disconnected")
+            elif not message.get("more_body", False):
+                body_received.set()
+            return message
+
+        async def watch_disconnect():
+            # Once the body is read, the only thing left to receive is the client going away
+            await body_received.wait()
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                job.cancel("client_disconnected")
+
+        watcher = asyncio.create_task(watch_disconnect())
+        with bind(job):
+            try:
+                await self.app(scope, receive_request, send_with_job_id)
+            finally:
+                watcher.cancel()
+                # Requests that never reached a video operation (e.g. validation errors) leave no job behind
+                if job.status == "pending":
+                    discard_job(job)
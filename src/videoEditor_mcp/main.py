@@ -1,6 +1,7 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from .routers import video, video_edits, audio, compositing
+from .jobs import JobMiddleware
+from .routers import video, video_edits, audio, compositing, metrics, jobs, storage
 
 app = FastAPI(title="Video Generation Service")
 
@@ -11,12 +12,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Job-ID"],
 )
+app.add_middleware(JobMiddleware)
 
 app.include_router(video.router)
 app.include_router(video_edits.router)
 app.include_router(audio.router)
 app.include_router(compositing.router)
+app.include_router(metrics.router)
+app.include_router(jobs.router)
+app.include_router(storage.router)
 
 @app.get("/")
 async def root():
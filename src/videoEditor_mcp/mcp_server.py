@@ -1,5 +1,6 @@
-from fastmcp import FastMCP
-from .video_utils import (
+from fastmcp import Context, FastMCP
+from fastmcp.utilities.types import Image
+from .operations import (
     generate_simple_video, process_cut_video, process_concatenate_videos,
     process_resize_video, process_speed_video, process_volume_video,
     process_extract_audio, process_composite_videos, process_text_overlay,
@@ -9,161 +10,284 @@ from .video_utils import (
     process_audio_fade_video, process_audio_loop_video,
     process_accel_decel_video, process_blink_video, process_gamma_correction_video,
     process_painting_video, process_audio_delay_video, process_audio_normalize_video,
-    process_detect_scenes, process_save_frame, process_write_gif,
-    SAFE_DIR
+    process_detect_scenes, process_detect_crop, process_save_frame, process_write_gif,
+    process_export_ladder, process_waveform_peaks, process_detect_silence, process_trim_silence,
+    process_render_timeline, process_transform_video, process_preview_frame, process_preview_gif,
 )
+from .storage import SAFE_DIR
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse
 from typing import List, Optional, Tuple, Union
+from . import conform, jobs, metrics, storage
+import asyncio
 import os
 
 mcp = FastMCP("Video Editor")
 
+# Inline images larger than this are saved to storage and returned as a path instead
+INLINE_MAX_BYTES = int(float(os.environ.get("MCP_INLINE_MAX_KB", 1024)) * 1024)
+# Threads of the default executor asyncio.to_thread runs operations on
+WORKER_THREADS = min(32, (os.cpu_count() or 1) + 4)
+
+# Operations handed to worker threads and not yet returned (only changed on the event loop)
+_calls_in_flight = 0
+
+def _collect_worker_pool():
+    busy = min(_calls_in_flight, WORKER_THREADS)
+    metrics.update_worker_pool(busy, WORKER_THREADS, _calls_in_flight - busy)
+
+metrics.add_collector(_collect_worker_pool)
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request: Request) -> PlainTextResponse:
+    # Served when the MCP server runs over an HTTP transport
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+async def _run(ctx: Optional[Context], func, *args):
+    """
+    Runs a blocking video operation in a worker thread as a job,
+    forwarding its render progress to the client as MCP progress notifications.
+    """
+    global _calls_in_flight
+    loop = asyncio.get_running_loop()
+    job = jobs.create_job()
+
+    def forward_progress(job):
+        progress = job.progress
+        if ctx is None or not progress.get("total_frames"):
+            return
+        message = f"{job.operation}: {progress['stage']} {progress['frames_done']}/{progress['total_frames']}"
+        if progress.get("eta_seconds") is not None:
+            message += f" ({progress['fps']} fps, ETA {progress['eta_seconds']}s)"
+        asyncio.run_coroutine_threadsafe(
+            ctx.report_progress(progress["frames_done"], progress["total_frames"], message), loop
+        )
+
+    job.add_listener(forward_progress)
+    with jobs.bind(job):
+        _calls_in_flight += 1
+        try:
+            return await asyncio.to_thread(func, *args)
+        except asyncio.CancelledError:
+            # The client cancelled the request; the worker thread would otherwise render on
+            job.cancel("client_disconnected")
+            raise
+        finally:
+            _calls_in_flight -= 1
+
+def _inline(result: Union[bytes, str], format: str) -> Union[Image, str]:
+    # Previews come back as encoded bytes, or as a path when they were over the cap
+    return Image(data=result, format=format) if isinstance(result, bytes) else result
+
 @mcp.tool()
-def generate_video(text: str, duration: float = 3.0) -> str:
+async def generate_video(text: str, duration: float = 3.0, ctx: Context = None) -> str:
     """Generates a simple video with text on a background."""
     import uuid
     filename = str(SAFE_DIR / f"video_{uuid.uuid4()}.mp4")
-    return generate_simple_video(text, duration, filename)
+    return await _run(ctx, generate_simple_video, text, duration, filename)
 
 @mcp.tool()
-def cut_video(video_path: str, start_time: float, end_time: float, output_path: Optional[str] = None) -> str:
+async def cut_video(video_path: str, start_time: float, end_time: float, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Cuts a video between start_time and end_time."""
-    return process_cut_video(video_path, start_time, end_time, output_path)
+    return await _run(ctx, process_cut_video, video_path, start_time, end_time, output_path)
 
 @mcp.tool()
-def concatenate_videos(video_paths: List[str], method: str = "compose", output_path: Optional[str] = None) -> str:
+async def concatenate_videos(video_paths: List[str], method: str = "compose", output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Concatenates multiple videos together."""
-    return process_concatenate_videos(video_paths, method, output_path)
+    return await _run(ctx, process_concatenate_videos, video_paths, method, output_path)
 
 @mcp.tool()
-def resize_video(video_path: str, width: Optional[int] = None, height: Optional[int] = None, scale: Optional[float] = None, output_path: Optional[str] = None) -> str:
+async def resize_video(video_path: str, width: Optional[int] = None, height: Optional[int] = None, scale: Optional[float] = None, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Resizes a video by width, height, or scale."""
-    return process_resize_video(video_path, width, height, scale, output_path)
+    return await _run(ctx, process_resize_video, video_path, width, height, scale, output_path)
 
 @mcp.tool()
-def speed_video(video_path: str, factor: float, output_path: Optional[str] = None) -> str:
+async def speed_video(video_path: str, factor: float, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Changes the speed of a video."""
-    return process_speed_video(video_path, factor, output_path)
+    return await _run(ctx, process_speed_video, video_path, factor, output_path)
 
 @mcp.tool()
-def volume_video(video_path: str, factor: float, output_path: Optional[str] = None) -> str:
+async def volume_video(video_path: str, factor: float, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Changes the volume of a video."""
-    return process_volume_video(video_path, factor, output_path)
+    return await _run(ctx, process_volume_video, video_path, factor, output_path)
 
 @mcp.tool()
-def extract_audio(video_path: str, output_path: Optional[str] = None) -> str:
+async def extract_audio(video_path: str, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Extracts audio from a video file."""
-    return process_extract_audio(video_path, output_path)
+    return await _run(ctx, process_extract_audio, video_path, output_path)
 
 @mcp.tool()
-def composite_videos(video_paths: List[str], method: str = "stack", size: Optional[Tuple[int, int]] = None, output_path: Optional[str] = None) -> str:
-    """Composites multiple videos together (stack or grid)."""
-    return process_composite_videos(video_paths, method, size, output_path)
+async def composite_videos(video_paths: List[str], method: str = "stack", size: Optional[Tuple[int, int]] = None, output_path: Optional[str] = None, rows: Optional[int] = None, cols: Optional[int] = None, fill_color: Tuple[int, int, int] = (0, 0, 0), hold_last_frame: bool = True, ctx: Context = None) -> str:
+    """Composites multiple videos together (stack or a rows x cols grid scaled to size)."""
+    return await _run(ctx, process_composite_videos, video_paths, method, size, output_path, rows, cols, fill_color, hold_last_frame)
 
 @mcp.tool()
-def text_overlay(video_path: str, text: str, fontsize: int = 50, color: str = "white", position: str = "center", duration: Optional[float] = None, start_time: float = 0.0, output_path: Optional[str] = None) -> str:
+async def text_overlay(video_path: str, text: str, fontsize: int = 50, color: str = "white", position: str = "center", duration: Optional[float] = None, start_time: float = 0.0, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Overlays text on a video."""
     # Simplified position for MCP tool
-    return process_text_overlay(video_path, text, fontsize, color, position, duration, start_time, output_path)
+    return await _run(ctx, process_text_overlay, video_path, text, fontsize, color, position, duration, start_time, output_path)
 
 @mcp.tool()
-def image_overlay(video_path: str, image_path: str, position: str = "center", scale: Optional[float] = None, opacity: float = 1.0, duration: Optional[float] = None, start_time: float = 0.0, output_path: Optional[str] = None) -> str:
+async def image_overlay(video_path: str, image_path: str, position: str = "center", scale: Optional[float] = None, opacity: float = 1.0, duration: Optional[float] = None, start_time: float = 0.0, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Overlays an image on a video."""
-    return process_image_overlay(video_path, image_path, position, scale, opacity, duration, start_time, output_path)
+    return await _run(ctx, process_image_overlay, video_path, image_path, position, scale, opacity, duration, start_time, output_path)
 
 @mcp.tool()
-def color_effect(video_path: str, effect_type: str, factor: float = 1.0, output_path: Optional[str] = None) -> str:
+async def color_effect(video_path: str, effect_type: str, factor: float = 1.0, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Applies a color effect (blackwhite, brightness, invert, contrast)."""
-    return process_color_effect(video_path, effect_type, factor, output_path)
+    return await _run(ctx, process_color_effect, video_path, effect_type, factor, output_path)
 
 @mcp.tool()
-def mirror_video(video_path: str, axis: str = "x", output_path: Optional[str] = None) -> str:
+async def mirror_video(video_path: str, axis: str = "x", output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Mirrors a video along the x or y axis."""
-    return process_mirror_video(video_path, axis, output_path)
+    return await _run(ctx, process_mirror_video, video_path, axis, output_path)
 
 @mcp.tool()
-def rotate_video(video_path: str, angle: float, output_path: Optional[str] = None) -> str:
+async def rotate_video(video_path: str, angle: float, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Rotates a video by a given angle."""
-    return process_rotate_video(video_path, angle, output_path)
+    return await _run(ctx, process_rotate_video, video_path, angle, output_path)
+
+@mcp.tool()
+async def crop_video(video_path: str, x1: Optional[int] = None, y1: Optional[int] = None, x2: Optional[int] = None, y2: Optional[int] = None, width: Optional[int] = None, height: Optional[int] = None, output_path: Optional[str] = None, auto_crop: bool = False, ctx: Context = None) -> str:
+    """Crops a video, to the given rectangle or with auto_crop to the picture inside its black borders."""
+    return await _run(ctx, process_crop_video, video_path, x1, y1, x2, y2, width, height, output_path, auto_crop)
 
 @mcp.tool()
-def crop_video(video_path: str, x1: Optional[int] = None, y1: Optional[int] = None, x2: Optional[int] = None, y2: Optional[int] = None, width: Optional[int] = None, height: Optional[int] = None, output_path: Optional[str] = None) -> str:
-    """Crops a video."""
-    return process_crop_video(video_path, x1, y1, x2, y2, width, height, output_path)
+async def detect_crop(video_path: str, samples: int = 12, limit: float = 24, ctx: Context = None) -> dict:
+    """Detects black borders (letterbox/pillarbox) from sampled frames and returns the picture rectangle for crop_video."""
+    return await _run(ctx, process_detect_crop, video_path, samples, limit)
 
 @mcp.tool()
-def margin_video(video_path: str, margin: int, color: Tuple[int, int, int] = (0, 0, 0), opacity: float = 1.0, output_path: Optional[str] = None) -> str:
+async def margin_video(video_path: str, margin: int, color: Tuple[int, int, int] = (0, 0, 0), opacity: float = 1.0, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Adds a margin to a video."""
-    return process_margin_video(video_path, margin, color, opacity, output_path)
+    return await _run(ctx, process_margin_video, video_path, margin, color, opacity, output_path)
+
+@mcp.tool()
+async def transform(video_path: str, steps: List[dict], output_path: Optional[str] = None, ctx: Context = None) -> str:
+    """Applies a chain of geometric steps in one resampling pass: each step is {"type": "crop"|"resize"|"rotate"|"mirror"|"margin"} plus that tool's parameters, e.g. [{"type": "crop", "x1": 0, "width": 640}, {"type": "rotate", "angle": 15}, {"type": "resize", "scale": 0.5}]."""
+    return await _run(ctx, process_transform_video, video_path, steps, output_path)
 
 @mcp.tool()
-def fade_video(video_path: str, fade_type: str, duration: float, output_path: Optional[str] = None) -> str:
+async def fade_video(video_path: str, fade_type: str, duration: float, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Adds a fade-in or fade-out effect to a video."""
-    return process_fade_video(video_path, fade_type, duration, output_path)
+    return await _run(ctx, process_fade_video, video_path, fade_type, duration, output_path)
 
 @mcp.tool()
-def loop_video(video_path: str, n: Optional[int] = None, duration: Optional[float] = None, output_path: Optional[str] = None) -> str:
+async def loop_video(video_path: str, n: Optional[int] = None, duration: Optional[float] = None, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Loops a video n times or for a specific duration."""
-    return process_loop_video(video_path, n, duration, output_path)
+    return await _run(ctx, process_loop_video, video_path, n, duration, output_path)
 
 @mcp.tool()
-def time_effect(video_path: str, effect_type: str, duration: Optional[float] = None, output_path: Optional[str] = None) -> str:
+async def time_effect(video_path: str, effect_type: str, duration: Optional[float] = None, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Applies a time effect (reverse, symmetrize, freeze)."""
-    return process_time_effect_video(video_path, effect_type, duration, output_path)
+    return await _run(ctx, process_time_effect_video, video_path, effect_type, duration, output_path)
 
 @mcp.tool()
-def audio_fade(video_path: str, fade_type: str, duration: float, output_path: Optional[str] = None) -> str:
+async def audio_fade(video_path: str, fade_type: str, duration: float, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Adds a fade-in or fade-out effect to the audio of a video."""
-    return process_audio_fade_video(video_path, fade_type, duration, output_path)
+    return await _run(ctx, process_audio_fade_video, video_path, fade_type, duration, output_path)
 
 @mcp.tool()
-def audio_loop(video_path: str, n: Optional[int] = None, duration: Optional[float] = None, output_path: Optional[str] = None) -> str:
+async def audio_loop(video_path: str, n: Optional[int] = None, duration: Optional[float] = None, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Loops the audio of a video."""
-    return process_audio_loop_video(video_path, n, duration, output_path)
+    return await _run(ctx, process_audio_loop_video, video_path, n, duration, output_path)
 
 @mcp.tool()
-def accel_decel(video_path: str, new_duration: Optional[float] = None, abscissa_fixed: float = 0.5, output_path: Optional[str] = None) -> str:
+async def accel_decel(video_path: str, new_duration: Optional[float] = None, abscissa_fixed: float = 0.5, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Applies acceleration/deceleration effect."""
-    return process_accel_decel_video(video_path, new_duration, abscissa_fixed, output_path)
+    return await _run(ctx, process_accel_decel_video, video_path, new_duration, abscissa_fixed, output_path)
 
 @mcp.tool()
-def blink(video_path: str, duration_on: float, duration_off: float, output_path: Optional[str] = None) -> str:
+async def blink(video_path: str, duration_on: float, duration_off: float, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Makes the video blink."""
-    return process_blink_video(video_path, duration_on, duration_off, output_path)
+    return await _run(ctx, process_blink_video, video_path, duration_on, duration_off, output_path)
 
 @mcp.tool()
-def gamma_correction(video_path: str, gamma: float, output_path: Optional[str] = None) -> str:
+async def gamma_correction(video_path: str, gamma: float, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Applies gamma correction."""
-    return process_gamma_correction_video(video_path, gamma, output_path)
+    return await _run(ctx, process_gamma_correction_video, video_path, gamma, output_path)
 
 @mcp.tool()
-def painting_effect(video_path: str, saturation: float = 1.4, black: float = 0.006, output_path: Optional[str] = None) -> str:
-    """Applies a painting-like effect."""
-    return process_painting_video(video_path, saturation, black, output_path)
+async def painting_effect(video_path: str, saturation: float = 1.4, black: float = 0.006, output_path: Optional[str] = None, edge_scale: float = 1.0, ctx: Context = None) -> str:
+    """Applies a painting-like effect (edge_scale < 1 finds edges at lower resolution, faster)."""
+    return await _run(ctx, process_painting_video, video_path, saturation, black, output_path, edge_scale)
 
 @mcp.tool()
-def audio_delay(video_path: str, offset: float, output_path: Optional[str] = None) -> str:
+async def audio_delay(video_path: str, offset: float, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Adds a delay to the audio."""
-    return process_audio_delay_video(video_path, offset, output_path)
+    return await _run(ctx, process_audio_delay_video, video_path, offset, output_path)
 
 @mcp.tool()
-def audio_normalize(video_path: str, output_path: Optional[str] = None) -> str:
+async def audio_normalize(video_path: str, output_path: Optional[str] = None, ctx: Context = None) -> str:
     """Normalizes the audio volume."""
-    return process_audio_normalize_video(video_path, output_path)
+    return await _run(ctx, process_audio_normalize_video, video_path, output_path)
 
 @mcp.tool()
-def detect_scenes(video_path: str, luminosity_threshold: float = 10.0) -> List[Tuple[float, float]]:
+async def detect_scenes(video_path: str, luminosity_threshold: float = 10.0, ctx: Context = None) -> List[Tuple[float, float]]:
     """Detects scenes in a video based on luminosity changes."""
-    return process_detect_scenes(video_path, luminosity_threshold)
+    return await _run(ctx, process_detect_scenes, video_path, luminosity_threshold)
+
+@mcp.tool()
+async def save_frame(video_path: str, t: float, output_path: Optional[str] = None, inline: bool = False, max_size: Optional[int] = None, ctx: Context = None) -> Union[Image, str]:
+    """Saves a single frame from the video at time t; with inline, returns it as a PNG image (fit to max_size) instead of a path."""
+    if inline:
+        return _inline(await _run(ctx, process_preview_frame, video_path, t, max_size, "png", None, INLINE_MAX_BYTES, output_path), "png")
+    return await _run(ctx, process_save_frame, video_path, t, output_path)
+
+@mcp.tool()
+async def preview_frame(video_path: str, t: float = 0.0, max_size: Optional[int] = 512, format: str = "jpeg", quality: int = 80, ctx: Context = None) -> Union[Image, str]:
+    """Returns the frame at time t as an image (jpeg, png or webp) fit to max_size, without writing a file."""
+    return _inline(await _run(ctx, process_preview_frame, video_path, t, max_size, format, quality, INLINE_MAX_BYTES), format)
+
+@mcp.tool()
+async def write_gif(video_path: str, fps: Optional[int] = None, program: str = "imageio", output_path: Optional[str] = None, inline: bool = False, max_size: Optional[int] = 320, ctx: Context = None) -> Union[Image, str]:
+    """Converts a video to a GIF; with inline, returns it as an image (fit to max_size) instead of a path."""
+    if inline:
+        return _inline(await _run(ctx, process_preview_gif, video_path, fps, max_size, INLINE_MAX_BYTES, output_path), "gif")
+    return await _run(ctx, process_write_gif, video_path, fps, program, output_path)
+
+@mcp.tool()
+async def export_ladder(video_path: str, renditions: Optional[List[Tuple[int, int]]] = None, hls: bool = True, segment_duration: float = 4.0, output_dir: Optional[str] = None, ctx: Context = None) -> str:
+    """Exports several resolutions (height, kbps) from one decode, as HLS (master.m3u8) or one MP4 per rung; returns the output directory."""
+    return await _run(ctx, process_export_ladder, video_path, renditions, hls, segment_duration, output_dir)
+
+@mcp.tool()
+async def waveform_peaks(video_path: str, start: float = 0.0, end: Optional[float] = None, max_points: int = 2000, ctx: Context = None) -> dict:
+    """Returns audio waveform min/max/RMS peaks for a time range, at most max_points of them."""
+    return await _run(ctx, process_waveform_peaks, video_path, start, end, max_points)
+
+@mcp.tool()
+async def render_timeline(timeline: Union[dict, str], output_path: Optional[str] = None, ctx: Context = None) -> str:
+    """Renders a timeline (main-track clips with effects plus caption/image overlay tracks, or a JSON file path); only segments changed since an earlier render are re-encoded."""
+    return await _run(ctx, process_render_timeline, timeline, output_path)
+
+@mcp.tool()
+async def detect_silence(video_path: str, threshold_db: float = -40.0, min_silence: float = 0.5, window: float = 0.05, ctx: Context = None) -> List[Tuple[float, float]]:
+    """Finds silent (start, end) intervals quieter than threshold_db lasting at least min_silence seconds."""
+    return await _run(ctx, process_detect_silence, video_path, threshold_db, min_silence, window)
+
+@mcp.tool()
+async def trim_silence(video_path: str, threshold_db: float = -40.0, min_silence: float = 0.5, padding: float = 0.1, output_path: Optional[str] = None, ctx: Context = None) -> str:
+    """Removes silences longer than min_silence (keeping padding seconds at each edge) in a single render."""
+    return await _run(ctx, process_trim_silence, video_path, threshold_db, min_silence, padding, output_path)
+
+@mcp.tool()
+async def storage_usage() -> dict:
+    """Reports storage used by generated outputs, with quota and TTL settings."""
+    return await asyncio.to_thread(storage.get_manager().usage)
 
 @mcp.tool()
-def save_frame(video_path: str, t: float, output_path: Optional[str] = None) -> str:
-    """Saves a single frame from the video at time t."""
-    return process_save_frame(video_path, t, output_path)
+async def pin_output(path: str, pinned: bool = True, ttl_seconds: Optional[float] = None) -> dict:
+    """Pins an output so it is never evicted (or unpins it), optionally changing its TTL."""
+    return await asyncio.to_thread(storage.get_manager().set_retention, path, pinned, ttl_seconds)
 
 @mcp.tool()
-def write_gif(video_path: str, fps: Optional[int] = None, program: str = "imageio", output_path: Optional[str] = None) -> str:
-    """Converts a video to a GIF."""
-    return process_write_gif(video_path, fps, program, output_path)
+async def conform_video(video_path: str, force: bool = False) -> dict:
+    """Queues a background conform of a hard-to-seek source to an edit-friendly mezzanine and reports its status."""
+    return await asyncio.to_thread(conform.request, video_path, force)
 
 if __name__ == "__main__":
+    # stdio has no HTTP app to hang /metrics on, so serve it on a side port when asked
+    if os.environ.get("MCP_METRICS_PORT"):
+        metrics.start_http_server(int(os.environ["MCP_METRICS_PORT"]))
     mcp.run()
@@ -0,0 +1,358 @@
+import abc
+import contextvars
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, List
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+DEFAULT_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0)
+FPS_BUCKETS = (1.0, 5.0, 10.0, 24.0, 30.0, 60.0, 120.0, 240.0, 480.0, 1000.0)
+
+_registry = []
+# Called by render() before every scrape
+_collectors = []
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = [(k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in pairs]
+    return "{" + ",".join(f'{k}="{v}"' for k, v in escaped) + "}"
+
+class _Metric(abc.ABC):
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    @abc.abstractmethod
+    def _samples(self) -> List[str]:
+        """
+        Exposition lines of every labelled value, called with the lock held.
+        """
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return "\n".join(lines)
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in self._values.items()]
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def _samples(self):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in self._values.items()]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # [per-bucket counts, sum, count]; the +Inf bucket is the count
+            entry = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    def _samples(self):
+        lines = []
+        for key, (counts, total, count) in self._values.items():
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', bound))} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+OPERATION_REQUESTS = Counter("video_operation_requests_total", "Number of video operations started.", ("operation",))
+OPERATION_ERRORS = Counter("video_operation_errors_total", "Number of video operations that raised an error.", ("operation",))
+OPERATION_LATENCY = Histogram("video_operation_duration_seconds", "Wall time of video operations.", ("operation",))
+OPERATIONS_IN_PROGRESS = Gauge("video_operations_in_progress", "Video operations currently running.", ("operation",))
+STAGE_SECONDS = Histogram("video_render_stage_seconds", "Time spent per render stage (decode, effect, encode) in each operation.", ("operation", "stage"))
+RENDER_FPS = Histogram("video_render_fps", "Frames per second achieved while rendering.", ("operation",), buckets=FPS_BUCKETS)
+FRAMES_WRITTEN = Counter("video_frames_written_total", "Number of video frames sent to the encoder.", ("operation",))
+BYTES_READ = Counter("video_bytes_read_total", "Bytes of source media opened for reading.", ("operation",))
+BYTES_WRITTEN = Counter("video_bytes_written_total", "Bytes of output media written.", ("operation",))
+WORKERS_BUSY = Gauge("video_worker_threads_busy", "Worker threads currently running blocking calls.")
+WORKERS_TOTAL = Gauge("video_worker_threads_total", "Size of the worker thread pool.")
+WORKERS_WAITING = Gauge("video_worker_threads_waiting", "Calls queued waiting for a free worker thread.")
+
+class RenderStats:
+    """
+    Per-operation accumulator filled in by the moviepy reader/writer hooks and the frame
+    loops, from every thread of the render (prefetch, effects, encode): update it with add().
+    """
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.decode_seconds = 0.0
+        self.effect_seconds = 0.0
+        self.encode_seconds = 0.0
+        self.render_seconds = 0.0
+        self.frames = 0
+        self.bytes_read = 0
+        # Busy time per (attribute, thread), for a stage to leave out work done inside it
+        self._thread_seconds = {}
+        self._lock = threading.Lock()
+
+    def add(self, attribute: str, amount: float):
+        with self._lock:
+            setattr(self, attribute, getattr(self, attribute) + amount)
+            key = (attribute, threading.get_ident())
+            self._thread_seconds[key] = self._thread_seconds.get(key, 0) + amount
+
+    def thread_seconds(self, attribute: str) -> float:
+        """
+        What the calling thread has added to attribute so far.
+        """
+        with self._lock:
+            return self._thread_seconds.get((attribute, threading.get_ident()), 0.0)
+
+_current_stats = contextvars.ContextVar("render_stats", default=None)
+
+def current_stats():
+    return _current_stats.get()
+
+@contextmanager
+def _timed(attribute: str):
+    stats = _current_stats.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add(attribute, time.perf_counter() - started)
+
+@contextmanager
+def timed_effects(waited: Callable[[], float] = lambda: 0.0):
+    """
+    Adds the block's time to the render's effect stage, less the decoding done meanwhile on
+    this thread and the growth of waited (a running total of time spent waiting for input).
+    Used by the frame loops whose stages overlap, where effect time cannot be derived.
+    """
+    stats = _current_stats.get()
+    if stats is None:
+        yield
+        return
+    started, decoded, waiting = time.perf_counter(), stats.thread_seconds("decode_seconds"), waited()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        elapsed -= stats.thread_seconds("decode_seconds") - decoded + waited() - waiting
+        stats.add("effect_seconds", max(0.0, elapsed))
+
+def add_effect_seconds(seconds: float):
+    """
+    Adds effect time measured elsewhere (in an effect worker process) to the current render.
+    """
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.add("effect_seconds", seconds)
+
+@contextmanager
+def track_render():
+    """
+    Measures the frame loop of a single write (used by write_video). Unless the loop timed
+    its effects itself, it ran its stages one after the other, and whatever was not decoding
+    or encoding was effects.
+    """
+    stats = _current_stats.get()
+    if stats is None:
+        yield
+        return
+    stages = lambda: (stats.decode_seconds, stats.effect_seconds, stats.encode_seconds)
+    before, started = stages(), time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.add("render_seconds", elapsed)
+        decoded, effects, encoded = (after - start for after, start in zip(stages(), before))
+        if effects == 0:
+            stats.add("effect_seconds", max(0.0, elapsed - decoded - encoded))
+
+def _observe(stats: RenderStats, wall: float):
+    operation = stats.operation
+    STAGE_SECONDS.observe(stats.decode_seconds, operation=operation, stage="decode")
+    STAGE_SECONDS.observe(stats.encode_seconds, operation=operation, stage="encode")
+    # Without a frame loop (frames grabbed for a preview), all but decode and encode is effects
+    effect = stats.effect_seconds if stats.render_seconds else max(0.0, wall - stats.decode_seconds - stats.encode_seconds)
+    STAGE_SECONDS.observe(effect, operation=operation, stage="effect")
+    if stats.frames:
+        FRAMES_WRITTEN.inc(stats.frames, operation=operation)
+        if stats.render_seconds > 0:
+            RENDER_FPS.observe(stats.frames / stats.render_seconds, operation=operation)
+    if stats.bytes_read:
+        BYTES_READ.inc(stats.bytes_read, operation=operation)
+
+def track_operation(operation: str):
+    """
+    Decorator reporting request/error counts, latency and render stage timings for an operation.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            stats = RenderStats(operation)
+            token = _current_stats.set(stats)
+            OPERATION_REQUESTS.inc(operation=operation)
+            OPERATIONS_IN_PROGRESS.inc(operation=operation)
+            started = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                OPERATION_ERRORS.inc(operation=operation)
+                raise
+            else:
+                _observe(stats, time.perf_counter() - started)
+            finally:
+                OPERATIONS_IN_PROGRESS.dec(operation=operation)
+                OPERATION_LATENCY.observe(time.perf_counter() - started, operation=operation)
+                _current_stats.reset(token)
+            if isinstance(result, str) and os.path.isfile(result):
+                BYTES_WRITTEN.inc(os.path.getsize(result), operation=operation)
+            return result
+        return wrapper
+    return decorator
+
+def _wrap_timed(cls, method: str, attribute: str, count_frames: bool = False):
+    original = getattr(cls, method)
+
+    @functools.wraps(original)
+    def wrapper(self, *args, **kwargs):
+        stats = _current_stats.get()
+        if stats is None:
+            return original(self, *args, **kwargs)
+        with _timed(attribute):
+            result = original(self, *args, **kwargs)
+        if count_frames:
+            stats.add("frames", 1)
+        return result
+
+    setattr(cls, method, wrapper)
+
+def _wrap_open(cls):
+    original = cls.__init__
+
+    @functools.wraps(original)
+    def wrapper(self, filename, *args, **kwargs):
+        original(self, filename, *args, **kwargs)
+        stats = _current_stats.get()
+        if stats is not None and isinstance(filename, str) and os.path.isfile(filename):
+            stats.add("bytes_read", os.path.getsize(filename))
+
+    cls.__init__ = wrapper
+
+_hooks_installed = False
+_hooks_lock = threading.Lock()
+
+def install_hooks():
+    """
+    Patches moviepy's ffmpeg readers and writers so every render reports
+    decode/encode time, frame counts and bytes read without per-function changes.
+    """
+    global _hooks_installed
+    with _hooks_lock:
+        if _hooks_installed:
+            return
+        from moviepy.audio.io.ffmpeg_audiowriter import FFMPEG_AudioWriter
+        from moviepy.audio.io.readers import FFMPEG_AudioReader
+        from moviepy.video.io.ffmpeg_reader import FFMPEG_VideoReader
+        from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+
+        _wrap_open(FFMPEG_VideoReader)
+        _wrap_timed(FFMPEG_VideoReader, "get_frame", "decode_seconds")
+        _wrap_timed(FFMPEG_AudioReader, "read_chunk", "decode_seconds")
+        _wrap_timed(FFMPEG_VideoWriter, "write_frame", "encode_seconds", count_frames=True)
+        _wrap_timed(FFMPEG_AudioWriter, "write_frames", "encode_seconds")
+        _hooks_installed = True
+
+def update_worker_pool(busy: int, total: int, waiting: int):
+    WORKERS_BUSY.set(busy)
+    WORKERS_TOTAL.set(total)
+    WORKERS_WAITING.set(waiting)
+
+def add_collector(collect: Callable[[], None]):
+    """
+    Registers collect to run at the start of every render(), for gauges sampled when
+    scraped rather than updated as things happen, such as worker pool usage.
+    """
+    _collectors.append(collect)
+
+def render() -> str:
+    for collect in list(_collectors):
+        try:
+            collect()
+        except Exception:
+            # Its gauges keep their last values; the scrape itself must not fail
+            pass
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def start_http_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """
+    Serves /metrics from a daemon thread (used by the stdio MCP server, which has no HTTP app).
+    """
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
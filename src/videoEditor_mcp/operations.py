@@ -0,0 +1,33 @@
+"""
+Lazy stand-ins for the video_utils entry points.
+
+video_utils pulls in moviepy (with its imageio/ffmpeg discovery), OpenCV and PIL.
+The MCP server and the API routers import their operations from here instead, so
+listing tools or answering a first request does not pay for any of that; video_utils
+is imported on the first call of any operation.
+"""
+OPERATIONS = (
+    "generate_simple_video", "process_cut_video", "process_concatenate_videos",
+    "process_resize_video", "process_speed_video", "process_volume_video",
+    "process_extract_audio", "process_composite_videos", "process_text_overlay",
+    "process_image_overlay", "process_color_effect", "process_mirror_video",
+    "process_rotate_video", "process_crop_video", "process_margin_video",
+    "process_fade_video", "process_loop_video", "process_time_effect_video",
+    "process_detect_highlights", "process_audio_fade_video", "process_audio_loop_video",
+    "process_accel_decel_video", "process_blink_video", "process_gamma_correction_video",
+    "process_painting_video", "process_audio_delay_video", "process_audio_normalize_video",
+    "process_detect_scenes", "process_save_frame", "process_write_gif",
+    "process_export_ladder", "process_waveform_peaks", "process_detect_silence", "process_trim_silence",
+    "process_render_timeline", "process_transform_video", "process_preview_frame", "process_preview_gif",
+    "process_detect_crop",
+)
+
+def _lazy(name: str):
+    def call(*args, **kwargs):
+        from . import video_utils
+        return getattr(video_utils, name)(*args, **kwargs)
+    call.__name__ = call.__qualname__ = name
+    return call
+
+for _name in OPERATIONS:
+    globals()[_name] = _lazy(_name)
@@ -0,0 +1,231 @@
+"""
+Pipelined frame writing: decode, effects and encoding overlap instead of taking turns.
+
+moviepy's write_videofile reads a frame, runs the effects on it and pipes it to the encoder
+one after another on a single thread. Here three stages run concurrently, joined by bounded
+queues of PIPELINE_DEPTH frames:
+
+- decode: one thread per source reader reads the next frames ahead;
+- effects: the calling thread evaluates the clip (effects, compositing) on decoded frames;
+- encode: a feeder thread writes finished frames to the ffmpeg encoder.
+
+ffmpeg pipe I/O and most NumPy work release the GIL, so the throughput approaches that of
+the slowest stage. Time each stage spends stalled is measured, waiting on its input
+(starved) or on its output (blocked).
+"""
+import contextvars
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable
+import numpy as np
+from . import jobs, metrics
+
+# Frames buffered between two stages (0 writes with moviepy's serial loop)
+PIPELINE_DEPTH = int(os.environ.get("VIDEO_PIPELINE_DEPTH", 8))
+POLL_INTERVAL = 0.1
+# Frames a prefetching reader reads through to serve a forward jump before seeking instead
+MAX_SKIP = 100
+
+PIPELINE_STALL_SECONDS = metrics.Counter(
+    "video_pipeline_stall_seconds_total", "Time pipeline stages spent waiting for input or for room in their output queue.",
+    ("operation", "stage", "wait"),
+)
+
+_END = object()
+
+class Stalls:
+    """
+    Accumulates stall time per (stage, 'input' | 'output').
+    """
+    def __init__(self):
+        self.seconds = {}
+        self._lock = threading.Lock()
+
+    def _add(self, stage: str, wait: str, started: float):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.seconds[(stage, wait)] = self.seconds.get((stage, wait), 0.0) + elapsed
+
+    def get(self, q: queue.Queue, stage: str, abort: Callable[[], bool] = lambda: False):
+        started = time.perf_counter()
+        try:
+            while True:
+                try:
+                    return q.get(timeout=POLL_INTERVAL)
+                except queue.Empty:
+                    if abort():
+                        return _END
+        finally:
+            self._add(stage, "input", started)
+
+    def put(self, q: queue.Queue, item, stage: str, abort: Callable[[], bool] = lambda: False) -> bool:
+        started = time.perf_counter()
+        try:
+            while True:
+                try:
+                    q.put(item, timeout=POLL_INTERVAL)
+                    return True
+                except queue.Full:
+                    if abort():
+                        return False
+        finally:
+            self._add(stage, "output", started)
+
+    def to_dict(self) -> dict:
+        return {f"{stage}_{'starved' if wait == 'input' else 'blocked'}": round(seconds, 3)
+                for (stage, wait), seconds in sorted(self.seconds.items())}
+
+class PrefetchingReader:
+    """
+    Stands in for a clip's FFMPEG_VideoReader while it is read front to back: a thread reads
+    the following frames into a bounded queue while the caller works on the current one.
+    Any other access (a seek, a skipped frame) stops the thread and goes to the reader.
+    """
+    def __init__(self, reader, depth: int, stalls: Stalls):
+        self.reader = reader
+        self.depth = depth
+        self.stalls = stalls
+        self._queue = None
+        self._thread = None
+        self._stop = threading.Event()
+        # Position (as in reader.pos) and content of the frame last returned
+        self._pos = None
+        self._frame = None
+
+    def __getattr__(self, name):
+        return getattr(self.reader, name)
+
+    def _read_ahead(self):
+        reader = self.reader
+        try:
+            while reader.pos < reader.n_frames and not self._stop.is_set():
+                # get_frame of the next frame only reads it, and reports decode time to metrics
+                frame = reader.get_frame(reader.pos / reader.fps)
+                if not self.stalls.put(self._queue, (reader.pos, frame), "decode", self._stop.is_set):
+                    return
+        except Exception:
+            # The caller falls back to the reader itself, which raises the error again
+            return
+        self.stalls.put(self._queue, _END, "decode", self._stop.is_set)
+
+    def _start(self):
+        self._queue = queue.Queue(self.depth)
+        self._stop.clear()
+        # Decode time is accounted to the render, as it is when reading in the caller's thread
+        self._thread = threading.Thread(target=contextvars.copy_context().run, args=(self._read_ahead,),
+                                        name="frame-prefetch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def get_frame(self, t: float):
+        pos = self.reader.get_frame_number(t) + 1
+        if pos == self._pos:
+            return self._frame
+        if self._thread is not None and self._pos < pos <= self._pos + MAX_SKIP:
+            # Frames in between (a source with a higher frame rate than the output) are dropped
+            while (item := self.stalls.get(self._queue, "effects", lambda: not self._thread.is_alive())) is not _END:
+                self._pos, self._frame = item
+                if self._pos >= pos:
+                    break
+            if self._pos == pos:
+                return self._frame
+        self.stop()
+        self._frame = self.reader.get_frame(t)
+        self._pos = self.reader.pos
+        if self.reader.pos < self.reader.n_frames:
+            self._start()
+        return self._frame
+
+@contextmanager
+def prefetching(clips: Iterable, depth: int, stalls: Stalls):
+    """
+    Swaps the readers of clips (VideoFileClips, which every derived clip reads through)
+    for PrefetchingReaders for the duration of the block.
+    """
+    swapped = []
+    try:
+        for clip in clips:
+            reader = getattr(clip, "reader", None)
+            if reader is not None and not isinstance(reader, PrefetchingReader):
+                clip.reader = PrefetchingReader(reader, depth, stalls)
+                swapped.append((clip, reader))
+        yield
+    finally:
+        for clip, reader in swapped:
+            clip.reader.stop()
+            clip.reader = reader
+
+class CanvasRing:
+    """
+    Preallocated frames handed out in turn to a frame function that draws its output into
+    one. A frame is handed out again only after count - 1 others: with the default of
+    PIPELINE_DEPTH + 2, once it has left the queue, the encoder and the effects stage.
+    Every frame starts out as a copy of fill (an array or a colour), when given.
+    """
+    def __init__(self, shape: tuple, fill=None, count: int = None, dtype=np.uint8):
+        self.frames = [np.empty(shape, dtype) for _ in range(count or PIPELINE_DEPTH + 2)]
+        if fill is not None:
+            for frame in self.frames:
+                frame[:] = fill
+        self._next = 0
+
+    def next(self) -> np.ndarray:
+        frame = self.frames[self._next]
+        self._next = (self._next + 1) % len(self.frames)
+        return frame
+
+def write_frames(clip, writer, fps: float, logger, sources: Iterable = (), depth: int = PIPELINE_DEPTH) -> Stalls:
+    """
+    Renders every frame of clip at fps into writer (an FFMPEG_VideoWriter) through the
+    decode/effects/encode pipeline, prefetching from the readers of sources.
+    A frame returned by clip.get_frame must not be modified until depth + 1 more have been
+    returned (see CanvasRing).
+    """
+    stalls = Stalls()
+    frames = queue.Queue(depth)
+    errors = []
+
+    def feed():
+        try:
+            while (frame := stalls.get(frames, "encode")) is not _END:
+                writer.write_frame(frame)
+        except BaseException as e:
+            errors.append(e)
+
+    feeder = threading.Thread(target=contextvars.copy_context().run, args=(feed,), name="frame-encoder", daemon=True)
+    encoder_gone = lambda: not feeder.is_alive()
+    with prefetching(sources, depth, stalls):
+        feeder.start()
+        try:
+            # Waits for prefetched frames are stalls, not effect time
+            starved = lambda: stalls.seconds.get(("effects", "input"), 0.0)
+            for index in logger.iter_bar(frame_index=range(int(clip.duration * fps))):
+                with metrics.timed_effects(starved):
+                    frame = clip.get_frame(index / fps)
+                    if frame.dtype != np.uint8:
+                        frame = frame.astype("uint8")
+                if not stalls.put(frames, frame, "effects", encoder_gone):
+                    break
+        finally:
+            stalls.put(frames, _END, "effects", encoder_gone)
+            feeder.join()
+    if errors:
+        raise errors[0]
+
+    stats = metrics.current_stats()
+    operation = stats.operation if stats is not None else ""
+    for (stage, wait), seconds in stalls.seconds.items():
+        PIPELINE_STALL_SECONDS.inc(seconds, operation=operation, stage=stage, wait=wait)
+    job = jobs.current_job()
+    if job is not None:
+        job.details["pipeline_stalls"] = stalls.to_dict()
+    return stalls
@@ -0,0 +1,185 @@
+import contextvars
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Optional, Tuple
+from . import conform, jobs, metrics
+
+# Idle readers kept open across calls (each holds up to two ffmpeg processes: video and audio)
+POOL_SIZE = int(os.environ.get("VIDEO_READER_POOL_SIZE", 8))
+# Idle readers unused for this many seconds are closed
+IDLE_SECONDS = float(os.environ.get("VIDEO_READER_IDLE_SECONDS", 60))
+# FFMPEG_VideoReader reads through forward seeks up to this many frames instead of restarting
+FORWARD_READ_FRAMES = 100
+
+READER_HITS = metrics.Counter("video_reader_pool_hits_total", "Video opens served by an already running reader.")
+READER_MISSES = metrics.Counter("video_reader_pool_misses_total", "Video opens that had to start a new reader.")
+READERS_IDLE = metrics.Gauge("video_reader_pool_idle", "Open readers waiting in the pool.")
+
+# Clips the current call has borrowed, so a writer can find the readers its frames come from
+_open_clips = contextvars.ContextVar("open_clips", default=())
+
+def _closed_by_kill(clip) -> bool:
+    # A cancelled job kills its readers' ffmpeg processes; those cannot be reused
+    for reader in (clip.reader, getattr(clip.audio, "reader", None)):
+        proc = getattr(reader, "proc", None)
+        if proc is not None and (proc.poll() or 0) < 0:
+            return True
+    return False
+
+class ReaderPool:
+    """
+    Process-wide LRU of open VideoFileClips keyed by path, mtime, size and decode options.
+    A clip is lent to one caller at a time; on return it stays open (ffmpeg process included)
+    until it is the least recently used beyond POOL_SIZE or sits idle for IDLE_SECONDS.
+    """
+    def __init__(self, size: int = POOL_SIZE, idle_seconds: float = IDLE_SECONDS):
+        self.size = size
+        self.idle_seconds = idle_seconds
+        # (key, id) -> (clip, returned_at), oldest first
+        self._idle = OrderedDict()
+        self._lock = threading.Lock()
+        self._sweeper = None
+
+    @staticmethod
+    def _key(path: str, target_resolution) -> tuple:
+        stat = os.stat(path)
+        return (path, stat.st_mtime_ns, stat.st_size, tuple(target_resolution) if target_resolution else None)
+
+    def _take(self, key: tuple, t: float):
+        """
+        Picks the idle reader for key that reaches frame t cheapest: one just behind it
+        reads forward, anything else restarts ffmpeg at t (still skipping the probe).
+        """
+        best, best_distance = None, None
+        for entry_key, (clip, _) in self._idle.items():
+            if entry_key[0] != key:
+                continue
+            reader = clip.reader
+            distance = reader.get_frame_number(t) + 1 - reader.pos
+            if not 0 <= distance <= FORWARD_READ_FRAMES:
+                distance = FORWARD_READ_FRAMES + 1
+            if best is None or distance < best_distance:
+                best, best_distance = entry_key, distance
+        if best is None:
+            return None
+        clip, _ = self._idle.pop(best)
+        READERS_IDLE.set(len(self._idle))
+        return clip
+
+    def acquire(self, path: str, t: float = 0.0, target_resolution: Tuple[int, int] = None):
+        from moviepy import VideoFileClip
+
+        key = self._key(path, target_resolution)
+        with self._lock:
+            clip = self._take(key, t)
+        if clip is not None:
+            READER_HITS.inc()
+        else:
+            READER_MISSES.inc()
+            clip = VideoFileClip(path, target_resolution=target_resolution)
+        clip._pool_key = key
+        return clip
+
+    def release(self, clip, reusable: bool = True):
+        if not reusable or self.size <= 0 or _closed_by_kill(clip):
+            clip.close()
+            return
+        evicted = []
+        with self._lock:
+            self._idle[(clip._pool_key, id(clip))] = (clip, time.monotonic())
+            while len(self._idle) > self.size:
+                evicted.append(self._idle.popitem(last=False)[1][0])
+            READERS_IDLE.set(len(self._idle))
+            self._start_sweeper()
+        for old in evicted:
+            old.close()
+
+    def evict_idle(self, older_than: float = None) -> int:
+        """
+        Closes idle readers returned more than older_than seconds ago (all of them if None).
+        """
+        now = time.monotonic()
+        with self._lock:
+            expired = [key for key, (_, returned_at) in self._idle.items()
+                       if older_than is None or now - returned_at >= older_than]
+            clips = [self._idle.pop(key)[0] for key in expired]
+            READERS_IDLE.set(len(self._idle))
+        for clip in clips:
+            clip.close()
+        return len(clips)
+
+    def discard(self, path: str) -> int:
+        """
+        Closes idle readers of path, e.g. before the file is deleted or replaced.
+        """
+        with self._lock:
+            keys = [key for key in self._idle if key[0][0] == path]
+            clips = [self._idle.pop(key)[0] for key in keys]
+            READERS_IDLE.set(len(self._idle))
+        for clip in clips:
+            clip.close()
+        return len(clips)
+
+    def _start_sweeper(self):
+        if self._sweeper is not None or self.idle_seconds <= 0:
+            return
+
+        def sweep():
+            while True:
+                time.sleep(max(self.idle_seconds / 2, 1))
+                self.evict_idle(self.idle_seconds)
+
+        self._sweeper = threading.Thread(target=sweep, name="reader-pool-sweeper", daemon=True)
+        self._sweeper.start()
+
+pool = ReaderPool()
+
+def _forget(clip):
+    _open_clips.set(tuple(c for c in _open_clips.get() if c is not clip))
+
+@contextmanager
+def open_video(path: str, t: float = 0.0, target_resolution: Tuple[int, int] = None):
+    """
+    Borrows an open VideoFileClip for path from the pool, preferring one positioned near t.
+    Use instead of `with VideoFileClip(path) as clip:`; the clip must not be used after the block.
+    Sources with a conformed mezzanine are read from it instead (see conform.py).
+    """
+    with conform.editable(path) as source:
+        with _borrow(source, t, target_resolution) as clip:
+            yield clip
+
+@contextmanager
+def _borrow(path: str, t: float, target_resolution: Optional[Tuple[int, int]]):
+    clip = pool.acquire(path, t, target_resolution)
+    job: Optional[jobs.Job] = jobs.current_job()
+    readers = [r for r in (clip.reader, getattr(clip.audio, "reader", None)) if r is not None]
+    _open_clips.set(_open_clips.get() + (clip,))
+    try:
+        if job is not None:
+            # Reused readers never re-run the start hook, so register them with this job here
+            for reader in readers:
+                job.track_resource(reader)
+        yield clip
+    except BaseException:
+        _forget(clip)
+        if job is not None:
+            for reader in readers:
+                job.untrack_resource(reader)
+        pool.release(clip, reusable=False)
+        raise
+    else:
+        _forget(clip)
+        if job is not None:
+            for reader in readers:
+                job.untrack_resource(reader)
+        # Checked after untracking: a cancel racing with us may already have killed them
+        pool.release(clip, reusable=job is None or not job.cancel_reason)
+
+def open_clips() -> tuple:
+    """
+    The clips borrowed with open_video in the current call and not yet returned.
+    """
+    return _open_clips.get()
@@ -3,12 +3,15 @@ from starlette.concurrency import run_in_threadpool
 from fastapi.concurrency import run_in_threadpool
 from ..schemas import (
     VolumeRequest, AudioExtractRequest, AudioFadeRequest, AudioLoopRequest,
-    AudioDelayRequest, AudioNormalizeRequest, ResponseModel
+    AudioDelayRequest, AudioNormalizeRequest, WaveformRequest, DetectSilenceRequest, TrimSilenceRequest,
+    ResponseModel
 )
-from ..video_utils import (
+from ..operations import (
     process_volume_video, process_extract_audio, process_audio_fade_video, process_audio_loop_video,
-    process_audio_delay_video, process_audio_normalize_video
+    process_audio_delay_video, process_audio_normalize_video, process_waveform_peaks,
+    process_detect_silence, process_trim_silence
 )
+from ..jobs import RenderCancelled
 import os
 
 router = APIRouter(prefix="/audio", tags=["audio"])
@@ -24,6 +27,8 @@ async def delay_audio(request: AudioDelayRequest):
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -38,6 +43,8 @@ async def normalize_audio(request: AudioNormalizeRequest):
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -52,6 +59,8 @@ async def adjust_volume(request: VolumeRequest):
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -66,6 +75,8 @@ async def extract_audio(request: AudioExtractRequest):
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -84,6 +95,8 @@ async def fade_audio(request: AudioFadeRequest):
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -102,5 +115,56 @@ async def loop_audio(request: AudioLoopRequest):
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/waveform", response_model=ResponseModel)
+async def waveform_peaks(request: WaveformRequest):
+    try:
+        peaks = await run_in_threadpool(
+            process_waveform_peaks, request.video_path, request.start, request.end, request.max_points
+        )
+        return ResponseModel(status="success", data=peaks)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/detect-silence", response_model=ResponseModel)
+async def detect_silence(request: DetectSilenceRequest):
+    try:
+        silences = await run_in_threadpool(
+            process_detect_silence, request.video_path, request.threshold_db, request.min_silence, request.window
+        )
+        return ResponseModel(status="success", data=silences)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/trim-silence", response_model=ResponseModel)
+async def trim_silence(request: TrimSilenceRequest):
+    try:
+        output_path = await run_in_threadpool(
+            process_trim_silence, request.video_path, request.threshold_db, request.min_silence,
+            request.padding, request.output_path
+        )
+        return ResponseModel(status="success", output_path=output_path)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
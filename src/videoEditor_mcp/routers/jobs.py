@@ -0,0 +1,63 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from .. import jobs
+import asyncio
+import json
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+# How often the event stream checks the job for changes
+POLL_INTERVAL = 0.25
+KEEPALIVE_INTERVAL = 15.0
+
+@router.get("")
+async def list_jobs():
+    return [job.to_dict() for job in jobs.list_jobs()]
+
+@router.get("/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
+@router.post("/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    if job.finished:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} already {job.status}")
+    job.cancel("cancelled")
+    return job.to_dict()
+
+@router.get("/{job_id}/events")
+async def job_events(job_id: str):
+    # The stream may be opened right before the render request arrives
+    job = jobs.get_job(job_id)
+    for _ in range(20):
+        if job is not None:
+            break
+        await asyncio.sleep(POLL_INTERVAL)
+        job = jobs.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+
+    async def event_stream():
+        version = -1
+        idle = 0.0
+        while True:
+            if job.version != version:
+                version = job.version
+                idle = 0.0
+                event = "end" if job.finished else "progress"
+                yield f"event: {event}\ndata: {json.dumps(job.to_dict())}\n\n"
+                if job.finished:
+                    return
+            elif idle >= KEEPALIVE_INTERVAL:
+                idle = 0.0
+                yield ": keepalive\n\n"
+            await asyncio.sleep(POLL_INTERVAL)
+            idle += POLL_INTERVAL
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
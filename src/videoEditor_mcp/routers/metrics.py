@@ -0,0 +1,26 @@
+from anyio import to_thread
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from .. import metrics
+
+router = APIRouter(tags=["metrics"])
+
+_limiter = None
+
+def _collect_worker_pool():
+    # Blocking routes run on anyio's default limiter, which belongs to the server's event
+    # loop: it is looked up from there and kept for scrapes from other threads
+    global _limiter
+    try:
+        _limiter = to_thread.current_default_thread_limiter()
+    except RuntimeError:
+        if _limiter is None:
+            return
+    statistics = _limiter.statistics()
+    metrics.update_worker_pool(statistics.borrowed_tokens, _limiter.total_tokens, statistics.tasks_waiting)
+
+metrics.add_collector(_collect_worker_pool)
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
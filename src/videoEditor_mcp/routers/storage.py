@@ -0,0 +1,62 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from ..schemas import ConformRequest, StorageRetentionRequest, ResponseModel
+from .. import conform, storage
+
+router = APIRouter(prefix="/storage", tags=["storage"])
+
+@router.get("", response_model=ResponseModel)
+async def storage_usage():
+    try:
+        return ResponseModel(status="success", data=await run_in_threadpool(storage.get_manager().usage))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/files", response_model=ResponseModel)
+async def list_files():
+    try:
+        return ResponseModel(status="success", data=await run_in_threadpool(storage.get_manager().list_files))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/retention", response_model=ResponseModel)
+async def set_retention(request: StorageRetentionRequest):
+    try:
+        record = await run_in_threadpool(
+            storage.get_manager().set_retention,
+            request.path,
+            request.pinned,
+            request.ttl_seconds
+        )
+        return ResponseModel(status="success", output_path=record["path"], data=record)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/sweep", response_model=ResponseModel)
+async def sweep():
+    try:
+        deleted = await run_in_threadpool(storage.get_manager().sweep)
+        return ResponseModel(status="success", data=deleted)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/conform", response_model=ResponseModel)
+async def conform_video(request: ConformRequest):
+    try:
+        record = await run_in_threadpool(conform.request, request.video_path, request.force)
+        return ResponseModel(status="success", output_path=record.get("mezzanine"), data=record)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/conforms", response_model=ResponseModel)
+async def list_conforms():
+    try:
+        return ResponseModel(status="success", data=await run_in_threadpool(storage.get_manager().list_conforms))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
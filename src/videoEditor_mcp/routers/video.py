@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Response
 from pydantic import BaseModel
-from ..video_utils import generate_simple_video, SAFE_DIR, process_save_frame, process_write_gif
-from ..schemas import SaveFrameRequest, WriteGifRequest, ResponseModel, VideoRequest, VideoResponse
+from ..operations import generate_simple_video, process_save_frame, process_preview_frame, process_write_gif, process_export_ladder, process_render_timeline
+from ..storage import SAFE_DIR
+from ..schemas import SaveFrameRequest, PreviewFrameRequest, WriteGifRequest, ExportLadderRequest, RenderTimelineRequest, ResponseModel, VideoRequest, VideoResponse
+from ..jobs import RenderCancelled
 import os
 import uuid
 import asyncio
@@ -19,6 +21,24 @@ async def save_frame(request: SaveFrameRequest):
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/preview-frame", response_class=Response)
+async def preview_frame(request: PreviewFrameRequest):
+    try:
+        data = await asyncio.to_thread(
+            process_preview_frame, request.video_path, request.t, request.max_size, request.format, request.quality
+        )
+        return Response(content=data, media_type=f"image/{request.format}")
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -33,6 +53,41 @@ async def write_gif(request: WriteGifRequest):
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/export-ladder", response_model=ResponseModel)
+async def export_ladder(request: ExportLadderRequest):
+    try:
+        output_dir = await asyncio.to_thread(
+            process_export_ladder, request.video_path, request.renditions, request.hls,
+            request.segment_duration, request.output_dir
+        )
+        files = sorted(os.path.relpath(os.path.join(root, name), output_dir)
+                       for root, _, names in os.walk(output_dir) for name in names)
+        return ResponseModel(status="success", output_path=output_dir, data=files)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/render-timeline", response_model=ResponseModel)
+async def render_timeline(request: RenderTimelineRequest):
+    try:
+        output_path = await asyncio.to_thread(process_render_timeline, request.timeline, request.output_path)
+        return ResponseModel(status="success", output_path=output_path)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -42,9 +97,11 @@ async def generate_video_endpoint(request: VideoRequest):
         # Create a unique filename in SAFE_DIR
         filename = str(SAFE_DIR / f"video_{uuid.uuid4()}.mp4")
         # In a real app, manage temp files or upload to storage
-        result = generate_simple_video(request.text, request.duration, filename)
+        result = await asyncio.to_thread(generate_simple_video, request.text, request.duration, filename)
         return VideoResponse(status="success", file_path=os.path.abspath(result))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
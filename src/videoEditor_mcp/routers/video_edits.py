@@ -4,16 +4,17 @@ from ..schemas import (
     CutRequest, ConcatenateRequest, ResizeRequest, SpeedRequest, ColorEffectRequest,
     MirrorRequest, RotateRequest, CropRequest, MarginRequest, FadeRequest, LoopRequest, TimeEffectRequest,
     DetectRequest, AccelDecelRequest, BlinkRequest, GammaCorrectionRequest, PaintingRequest,
-    DetectScenesRequest, ResponseModel
+    DetectScenesRequest, DetectCropRequest, TransformRequest, ResponseModel
 )
-from ..video_utils import (
+from ..operations import (
     process_cut_video, process_concatenate_videos, process_resize_video,
     process_speed_video, process_color_effect,
     process_mirror_video, process_rotate_video, process_crop_video,
     process_margin_video, process_fade_video, process_loop_video, process_time_effect_video,
     process_detect_highlights, process_accel_decel_video, process_blink_video,
-    process_gamma_correction_video, process_painting_video, process_detect_scenes
+    process_gamma_correction_video, process_painting_video, process_detect_scenes, process_detect_crop, process_transform_video
 )
+from ..jobs import RenderCancelled
 import os
 import asyncio
 from starlette.concurrency import run_in_threadpool
@@ -33,6 +34,24 @@ async def detect_scenes_endpoint(request: DetectScenesRequest):
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/detect-crop", response_model=ResponseModel)
+async def detect_crop_endpoint(request: DetectCropRequest):
+    try:
+        rectangle = await run_in_threadpool(
+            process_detect_crop, request.video_path, request.samples, request.limit
+        )
+        return ResponseModel(status="success", data=rectangle)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -51,6 +70,8 @@ async def accel_decel_video(request: AccelDecelRequest):
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -69,6 +90,8 @@ async def blink_video(request: BlinkRequest):
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -86,6 +109,8 @@ async def gamma_correction_video(request: GammaCorrectionRequest):
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -97,13 +122,16 @@ async def painting_video(request: PaintingRequest):
             request.video_path,
             request.saturation,
             request.black,
-            request.output_path
+            request.output_path,
+            request.edge_scale
         )
         return ResponseModel(status="success", output_path=output_path)
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -118,62 +146,72 @@ async def detect_highlights(request: DetectRequest):
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/cut", response_model=ResponseModel)
 async def cut_video(request: CutRequest):
     try:
-        output_path = process_cut_video(
-            request.video_path, request.start_time, request.end_time, request.output_path
+        output_path = await run_in_threadpool(
+            process_cut_video, request.video_path, request.start_time, request.end_time, request.output_path
         )
         return ResponseModel(status="success", output_path=output_path)
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/concatenate", response_model=ResponseModel)
 async def concatenate_videos(request: ConcatenateRequest):
     try:
-        output_path = process_concatenate_videos(
-            request.video_paths, request.method, request.output_path
+        output_path = await run_in_threadpool(
+            process_concatenate_videos, request.video_paths, request.method, request.output_path
         )
         return ResponseModel(status="success", output_path=output_path)
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/resize", response_model=ResponseModel)
 async def resize_video(request: ResizeRequest):
     try:
-        output_path = process_resize_video(
-            request.video_path, request.width, request.height, request.scale, request.output_path
+        output_path = await run_in_threadpool(
+            process_resize_video, request.video_path, request.width, request.height, request.scale, request.output_path
         )
         return ResponseModel(status="success", output_path=output_path)
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/speed", response_model=ResponseModel)
 async def speed_video(request: SpeedRequest):
     try:
-        output_path = process_speed_video(
-            request.video_path, request.factor, request.output_path
+        output_path = await run_in_threadpool(
+            process_speed_video, request.video_path, request.factor, request.output_path
         )
         return ResponseModel(status="success", output_path=output_path)
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -192,62 +230,88 @@ async def color_effect_video(request: ColorEffectRequest):
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/mirror", response_model=ResponseModel)
 async def mirror_video(request: MirrorRequest):
     try:
-        output_path = process_mirror_video(
-            request.video_path, request.axis, request.output_path
+        output_path = await run_in_threadpool(
+            process_mirror_video, request.video_path, request.axis, request.output_path
         )
         return ResponseModel(status="success", output_path=output_path)
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/rotate", response_model=ResponseModel)
 async def rotate_video(request: RotateRequest):
     try:
-        output_path = process_rotate_video(
-            request.video_path, request.angle, request.output_path
+        output_path = await run_in_threadpool(
+            process_rotate_video, request.video_path, request.angle, request.output_path
         )
         return ResponseModel(status="success", output_path=output_path)
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/crop", response_model=ResponseModel)
 async def crop_video(request: CropRequest):
     try:
-        output_path = process_crop_video(
-            request.video_path, request.x1, request.y1, request.x2, request.y2, request.width, request.height, request.output_path
+        output_path = await run_in_threadpool(
+            process_crop_video, request.video_path, request.x1, request.y1, request.x2, request.y2, request.width, request.height, request.output_path, request.auto_crop
         )
         return ResponseModel(status="success", output_path=output_path)
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/margin", response_model=ResponseModel)
 async def margin_video(request: MarginRequest):
     try:
-        output_path = process_margin_video(
-            request.video_path, request.margin, request.color, request.opacity, request.output_path
+        output_path = await run_in_threadpool(
+            process_margin_video, request.video_path, request.margin, request.color, request.opacity, request.output_path
         )
         return ResponseModel(status="success", output_path=output_path)
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/transform", response_model=ResponseModel)
+async def transform_video(request: TransformRequest):
+    try:
+        output_path = await run_in_threadpool(
+            process_transform_video, request.video_path, request.steps, request.output_path
+        )
+        return ResponseModel(status="success", output_path=output_path)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -266,20 +330,24 @@ async def fade_video(request: FadeRequest):
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/loop", response_model=ResponseModel)
 async def loop_video(request: LoopRequest):
     try:
-        output_path = process_loop_video(
-            request.video_path, request.n, request.duration, request.output_path
+        output_path = await run_in_threadpool(
+            process_loop_video, request.video_path, request.n, request.duration, request.output_path
         )
         return ResponseModel(status="success", output_path=output_path)
     except FileNotFoundError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -298,5 +366,7 @@ async def time_effect_video(request: TimeEffectRequest):
         raise HTTPException(status_code=404, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except RenderCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,340 @@
+import functools
+import inspect
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+from . import cores, frame_ring, jobs, metrics
+
+MB = 1024 * 1024
+HD_PIXELS = 1920 * 1080
+
+# Fixed overhead of one render: Python objects, ffmpeg binaries, audio buffers
+BASE_MEMORY = 150 * MB
+# Reference frames an H.264 decoder / x264 (lookahead + refs) keep in YUV 4:2:0
+DECODER_FRAMES = 16
+ENCODER_FRAMES = 60
+# RGB frames alive in Python at once (reader buffer, effect input and output)
+PYTHON_FRAMES = 4
+# Operations whose effects hold extra full frames (float conversions, compositing layers)
+OPERATION_MEMORY_FACTORS = {
+    "composite_videos": 2.0,
+    "painting_video": 2.0,
+    "time_effect_video": 1.5,
+    "text_overlay": 2.0,
+    "image_overlay": 2.0,
+    "color_effect": 3.0,
+    "gamma_correction_video": 3.0,
+    "rotate_video": 2.0,
+    "transform_video": 2.0,
+    # One decode, but an encoder (and scaled frames) per rung
+    "export_ladder": 3.0,
+    # Overlay layers are composited over every frame
+    "render_timeline": 2.0,
+}
+# Operations whose frame effects write_video spreads over VIDEO_EFFECT_WORKERS processes
+PARALLEL_EFFECT_OPERATIONS = {"painting_video", "color_effect", "gamma_correction_video"}
+# Interpreter and moviepy of one effect worker
+EFFECT_WORKER_MEMORY = 100 * MB
+# Operations that never decode the whole video or never encode H.264
+LIGHT_OPERATIONS = {"save_frame", "preview_frame", "preview_gif", "detect_crop", "extract_audio", "waveform_peaks", "detect_silence"}
+# A queued request may be overtaken by smaller ones at most this many times
+MAX_BYPASS = 3
+WAIT_INTERVAL = 0.5
+
+INPUT_PARAMETERS = ("video_path", "video_paths", "image_path")
+
+class AdmissionRejected(ValueError):
+    """
+    The request could never fit in the configured budgets, so it is refused before starting.
+    """
+
+def _memory_limit() -> int:
+    # Inside a container the cgroup limit, not the host RAM, is what gets us killed
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value.isdigit() and int(value) < 1 << 60:
+                return int(value)
+        except OSError:
+            continue
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return 4096 * MB
+
+def default_memory_budget() -> int:
+    if os.environ.get("VIDEO_MEMORY_BUDGET_MB"):
+        return int(float(os.environ["VIDEO_MEMORY_BUDGET_MB"]) * MB)
+    return int(_memory_limit() * 0.75)
+
+def default_cpu_budget() -> int:
+    if os.environ.get("VIDEO_CPU_BUDGET"):
+        return max(1, int(os.environ["VIDEO_CPU_BUDGET"]))
+    return os.cpu_count() or 1
+
+@dataclass
+class Cost:
+    memory: int
+    cpu: int
+    # pixels x frames x inputs, used for reporting and benchmarks
+    work: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {"memory_mb": round(self.memory / MB, 1), "cpu": self.cpu, "work": self.work}
+
+@dataclass
+class MediaInfo:
+    width: int
+    height: int
+    duration: float
+    fps: float
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+_probe_cache = {}
+_probe_lock = threading.Lock()
+
+def probe(path: str) -> Optional[MediaInfo]:
+    """
+    Reads resolution, duration and fps of a media file (cached by path, size and mtime).
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    with _probe_lock:
+        if key in _probe_cache:
+            return _probe_cache[key]
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    try:
+        infos = ffmpeg_parse_infos(path)
+    except Exception:
+        return None
+    width, height = infos.get("video_size") or (0, 0)
+    info = MediaInfo(width, height, infos.get("video_duration") or infos.get("duration") or 0.0, infos.get("video_fps") or 0.0)
+    with _probe_lock:
+        if len(_probe_cache) > 1024:
+            _probe_cache.clear()
+        _probe_cache[key] = info
+    return info
+
+def _output_pixels(operation: str, params: dict, videos: List[MediaInfo]) -> int:
+    first = videos[0]
+    if operation == "resize_video":
+        if params.get("scale"):
+            return int(first.pixels * params["scale"] ** 2)
+        width, height = params.get("width"), params.get("height")
+        if width and height:
+            return width * height
+        if width:
+            return int(first.pixels * (width / first.width) ** 2)
+        if height:
+            return int(first.pixels * (height / first.height) ** 2)
+    if operation == "render_timeline":
+        # A document (dict or model); a timeline file is costed at the default size
+        timeline = params.get("timeline")
+        fields = timeline if isinstance(timeline, dict) else getattr(timeline, "__dict__", {})
+        return int(fields.get("width", 1280)) * int(fields.get("height", 720))
+    if operation == "preview_gif" and params.get("max_size"):
+        scale = min(1.0, params["max_size"] / max(first.width, first.height))
+        return int(first.pixels * scale ** 2)
+    if operation == "composite_videos":
+        if params.get("size"):
+            return params["size"][0] * params["size"][1]
+        if params.get("method", "stack") == "stack":
+            return max(v.pixels for v in videos)
+    return first.pixels
+
+def estimate_cost(operation: str, params: dict, inputs: List[str]) -> Cost:
+    """
+    Estimates peak memory and cores of a request from its probed inputs and parameters.
+    """
+    videos = [info for info in (probe(path) for path in inputs) if info and info.pixels]
+    if not videos:
+        # Generated content (title cards) or unreadable inputs
+        return Cost(BASE_MEMORY, 1)
+
+    output_pixels = _output_pixels(operation, params, videos)
+    decoded_pixels = sum(v.pixels for v in videos)
+    if operation == "render_timeline":
+        # Segments are rendered one after another, so only one source is decoded at a time
+        decoded_pixels = max(v.pixels for v in videos)
+    if operation in ("concatenate_videos", "render_timeline"):
+        duration = sum(v.duration for v in videos)
+    else:
+        duration = max(v.duration for v in videos)
+        if params.get("n"):
+            duration *= params["n"]
+        if params.get("factor") and operation == "speed_video":
+            duration /= params["factor"]
+    fps = max(v.fps for v in videos) or 24
+    if operation == "preview_gif":
+        # Decoded up to max_duration; its frames, at most max_frames, are all kept until the GIF is written
+        if params.get("max_duration"):
+            duration = min(duration, params["max_duration"])
+        fps = params.get("fps") or fps
+        frames = duration * fps
+        if params.get("max_frames"):
+            frames = min(frames, params["max_frames"])
+
+    memory = BASE_MEMORY + decoded_pixels * 1.5 * DECODER_FRAMES
+    if operation not in LIGHT_OPERATIONS:
+        memory += output_pixels * 1.5 * ENCODER_FRAMES
+        memory += output_pixels * 3 * PYTHON_FRAMES * OPERATION_MEMORY_FACTORS.get(operation, 1.0)
+    if operation == "preview_gif":
+        # Pillow's GIF encoder keeps every frame, in palette mode (a byte a pixel)
+        memory += output_pixels * frames
+    cpu = 1 if operation in LIGHT_OPERATIONS else 1 + math.ceil((decoded_pixels + 2 * output_pixels) / HD_PIXELS)
+    workers = frame_ring.EFFECT_WORKERS
+    if operation in PARALLEL_EFFECT_OPERATIONS and workers > 1:
+        # The workers replace the in-process effect frames with their own plus the ring slots
+        memory += workers * (EFFECT_WORKER_MEMORY + output_pixels * 3 * (OPERATION_MEMORY_FACTORS.get(operation, 1.0) + frame_ring.SLOTS_PER_WORKER))
+        cpu += workers
+    return Cost(int(memory), cpu, work=float(output_pixels) * duration * fps * len(videos))
+
+class _Ticket:
+    def __init__(self, cost: Cost):
+        self.cost = cost
+        self.bypassed = 0
+        self.enqueued_at = time.perf_counter()
+
+class Scheduler:
+    """
+    Admits renders against memory and CPU budgets.
+    Requests that do not fit wait in arrival order; a smaller request may start ahead of
+    waiting ones only while none of them has already been overtaken MAX_BYPASS times.
+    """
+    def __init__(self, memory_budget: int = None, cpu_budget: int = None):
+        self.memory_budget = memory_budget or default_memory_budget()
+        self.cpu_budget = cpu_budget or default_cpu_budget()
+        self.memory_in_use = 0
+        self.cpu_in_use = 0
+        self.running = 0
+        self._queue = []
+        self._condition = threading.Condition()
+
+    def _fits(self, cost: Cost) -> bool:
+        if self.running == 0:
+            return True
+        return self.memory_in_use + cost.memory <= self.memory_budget and self.cpu_in_use + cost.cpu <= self.cpu_budget
+
+    def _may_start(self, ticket: _Ticket) -> bool:
+        if not self._fits(ticket.cost):
+            return False
+        ahead = self._queue[:self._queue.index(ticket)]
+        return all(other.bypassed < MAX_BYPASS for other in ahead)
+
+    def _update_metrics(self):
+        SCHEDULER_QUEUE_DEPTH.set(len(self._queue))
+        SCHEDULER_MEMORY.set(self.memory_in_use)
+        SCHEDULER_CPU.set(self.cpu_in_use)
+
+    def acquire(self, cost: Cost, job: Optional[jobs.Job] = None):
+        cost = Cost(cost.memory, min(cost.cpu, self.cpu_budget), cost.work)
+        if cost.memory > self.memory_budget:
+            SCHEDULER_REJECTIONS.inc()
+            raise AdmissionRejected(
+                f"Request needs about {cost.memory / MB:.0f} MB but the render memory budget is "
+                f"{self.memory_budget / MB:.0f} MB; use a lower resolution, fewer inputs or shorter clips"
+            )
+        ticket = _Ticket(cost)
+        with self._condition:
+            self._queue.append(ticket)
+            self._update_metrics()
+            try:
+                while not self._may_start(ticket):
+                    if job is not None:
+                        job.set_status("queued")
+                        job.raise_if_cancelled()
+                    self._condition.wait(WAIT_INTERVAL)
+            except BaseException:
+                self._queue.remove(ticket)
+                self._update_metrics()
+                self._condition.notify_all()
+                raise
+            index = self._queue.index(ticket)
+            for other in self._queue[:index]:
+                other.bypassed += 1
+            self._queue.remove(ticket)
+            self.memory_in_use += cost.memory
+            self.cpu_in_use += cost.cpu
+            self.running += 1
+            self._update_metrics()
+        SCHEDULER_WAIT.observe(time.perf_counter() - ticket.enqueued_at)
+        if job is not None:
+            job.set_status("running")
+            job.admitted()
+        return cost
+
+    def release(self, cost: Cost):
+        with self._condition:
+            self.memory_in_use -= cost.memory
+            self.cpu_in_use -= cost.cpu
+            self.running -= 1
+            self._update_metrics()
+            self._condition.notify_all()
+
+    def status(self) -> dict:
+        with self._condition:
+            return {
+                "memory_budget_mb": round(self.memory_budget / MB, 1),
+                "memory_in_use_mb": round(self.memory_in_use / MB, 1),
+                "cpu_budget": self.cpu_budget,
+                "cpu_in_use": self.cpu_in_use,
+                "running": self.running,
+                "queued": len(self._queue),
+            }
+
+SCHEDULER_QUEUE_DEPTH = metrics.Gauge("video_scheduler_queue_depth", "Renders waiting for admission.")
+SCHEDULER_MEMORY = metrics.Gauge("video_scheduler_memory_in_use_bytes", "Estimated memory of admitted renders.")
+SCHEDULER_CPU = metrics.Gauge("video_scheduler_cpu_in_use", "Estimated cores of admitted renders.")
+SCHEDULER_REJECTIONS = metrics.Counter("video_scheduler_rejections_total", "Renders refused because they can never fit the budgets.")
+SCHEDULER_WAIT = metrics.Histogram("video_scheduler_wait_seconds", "Time renders spent queued before admission.")
+
+scheduler = Scheduler()
+
+def track_operation(operation: str, validate: Callable[[str], str]):
+    """
+    Decorator estimating a request's cost from its input files and holding it in the
+    scheduler queue until it fits the budgets, then giving it its share of the cores.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind_partial(*args, **kwargs)
+            bound.apply_defaults()
+            params = dict(bound.arguments)
+            paths = []
+            for name in INPUT_PARAMETERS:
+                value = params.get(name)
+                paths.extend([value] if isinstance(value, str) else value or [])
+            if params.get("timeline") is not None:
+                from .timeline import input_paths
+                paths.extend(input_paths(params["timeline"], validate))
+            inputs = []
+            for path in paths:
+                try:
+                    inputs.append(validate(path))
+                except ValueError:
+                    # The operation itself reports forbidden paths
+                    pass
+            job = jobs.current_job()
+            cost = scheduler.acquire(estimate_cost(operation, params, inputs), job)
+            if job is not None:
+                job.details["cost"] = cost.to_dict()
+            try:
+                with cores.allocate(cost.cpu, job):
+                    return func(*args, **kwargs)
+            finally:
+                scheduler.release(cost)
+        return wrapper
+    return decorator
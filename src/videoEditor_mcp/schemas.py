@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from typing import List, Optional, Tuple, Union
 
 class FilePath(BaseModel):
@@ -40,6 +40,23 @@ class VolumeRequest(ClipRequest):
 class AudioExtractRequest(ClipRequest):
     output_audio_path: Optional[str] = Field(None, description="Path to save the extracted audio")
 
+class WaveformRequest(BaseModel):
+    video_path: str = Field(..., description="Path to the input video or audio file")
+    start: float = Field(0.0, description="Start of the visible range in seconds")
+    end: Optional[float] = Field(None, description="End of the visible range in seconds (default: end of file)")
+    max_points: int = Field(2000, description="Maximum peaks to return, e.g. the width of the waveform in pixels")
+
+class DetectSilenceRequest(BaseModel):
+    video_path: str = Field(..., description="Path to the input video or audio file")
+    threshold_db: float = Field(-40.0, description="Audio quieter than this (dBFS, windowed RMS) counts as silence")
+    min_silence: float = Field(0.5, description="Minimum length in seconds of a reported silence")
+    window: float = Field(0.05, description="RMS window in seconds")
+
+class TrimSilenceRequest(ClipRequest):
+    threshold_db: float = Field(-40.0, description="Audio quieter than this (dBFS, windowed RMS) counts as silence")
+    min_silence: float = Field(0.5, description="Only silences at least this long (seconds) are removed")
+    padding: float = Field(0.1, description="Seconds of silence kept on each side of a cut")
+
 class TextOverlayRequest(ClipRequest):
     text: str = Field(..., description="Text to overlay")
     fontsize: int = Field(50, description="Font size")
@@ -65,6 +82,10 @@ class CompositeRequest(BaseModel):
     output_path: Optional[str] = Field(None, description="Path to save the output video")
     size: Optional[Tuple[int, int]] = Field(None, description="Size of the final composition")
     method: str = Field("stack", description="Composition method: 'stack' or 'grid'") # simplified
+    rows: Optional[int] = Field(None, description="Number of grid rows (grid method only)")
+    cols: Optional[int] = Field(None, description="Number of grid columns (grid method only)")
+    fill_color: Tuple[int, int, int] = Field((0, 0, 0), description="Background color of empty grid cells (R, G, B)")
+    hold_last_frame: bool = Field(True, description="Hold the last frame of shorter tiles instead of filling them with fill_color")
 
 class MirrorRequest(ClipRequest):
     axis: str = Field("x", description="Axis to mirror: 'x' or 'y'")
@@ -79,6 +100,12 @@ class CropRequest(ClipRequest):
     y2: Optional[int] = Field(None, description="Bottom right y coordinate")
     width: Optional[int] = Field(None, description="Width of the crop")
     height: Optional[int] = Field(None, description="Height of the crop")
+    auto_crop: bool = Field(False, description="Crop to the picture inside black borders, detected as by /detect-crop (no coordinates allowed)")
+
+class DetectCropRequest(BaseModel):
+    video_path: str = Field(..., description="Path to the input video file")
+    samples: int = Field(12, description="Frames sampled across the video (1-100)")
+    limit: float = Field(24, description="Mean luminance (0-255) above which a row or column counts as picture")
 
 class MarginRequest(ClipRequest):
     margin: int = Field(..., description="Margin size")
@@ -122,6 +149,7 @@ class GammaCorrectionRequest(ClipRequest):
 class PaintingRequest(ClipRequest):
     saturation: float = Field(1.4, description="Saturation factor")
     black: float = Field(0.006, description="Black level")
+    edge_scale: float = Field(1.0, description="Resolution (as a fraction) at which edges are found; lower is faster with softer lines")
 
 class DetectScenesRequest(BaseModel):
     video_path: str = Field(..., description="Path to the input video file")
@@ -137,10 +165,88 @@ class SaveFrameRequest(ClipRequest):
     t: float = Field(..., description="Time in seconds to save the frame")
     output_image_path: Optional[str] = Field(None, description="Path to save the frame image")
 
+class PreviewFrameRequest(BaseModel):
+    video_path: str = Field(..., description="Path to the input video file")
+    t: float = Field(0.0, description="Time in seconds of the frame")
+    max_size: Optional[int] = Field(512, description="Longest side of the image in pixels (never upscaled); null keeps the video size")
+    format: str = Field("jpeg", description="Image format: 'jpeg', 'png' or 'webp'")
+    quality: int = Field(80, description="Encoder quality for jpeg/webp (1-100)")
+
 class WriteGifRequest(ClipRequest):
     fps: Optional[int] = Field(None, description="Frames per second for the GIF")
     program: str = Field("imageio", description="Program to use: 'imageio' or 'ffmpeg'")
 
+class StorageRetentionRequest(BaseModel):
+    path: str = Field(..., description="Path of an output in the storage directory")
+    pinned: Optional[bool] = Field(None, description="Pin (true) to protect from eviction, or unpin (false)")
+    ttl_seconds: Optional[float] = Field(None, description="Lifetime since last access in seconds (0 = keep forever)")
+
+class ConformRequest(BaseModel):
+    video_path: str = Field(..., description="Path to the source video to conform")
+    force: bool = Field(False, description="Analyse and conform again even if the source already has a record")
+
+class ExportLadderRequest(BaseModel):
+    video_path: str = Field(..., description="Path to the input video file")
+    renditions: Optional[List[Tuple[int, int]]] = Field(None, description="(height, video kbps) rungs; default 1080/720/480/360p without upscaling")
+    hls: bool = Field(True, description="Package as HLS segments with a master playlist instead of one MP4 per rung")
+    segment_duration: float = Field(4.0, description="HLS segment (and keyframe) interval in seconds")
+    output_dir: Optional[str] = Field(None, description="Directory for the renditions")
+
+class TimelineEffect(BaseModel):
+    type: str = Field(..., description="'fade_in', 'fade_out', 'audio_fade_in', 'audio_fade_out' (value: seconds), 'speed', 'volume', 'brightness', 'contrast', 'gamma' (value: factor), 'blackwhite', 'invert', 'mirror_x', 'mirror_y'")
+    value: Optional[float] = Field(None, description="Duration or factor, depending on the effect")
+
+class TimelineClip(BaseModel):
+    source: str = Field(..., description="Source video, absolute or relative to the storage directory")
+    start: float = Field(0.0, description="In-point in the source in seconds")
+    end: Optional[float] = Field(None, description="Out-point in the source in seconds (default: end of the source)")
+    effects: List[TimelineEffect] = Field(default_factory=list, description="Effects applied to this clip, in order")
+
+class TimelineOverlay(BaseModel):
+    start: float = Field(..., description="Timeline time the overlay appears at, in seconds")
+    duration: float = Field(..., description="How long the overlay is shown, in seconds")
+    text: Optional[str] = Field(None, description="Caption text (either text or image_path)")
+    image_path: Optional[str] = Field(None, description="Image to overlay, absolute or relative to the storage directory")
+    fontsize: int = Field(50, description="Font size of the caption")
+    color: str = Field("white", description="Caption color")
+    position: Union[str, Tuple[int, int]] = Field("center", description="Position: 'center', 'top', 'bottom' or (x, y)")
+    scale: Optional[float] = Field(None, description="Scale of the image")
+    opacity: float = Field(1.0, description="Opacity (0.0 to 1.0)")
+
+    @model_validator(mode="after")
+    def _text_or_image(self):
+        if (self.text is None) == (self.image_path is None):
+            raise ValueError("An overlay needs either text or image_path")
+        return self
+
+class Timeline(BaseModel):
+    width: int = Field(1280, description="Output width")
+    height: int = Field(720, description="Output height")
+    fps: float = Field(30.0, description="Output frame rate")
+    clips: List[TimelineClip] = Field(..., description="The main track: clips played one after another")
+    overlay_tracks: List[List[TimelineOverlay]] = Field(default_factory=list, description="Tracks of captions/images over the main track; later tracks are drawn on top")
+
+class RenderTimelineRequest(BaseModel):
+    timeline: Union[Timeline, str] = Field(..., description="Timeline document, or the path of a JSON file holding one")
+    output_path: Optional[str] = Field(None, description="Path to save the output video")
+
+class TransformStep(BaseModel):
+    type: str = Field(..., description="'crop', 'resize', 'rotate', 'mirror' or 'margin'; the other fields are that tool's parameters")
+    x1: Optional[int] = Field(None, description="crop: top left x coordinate")
+    y1: Optional[int] = Field(None, description="crop: top left y coordinate")
+    x2: Optional[int] = Field(None, description="crop: bottom right x coordinate")
+    y2: Optional[int] = Field(None, description="crop: bottom right y coordinate")
+    width: Optional[int] = Field(None, description="crop/resize: width")
+    height: Optional[int] = Field(None, description="crop/resize: height")
+    scale: Optional[float] = Field(None, description="resize: scaling factor")
+    angle: Optional[float] = Field(None, description="rotate: degrees counterclockwise")
+    axis: Optional[str] = Field(None, description="mirror: 'x' or 'y'")
+    margin: Optional[int] = Field(None, description="margin: size in pixels")
+    color: Optional[Tuple[int, int, int]] = Field(None, description="margin: color (R, G, B), black by default")
+
+class TransformRequest(ClipRequest):
+    steps: List[TransformStep] = Field(..., description="Geometric steps applied in order, resampling each frame once")
+
 class VideoRequest(BaseModel):
     text: str = Field(..., description="Text to display in the video")
     duration: float = Field(3.0, description="Duration of the video in seconds")
@@ -0,0 +1,180 @@
+"""
+Smart rendering: an edit confined to short time windows, such as a fade, a timed overlay or a
+freeze at the start, re-encodes only the GOPs it touches. Every other GOP of the source
+is stream-copied into the output.
+
+The source's packets give its keyframes. Only keyframes that start a closed GOP are cut
+points: no frame decoded after one is shown before it, and none decoded before it is shown
+after. The source is split at the cut points bounding the edited windows (segment muxer,
+stream copy). The pieces overlapping an edit are rendered again from the edited clip,
+frame for frame, at the source's frame rate and time scale. The pieces are then joined by the
+concat demuxer, which puts each piece's parameter sets in-band, so the x264 pieces and the
+source's own GOPs decode alike. Audio is copied, or re-encoded when the edit delays it.
+
+Sources this cannot handle exactly get a full render instead: video other than H.264 yuv420p,
+rotation metadata, a variable frame rate, no cut point where one is needed, or edits touching
+more than MAX_RENDER_SHARE of the video.
+"""
+import math
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from fractions import Fraction
+from typing import List, Optional, Tuple
+from . import jobs, metrics
+from .ffmpeg_utils import ffmpeg_binary, run_ffmpeg, video_packets
+
+ENABLED = os.environ.get("VIDEO_SMART_RENDER", "1") != "0"
+# Above this share of the source re-encoded, a full render is about as fast and of even quality
+MAX_RENDER_SHARE = float(os.environ.get("VIDEO_SMART_RENDER_MAX_SHARE", 0.5))
+
+SMART_RENDERS = metrics.Counter(
+    "video_smart_renders_total", "Edits written by smart rendering, or in full and why.", ("result",)
+)
+SMART_RENDER_SECONDS = metrics.Counter(
+    "video_smart_render_seconds_total", "Seconds of video smart renders re-encoded or stream-copied.", ("mode",)
+)
+
+def _formats(path: str) -> Tuple[Optional[str], Optional[str], Optional[str], bool]:
+    # Video codec, pixel format, audio codec and whether a rotation is set, from ffmpeg's stream listing
+    listing = subprocess.run([ffmpeg_binary(), "-hide_banner", "-i", path], capture_output=True, text=True).stderr
+    video = re.search(r"Stream #0:\d+.*?: Video: (\w+)[^,]*, (\w+)", listing)
+    audio = re.search(r"Stream #0:\d+.*?: Audio: (\w+)", listing)
+    rotation = re.search(r"rotation of (-?[\d.]+)", listing)
+    return (video.group(1) if video else None, video.group(2) if video else None,
+            audio.group(1) if audio else None, bool(rotation and float(rotation.group(1)) % 360))
+
+def cut_points(packets: list) -> List[int]:
+    """
+    pts of the keyframes (in decode order) that start a closed GOP.
+    """
+    cuts, candidate, shown = [], None, None
+    for _, pts, _, key in packets:
+        if key:
+            if candidate is not None:
+                cuts.append(candidate)
+            # Frames decoded earlier but shown later belong to an open GOP
+            candidate = pts if shown is None or shown < pts else None
+        elif candidate is not None and pts < candidate:
+            candidate = None
+        shown = pts if shown is None else max(shown, pts)
+    if candidate is not None:
+        cuts.append(candidate)
+    return cuts
+
+def plan(packets: list, tick: float, changed: List[Tuple[float, float]]) -> Optional[List[Tuple[int, int, bool]]]:
+    """
+    The source as runs of whole GOPs (first pts, end pts, render), render when the run
+    overlaps a changed (start, end) window in seconds from the first frame; None when the
+    source has no cut point at its start.
+    """
+    shown = sorted(pts for _, pts, _, _ in packets)
+    first, end = shown[0], shown[-1] + (shown[-1] - shown[-2] if len(shown) > 1 else 1)
+    cuts = cut_points(packets)
+    if not cuts or cuts[0] != first:
+        return None
+    pieces = []
+    for start, stop in zip(cuts, cuts[1:] + [end]):
+        render = any((start - first) * tick < b and (stop - first) * tick > a for a, b in changed if b > a)
+        if pieces and pieces[-1][2] == render:
+            pieces[-1] = (pieces[-1][0], stop, render)
+        else:
+            pieces.append((start, stop, render))
+    return pieces
+
+def _fallback(reason: str) -> bool:
+    SMART_RENDERS.inc(result=reason)
+    job = jobs.current_job()
+    if job is not None:
+        job.details["smart_render"] = {"fallback": reason}
+    return False
+
+def write(clip, source_path: str, output_path: str, changed: List[Tuple[float, float]], inserted: float = 0.0) -> bool:
+    """
+    Writes clip, source_path (the very file clip decodes) edited only within the changed
+    (start, end) windows (seconds) and with inserted seconds of new frames before it,
+    re-encoding only the GOPs concerned.
+    Returns False, without writing anything, when the source cannot be smart-rendered.
+    """
+    from .video_utils import write_video
+
+    if not ENABLED:
+        return False
+    codec, pixel_format, audio_codec, rotated = _formats(source_path)
+    if codec != "h264" or pixel_format != "yuv420p" or rotated:
+        return _fallback("format")
+    tick, packets = video_packets(source_path)
+    shown = sorted(pts for _, pts, _, _ in packets)
+    intervals = {b - a for a, b in zip(shown, shown[1:])}
+    if len(intervals) != 1:
+        return _fallback("variable_frame_rate")
+    interval = intervals.pop()
+    fps = Fraction(1 / (interval * tick)).limit_denominator(1001)
+    pieces = plan(packets, tick, changed)
+    if pieces is None:
+        return _fallback("no_cut_point")
+    rendered = sum(stop - start for start, stop, render in pieces if render) * tick + inserted
+    total = (shown[-1] + interval - shown[0]) * tick
+    if rendered > MAX_RENDER_SHARE * total:
+        return _fallback("mostly_edited")
+
+    # New frames before the source: whole frames, as many as a full render shows
+    inserted_frames = math.ceil(inserted * fps - 1e-6)
+    offset = inserted_frames / fps
+    timescale = str(round(1 / tick))
+    workdir = tempfile.mkdtemp(prefix="smart_render_")
+    try:
+        # Each split lands on the first keyframe at or after its time, so half a frame early
+        # is still that keyframe; the frame counts of the pieces are checked below. The last
+        # time, past the end, keeps the muxer from splitting every 2 s when there is no other
+        splits = [start - interval / 2 for start, _, _ in pieces[1:]] + [shown[-1] + interval]
+        run_ffmpeg(["-copyts", "-i", source_path, "-map", "0:v:0", "-c", "copy", "-f", "segment",
+                    "-segment_times", ",".join(f"{pts * tick:.6f}" for pts in splits),
+                    "-reset_timestamps", "1", os.path.join(workdir, "source%05d.mp4")])
+        segments = sorted(name for name in os.listdir(workdir) if name.startswith("source"))
+        if len(segments) != len(pieces) or any(len(video_packets(os.path.join(workdir, name))[1]) != round((stop - start) / interval)
+                                               for name, (start, stop, _) in zip(segments, pieces)):
+            return _fallback("split")
+
+        def render(start: float, frames: int, path: str):
+            # Half a frame more, so the frame count does not depend on rounding
+            piece = clip.subclipped(start).without_audio().with_duration((frames + 0.5) / fps)
+            write_video(piece, path, fps=float(fps), ffmpeg_params=["-video_track_timescale", timescale])
+
+        files = []
+        if inserted_frames:
+            files.append(os.path.join(workdir, "inserted.mp4"))
+            render(0, inserted_frames, files[-1])
+        for i, (name, (start, stop, edited)) in enumerate(zip(segments, pieces)):
+            if edited:
+                files.append(os.path.join(workdir, f"edited{i:05d}.mp4"))
+                render(offset + (start - shown[0]) * tick, round((stop - start) / interval), files[-1])
+            else:
+                files.append(os.path.join(workdir, name))
+
+        concat = os.path.join(workdir, "pieces.ffconcat")
+        with open(concat, "w") as f:
+            f.write("ffconcat version 1.0\n" + "".join(f"file '{path}'\n" for path in files))
+        if audio_codec is None:
+            audio_args = []
+        elif audio_codec == "aac" and not inserted:
+            audio_args = ["-map", "1:a:0", "-c:a", "copy"]
+        else:
+            audio_args = ["-map", "1:a:0", "-c:a", "aac", "-b:a", "192k"]
+            if inserted:
+                audio_args += ["-af", f"adelay={round(inserted * 1000)}:all=1"]
+        run_ffmpeg(["-f", "concat", "-safe", "0", "-i", concat, "-i", source_path, "-map", "0:v:0", "-c:v", "copy",
+                    *audio_args, "-movflags", "+faststart", output_path], outputs=[output_path])
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    copied = total - (rendered - inserted)
+    SMART_RENDERS.inc(result="smart")
+    SMART_RENDER_SECONDS.inc(rendered, mode="rendered")
+    SMART_RENDER_SECONDS.inc(copied, mode="copied")
+    job = jobs.current_job()
+    if job is not None:
+        job.details["smart_render"] = {"rendered_seconds": round(rendered, 3), "copied_seconds": round(copied, 3)}
+    return True
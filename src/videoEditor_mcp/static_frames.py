@@ -0,0 +1,104 @@
+"""
+Static-segment optimization (opt-in, VIDEO_STATIC_VFR=1): runs of duplicate or near-duplicate
+frames, such as slides, title cards, paused screen recordings, are encoded once and shown
+for the length of the run, giving variable-frame-rate output.
+
+Frames are compared on a small grayscale thumbnail against the first frame of the current
+run. A frame that differs by at most TOLERANCE levels in every thumbnail cell is dropped.
+The kept frames are encoded back to back into an intermediate file at the nominal frame
+rate. They are then moved to their original times by a stream-copy remux through ffmpeg's
+setts bitstream filter, which also muxes in the audio. The last frame is always kept, so
+the output has the full duration.
+"""
+import os
+from typing import List
+import cv2
+import numpy as np
+from . import jobs, metrics
+from .ffmpeg_utils import run_ffmpeg
+
+ENABLED = os.environ.get("VIDEO_STATIC_VFR", "0") == "1"
+# Largest per-cell difference (0-255) between thumbnails still counted as the same frame
+TOLERANCE = int(os.environ.get("VIDEO_STATIC_TOLERANCE", 2))
+THUMBNAIL_SIZE = (64, 36)
+# Runs dropped per render at most, which keeps the setts expression within the length of a
+# command-line argument; later frames are all encoded
+MAX_RUNS = 4000
+
+FRAMES_DROPPED = metrics.Counter(
+    "video_static_frames_dropped_total", "Frames not encoded because they repeat the previous frame.", ("operation",)
+)
+
+def thumbnail(frame: np.ndarray) -> np.ndarray:
+    gray = cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY)
+    return cv2.resize(gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+class DedupWriter:
+    """
+    Stands in for an FFMPEG_VideoWriter, passing on only the first frame of every run of
+    (near-)duplicates. indices holds the original index of each frame written.
+    """
+    def __init__(self, writer, tolerance: int = TOLERANCE):
+        self.writer = writer
+        self.tolerance = tolerance
+        self.indices = []
+        self.frames = 0
+        self.runs = 0
+        self._reference = None
+        self._held = None
+
+    def write_frame(self, frame: np.ndarray):
+        small = thumbnail(frame)
+        index, self.frames = self.frames, self.frames + 1
+        if (self._reference is not None and self.runs < MAX_RUNS
+                and np.abs(small - self._reference).max() <= self.tolerance):
+            self._held = (index, frame)
+            return
+        if self._held is not None:
+            self.runs += 1
+        self._reference, self._held = small, None
+        self.indices.append(index)
+        self.writer.write_frame(frame)
+
+    def flush(self):
+        """
+        Writes the last frame if it was dropped, so the final run keeps its length.
+        """
+        if self._held is not None:
+            index, frame = self._held
+            self.indices.append(index)
+            self.writer.write_frame(frame)
+            self._held = None
+
+def timestamp_expression(indices: List[int], fps: float) -> str:
+    """
+    setts expression moving the i-th written frame (at i/fps) to indices[i]/fps: a step
+    function adding the frames dropped before it.
+    """
+    steps = []
+    for written, (before, index) in enumerate(zip([-1, *indices], indices)):
+        if index - before > 1:
+            steps.append(f"{index - before - 1}*gte(ld(0),{written - 0.5})")
+    if not steps:
+        return "TS"
+    # ld(0): the timestamp in frames
+    return f"st(0,TS*TB*{fps!r});TS+({'+'.join(steps)})/(TB*{fps!r})"
+
+def remux(intermediate: str, output_path: str, indices: List[int], fps: float, audiofile: str = None):
+    """
+    Copies the intermediate's video to output_path at the original frame times, with audiofile.
+    The intermediate must not reorder frames (DTS = PTS), both are moved alike.
+    """
+    args = ["-i", intermediate]
+    if audiofile:
+        args += ["-i", audiofile, "-map", "0:v:0", "-map", "1:a:0"]
+    args += ["-c", "copy", "-bsf:v", f"setts=ts='{timestamp_expression(indices, fps)}'", "-movflags", "+faststart", output_path]
+    run_ffmpeg(args, outputs=[output_path])
+
+def record(writer: DedupWriter):
+    dropped = writer.frames - len(writer.indices)
+    stats = metrics.current_stats()
+    FRAMES_DROPPED.inc(dropped, operation=stats.operation if stats is not None else "")
+    job = jobs.current_job()
+    if job is not None:
+        job.details["static_frames"] = {"frames": writer.frames, "encoded": len(writer.indices)}
@@ -0,0 +1,310 @@
+import functools
+import inspect
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+# Define Safe Directory for storage
+SAFE_DIR = Path(os.environ.get("VIDEO_STORAGE_DIR", os.path.join(os.getcwd(), "storage"))).resolve()
+
+# Total bytes of managed outputs kept in SAFE_DIR (0 = no quota)
+QUOTA_BYTES = int(float(os.environ.get("VIDEO_STORAGE_QUOTA_MB", 0)) * 1024 * 1024)
+# Default lifetime of an output since its last access (0 = keep forever)
+DEFAULT_TTL = float(os.environ.get("VIDEO_STORAGE_TTL_HOURS", 0)) * 3600
+SWEEP_INTERVAL = float(os.environ.get("VIDEO_STORAGE_SWEEP_SECONDS", 60))
+INDEX_NAME = ".storage-index.sqlite3"
+
+INPUT_PARAMETERS = ("video_path", "video_paths", "image_path")
+
+def ensure_storage_dir():
+    try:
+        os.makedirs(SAFE_DIR, exist_ok=True)
+    except OSError:
+        # Fallback or just continue if we can't create it (might be read-only FS)
+        pass
+
+def _resolve(path: str) -> str:
+    return str(Path(path).resolve())
+
+def _size(path: str) -> int:
+    # Outputs such as HLS packages are directories, managed as one unit
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+    return os.path.getsize(path)
+
+class StorageManager:
+    """
+    Index of the outputs operations write to SAFE_DIR (operation, source, size, last access).
+    Files outside the index (uploads, anything not produced by an operation) are never touched.
+    A background sweeper deletes expired outputs, then least recently used ones until the
+    total fits the quota, skipping pinned files and files a running operation reads or writes.
+    """
+    def __init__(self, root: Path = SAFE_DIR, quota_bytes: int = QUOTA_BYTES, default_ttl: float = DEFAULT_TTL):
+        self.root = Path(root)
+        self.quota_bytes = quota_bytes
+        self.default_ttl = default_ttl
+        self._db_path = self.root / INDEX_NAME
+        self._lock = threading.RLock()
+        self._in_use = Counter()
+        self._wake = threading.Event()
+        self._sweeper = None
+        self._db = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._db is None:
+            self.root.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(self._db_path, check_same_thread=False, isolation_level=None)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS files ("
+                " path TEXT PRIMARY KEY, operation TEXT, source TEXT, size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL, last_access REAL NOT NULL, ttl REAL, pinned INTEGER NOT NULL DEFAULT 0)"
+            )
+            # Sources with their edit-friendly mezzanine (see conform.py), keyed by the original path
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS conforms ("
+                " source TEXT PRIMARY KEY, size INTEGER, mtime INTEGER, status TEXT,"
+                " mezzanine TEXT, analysis TEXT, error TEXT, updated_at REAL NOT NULL)"
+            )
+        return self._db
+
+    def manages(self, path: str) -> bool:
+        return Path(path).is_relative_to(self.root)
+
+    def register(self, path: str, operation: str = None, source: str = None):
+        """
+        Records an output written by an operation; only files inside SAFE_DIR are managed.
+        """
+        path = _resolve(path)
+        if not self.manages(path) or not os.path.exists(path):
+            return
+        now = time.time()
+        with self._lock:
+            self._connection().execute(
+                "INSERT INTO files (path, operation, source, size, created_at, last_access, ttl) VALUES (?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT(path) DO UPDATE SET operation=excluded.operation, source=excluded.source,"
+                " size=excluded.size, last_access=excluded.last_access",
+                (path, operation, source, _size(path), now, now, self.default_ttl or None),
+            )
+        if self.quota_bytes:
+            self._wake.set()
+
+    def touch(self, paths):
+        with self._lock:
+            self._connection().executemany(
+                "UPDATE files SET last_access = ? WHERE path = ?", [(time.time(), _resolve(p)) for p in paths]
+            )
+
+    def acquire(self, paths):
+        """
+        Protects paths from eviction while an operation uses them.
+        """
+        with self._lock:
+            self._in_use.update(_resolve(p) for p in paths)
+
+    def release(self, paths):
+        with self._lock:
+            self._in_use.subtract(_resolve(p) for p in paths)
+            self._in_use += Counter()
+
+    def set_retention(self, path: str, pinned: Optional[bool] = None, ttl_seconds: Optional[float] = None) -> dict:
+        """
+        Pins/unpins a managed output or changes its TTL (0 = keep forever).
+        """
+        path = _resolve(path)
+        with self._lock:
+            db = self._connection()
+            if db.execute("SELECT 1 FROM files WHERE path = ?", (path,)).fetchone() is None:
+                raise FileNotFoundError(f"Not a managed output: {path}")
+            if pinned is not None:
+                db.execute("UPDATE files SET pinned = ? WHERE path = ?", (int(pinned), path))
+            if ttl_seconds is not None:
+                db.execute("UPDATE files SET ttl = ? WHERE path = ?", (ttl_seconds or None, path))
+            return self.file_info(path)
+
+    def file_info(self, path: str) -> Optional[dict]:
+        with self._lock:
+            cursor = self._connection().execute("SELECT * FROM files WHERE path = ?", (_resolve(path),))
+            row = cursor.fetchone()
+            return self._row_dict(cursor, row) if row else None
+
+    def _row_dict(self, cursor, row) -> dict:
+        record = dict(zip([column[0] for column in cursor.description], row))
+        record["pinned"] = bool(record["pinned"])
+        record["in_use"] = record["path"] in self._in_use
+        return record
+
+    def list_files(self) -> list:
+        with self._lock:
+            cursor = self._connection().execute("SELECT * FROM files ORDER BY last_access DESC")
+            return [self._row_dict(cursor, row) for row in cursor.fetchall()]
+
+    def set_conform(self, source: str, **fields):
+        """
+        Creates or updates the conform record of source with fields (size, mtime, status,
+        mezzanine, analysis, error).
+        """
+        source = _resolve(source)
+        if "analysis" in fields and fields["analysis"] is not None:
+            fields["analysis"] = json.dumps(fields["analysis"])
+        fields["updated_at"] = time.time()
+        columns = list(fields)
+        with self._lock:
+            self._connection().execute(
+                f"INSERT INTO conforms (source, {', '.join(columns)}) VALUES (?{', ?' * len(columns)})"
+                f" ON CONFLICT(source) DO UPDATE SET {', '.join(f'{c}=excluded.{c}' for c in columns)}",
+                (source, *fields.values()),
+            )
+
+    def conform_info(self, source: str) -> Optional[dict]:
+        with self._lock:
+            cursor = self._connection().execute("SELECT * FROM conforms WHERE source = ?", (_resolve(source),))
+            row = cursor.fetchone()
+            return self._conform_dict(cursor, row) if row else None
+
+    def list_conforms(self) -> list:
+        with self._lock:
+            cursor = self._connection().execute("SELECT * FROM conforms ORDER BY updated_at DESC")
+            return [self._conform_dict(cursor, row) for row in cursor.fetchall()]
+
+    @staticmethod
+    def _conform_dict(cursor, row) -> dict:
+        record = dict(zip([column[0] for column in cursor.description], row))
+        record["analysis"] = json.loads(record["analysis"]) if record["analysis"] else None
+        return record
+
+    def usage(self) -> dict:
+        with self._lock:
+            db = self._connection()
+            files, total, pinned = db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(pinned), 0) FROM files"
+            ).fetchone()
+            by_operation = {
+                operation: {"files": count, "bytes": size}
+                for operation, count, size in db.execute("SELECT operation, COUNT(*), SUM(size) FROM files GROUP BY operation")
+            }
+        return {
+            "directory": str(self.root),
+            "files": files,
+            "bytes": total,
+            "pinned": pinned,
+            "in_use": len(self._in_use),
+            "quota_bytes": self.quota_bytes or None,
+            "default_ttl_seconds": self.default_ttl or None,
+            "by_operation": by_operation,
+        }
+
+    def sweep(self) -> list:
+        """
+        Deletes expired outputs, then least recently used ones until under quota. Returns deleted paths.
+        """
+        now = time.time()
+        with self._lock:
+            db = self._connection()
+            rows = db.execute("SELECT path, size, last_access, ttl, pinned FROM files ORDER BY last_access").fetchall()
+            doomed, kept_bytes, candidates = [], 0, []
+            for path, size, last_access, ttl, pinned in rows:
+                if not os.path.exists(path):
+                    db.execute("DELETE FROM files WHERE path = ?", (path,))
+                    continue
+                protected = pinned or path in self._in_use
+                if not protected and ttl and now - last_access > ttl:
+                    doomed.append(path)
+                    continue
+                kept_bytes += size
+                if not protected:
+                    candidates.append((path, size))
+            if self.quota_bytes:
+                for path, size in candidates:
+                    if kept_bytes <= self.quota_bytes:
+                        break
+                    doomed.append(path)
+                    kept_bytes -= size
+            for path in doomed:
+                self._delete(path)
+                db.execute("DELETE FROM files WHERE path = ?", (path,))
+        return doomed
+
+    @staticmethod
+    def _delete(path: str):
+        # Pooled readers keep the file open; close them so the space is really freed
+        from .readers import pool
+        pool.discard(path)
+        try:
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except OSError:
+            pass
+
+    def start_sweeper(self):
+        if self._sweeper is not None or not (self.quota_bytes or self.default_ttl):
+            return
+
+        def run():
+            while True:
+                self._wake.wait(SWEEP_INTERVAL)
+                self._wake.clear()
+                try:
+                    self.sweep()
+                except Exception:
+                    pass
+
+        self._sweeper = threading.Thread(target=run, name="storage-sweeper", daemon=True)
+        self._sweeper.start()
+
+_manager = None
+_manager_lock = threading.Lock()
+
+def get_manager() -> StorageManager:
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            _manager = StorageManager()
+            _manager.start_sweeper()
+        return _manager
+
+def track_operation(operation: str):
+    """
+    Decorator protecting an operation's input files while it runs and registering its output.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind_partial(*args, **kwargs)
+            inputs = []
+            for name in INPUT_PARAMETERS:
+                value = bound.arguments.get(name)
+                inputs.extend([value] if isinstance(value, str) else value or [])
+            if bound.arguments.get("timeline") is not None:
+                from .timeline import input_paths
+                inputs.extend(input_paths(bound.arguments["timeline"]))
+            protected = inputs + [bound.arguments.get("output_path") or bound.arguments.get("output_file")]
+            protected = [path for path in protected if path]
+            manager = get_manager()
+            manager.acquire(protected)
+            try:
+                try:
+                    manager.touch(inputs)
+                except (sqlite3.Error, OSError):
+                    # A read-only or broken index must not fail the render itself
+                    pass
+                result = func(*args, **kwargs)
+                if isinstance(result, str):
+                    try:
+                        manager.register(result, operation, inputs[0] if inputs else None)
+                    except (sqlite3.Error, OSError):
+                        pass
+                return result
+            finally:
+                manager.release(protected)
+        return wrapper
+    return decorator
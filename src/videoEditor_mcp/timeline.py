@@ -0,0 +1,141 @@
+"""
+Timeline documents: an edit decision list with a main track of clips played one after
+another and overlay tracks of captions and images placed at timeline times.
+
+A timeline renders as segments, one per main-track clip together with the part of every
+overlay that falls on it. A segment's key hashes everything its pixels and samples depend
+on (source content, in/out points, effects, overlays, output format), so an edit only
+changes the keys of the segments it touches.
+"""
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Callable, List, Tuple, Union
+from .schemas import Timeline, TimelineClip, TimelineOverlay
+from .storage import SAFE_DIR
+
+# Bump when the way segments are encoded changes, so old chunks are not reused
+SEGMENT_FORMAT_VERSION = 1
+
+# Effect name -> whether it needs a value
+EFFECTS = {
+    "fade_in": True, "fade_out": True, "audio_fade_in": True, "audio_fade_out": True,
+    "speed": True, "volume": True, "brightness": True, "contrast": True, "gamma": True,
+    "blackwhite": False, "invert": False, "mirror_x": False, "mirror_y": False,
+}
+
+@dataclass
+class Segment:
+    index: int
+    # Position on the timeline
+    start: float
+    duration: float
+    clip: TimelineClip
+    # (track, overlay) with start relative to the segment and duration clipped to it
+    overlays: List[Tuple[int, TimelineOverlay]] = field(default_factory=list)
+    key: str = ""
+
+def resolve_path(path: str) -> str:
+    # Relative paths in a timeline refer to the storage directory
+    return os.path.join(SAFE_DIR, path)
+
+def load(timeline: Union[Timeline, dict, str], resolve: Callable[[str], str] = resolve_path) -> Timeline:
+    """
+    Parses a timeline (a model, a dict, or the path of a JSON file) and resolves its media paths.
+    """
+    if isinstance(timeline, str):
+        with open(timeline) as f:
+            timeline = json.load(f)
+    if isinstance(timeline, dict):
+        timeline = Timeline.model_validate(timeline)
+    if not timeline.clips:
+        raise ValueError("A timeline needs at least one clip")
+    if timeline.width <= 0 or timeline.height <= 0 or timeline.fps <= 0:
+        raise ValueError("width, height and fps must be positive")
+    for clip in timeline.clips:
+        for effect in clip.effects:
+            if effect.type not in EFFECTS:
+                raise ValueError(f"Unknown timeline effect: {effect.type}")
+            if EFFECTS[effect.type] and effect.value is None:
+                raise ValueError(f"Effect {effect.type} needs a value")
+    return timeline.model_copy(update={
+        "clips": [clip.model_copy(update={"source": resolve(clip.source)}) for clip in timeline.clips],
+        "overlay_tracks": [
+            [o.model_copy(update={"image_path": resolve(o.image_path)}) if o.image_path else o for o in track]
+            for track in timeline.overlay_tracks
+        ],
+    })
+
+def input_paths(timeline, validate: Callable[[str], str] = None) -> List[str]:
+    """
+    Media files a timeline reads, or [] if it cannot be parsed (the render reports why).
+    A timeline file is only read once validate has accepted its path.
+    """
+    try:
+        if isinstance(timeline, str):
+            if validate is None:
+                return []
+            timeline = validate(timeline)
+        timeline = load(timeline)
+    except Exception:
+        return []
+    images = [o.image_path for track in timeline.overlay_tracks for o in track if o.image_path]
+    return [clip.source for clip in timeline.clips] + images
+
+def clip_duration(clip: TimelineClip, source_duration: float) -> float:
+    end = source_duration if clip.end is None else min(clip.end, source_duration)
+    duration = end - clip.start
+    if duration <= 0:
+        raise ValueError(f"Clip of {clip.source} is empty: start {clip.start}, end {end}")
+    for effect in clip.effects:
+        if effect.type == "speed":
+            if effect.value <= 0:
+                raise ValueError("speed must be positive")
+            duration /= effect.value
+    return duration
+
+def plan(timeline: Timeline, source_duration: Callable[[str], float], fingerprint: Callable[[str], str]) -> List[Segment]:
+    """
+    Splits a loaded timeline into segments and computes their cache keys.
+    """
+    segments, position = [], 0.0
+    for index, clip in enumerate(timeline.clips):
+        duration = clip_duration(clip, source_duration(clip.source))
+        segments.append(Segment(index, position, duration, clip))
+        position += duration
+
+    for track_index, track in enumerate(timeline.overlay_tracks):
+        for overlay in track:
+            overlay_end = overlay.start + overlay.duration
+            for segment in segments:
+                start = max(overlay.start, segment.start)
+                end = min(overlay_end, segment.start + segment.duration)
+                if end > start:
+                    segment.overlays.append((track_index, overlay.model_copy(update={
+                        "start": start - segment.start, "duration": end - start,
+                    })))
+
+    output = (timeline.width, timeline.height, timeline.fps)
+    for segment in segments:
+        segment.key = segment_key(segment, output, fingerprint)
+    return segments
+
+def segment_key(segment: Segment, output: tuple, fingerprint: Callable[[str], str]) -> str:
+    clip = segment.clip
+    overlays = []
+    for track, overlay in segment.overlays:
+        described = overlay.model_dump(exclude={"image_path"})
+        described["start"], described["duration"] = round(overlay.start, 6), round(overlay.duration, 6)
+        described["image"] = fingerprint(overlay.image_path) if overlay.image_path else None
+        overlays.append([track, described])
+    document = {
+        "version": SEGMENT_FORMAT_VERSION,
+        "output": output,
+        "source": fingerprint(clip.source),
+        "start": clip.start,
+        "duration": round(segment.duration, 6),
+        "effects": [effect.model_dump() for effect in clip.effects],
+        "overlays": overlays,
+    }
+    return hashlib.sha256(json.dumps(document, sort_keys=True).encode()).hexdigest()[:32]
@@ -0,0 +1,219 @@
+"""
+Geometric transform engine: crop, resize, rotate, mirror and margin steps composed into one
+affine map, so a chain of them resamples each frame once instead of once per step.
+
+Steps are composed as 3x3 matrices in continuous image coordinates (pixel i spans [i, i + 1)),
+then turned into a remap table once per job. Chains that only move whole pixels (crops,
+mirrors, right-angle rotations, margins) are sampled with nearest neighbour and stay
+lossless. Downscales are area-averaged first so they do not alias.
+"""
+import math
+from dataclasses import dataclass, field, replace
+from typing import List, Optional, Sequence, Tuple, Union
+import cv2
+import numpy as np
+from .pipeline import CanvasRing
+from .schemas import TransformStep
+
+STEP_TYPES = ("crop", "resize", "rotate", "mirror", "margin")
+BLACK = (0, 0, 0)
+
+def _translate(x: float, y: float) -> np.ndarray:
+    return np.array([[1, 0, x], [0, 1, y], [0, 0, 1]], dtype=np.float64)
+
+def _scale(sx: float, sy: float) -> np.ndarray:
+    return np.diag([sx, sy, 1.0])
+
+def _step_matrix(step: TransformStep, size: Tuple[int, int]):
+    """
+    (matrix from the current canvas to the new one, new canvas size, fill colour of the
+    area the step uncovers or None) for one step, with the semantics of the matching tool.
+    """
+    w, h = size
+    if step.type == "crop":
+        x1, y1, x2, y2 = step.x1, step.y1, step.x2, step.y2
+        if step.width and x1 is not None:
+            x2 = x1 + step.width
+        elif step.width and x2 is not None:
+            x1 = x2 - step.width
+        if step.height and y1 is not None:
+            y2 = y1 + step.height
+        elif step.height and y2 is not None:
+            y1 = y2 - step.height
+        x1, y1 = max(0, int(x1 or 0)), max(0, int(y1 or 0))
+        x2, y2 = min(w, int(x2 or w)), min(h, int(y2 or h))
+        if x2 <= x1 or y2 <= y1:
+            raise ValueError(f"Crop region is empty for a {w}x{h} frame")
+        return _translate(-x1, -y1), (x2 - x1, y2 - y1), None
+    if step.type == "resize":
+        if step.scale:
+            new_size = (int(w * step.scale), int(h * step.scale))
+        elif step.width and step.height:
+            new_size = (int(step.width), int(step.height))
+        elif step.width:
+            new_size = (int(step.width), int(h * step.width / w))
+        elif step.height:
+            new_size = (int(w * step.height / h), int(step.height))
+        else:
+            raise ValueError("Must provide scale, width, or height")
+        if min(new_size) <= 0:
+            raise ValueError(f"Resize to {new_size[0]}x{new_size[1]} is empty")
+        return _scale(new_size[0] / w, new_size[1] / h), new_size, None
+    if step.type == "rotate":
+        if step.angle is None:
+            raise ValueError("rotate needs an angle")
+        # Counterclockwise on screen (y points down), expanding the canvas like PIL's rotate
+        theta = math.radians(step.angle % 360)
+        cos, sin = round(math.cos(theta), 12), round(math.sin(theta), 12)
+        rotation = np.array([[cos, sin, 0], [-sin, cos, 0], [0, 0, 1]], dtype=np.float64)
+        corners = np.round(rotation[:2, :2] @ np.array([[-w, w, w, -w], [-h, -h, h, h]]) / 2 + [[w / 2], [h / 2]], 6)
+        new_size = tuple(int(math.ceil(axis.max()) - math.floor(axis.min())) for axis in corners)
+        matrix = _translate(new_size[0] / 2, new_size[1] / 2) @ rotation @ _translate(-w / 2, -h / 2)
+        return matrix, new_size, None if step.angle % 90 == 0 else BLACK
+    if step.type == "mirror":
+        if step.axis == "x":
+            return np.array([[-1, 0, w], [0, 1, 0], [0, 0, 1]], dtype=np.float64), size, None
+        if step.axis == "y":
+            return np.array([[1, 0, 0], [0, -1, h], [0, 0, 1]], dtype=np.float64), size, None
+        raise ValueError("Axis must be 'x' or 'y'")
+    if step.type == "margin":
+        margin = int(step.margin or 0)
+        if margin < 0:
+            raise ValueError("margin must be non-negative")
+        color = tuple(step.color) if step.color is not None else BLACK
+        return _translate(margin, margin), (w + 2 * margin, h + 2 * margin), color if margin else None
+    raise ValueError(f"Unknown transform step: {step.type} (expected one of {', '.join(STEP_TYPES)})")
+
+def _is_whole_pixel(matrix: np.ndarray) -> bool:
+    # Pixel centres land on pixel centres: a signed permutation plus an integer shift
+    linear, shift = matrix[:2, :2], matrix[:2, 2]
+    return (np.allclose(np.abs(linear).sum(axis=0), 1) and np.allclose(linear, np.round(linear))
+            and np.allclose(shift, np.round(shift)))
+
+@dataclass
+class Plan:
+    """
+    A composed chain for frames of source_size: the output size and everything needed to
+    produce an output frame with at most one area downscale and one remap.
+    """
+    source_size: Tuple[int, int]
+    size: Tuple[int, int]
+    matrix: np.ndarray
+    # Size the source is area-averaged to before the remap, when the chain shrinks it
+    prefilter: Optional[Tuple[int, int]] = None
+    maps: Optional[tuple] = None
+    interpolation: int = cv2.INTER_LINEAR
+    fill: Tuple[int, int, int] = BLACK
+    # Uncovered areas when steps fill them with different colours
+    background: Optional[np.ndarray] = None
+
+    # Output frames, drawn into in turn, and the downscaled input of the remap; made on first use
+    _outputs: Optional[CanvasRing] = field(default=None, init=False, repr=False, compare=False)
+    _prefiltered: Optional[np.ndarray] = field(default=None, init=False, repr=False, compare=False)
+
+    def _output(self, frame: np.ndarray) -> np.ndarray:
+        shape = (self.size[1], self.size[0], *frame.shape[2:])
+        if self._outputs is None or self._outputs.frames[0].shape != shape or self._outputs.frames[0].dtype != frame.dtype:
+            # The remap never writes the uncovered areas, so they keep the background
+            fill = self.background if self.background is not None and self.background.shape == shape else None
+            self._outputs = CanvasRing(shape, fill=fill, dtype=frame.dtype)
+        return self._outputs.next()
+
+    def apply(self, frame: np.ndarray) -> np.ndarray:
+        if self.prefilter is not None:
+            if self.maps is None:
+                return cv2.resize(frame, self.prefilter, dst=self._output(frame), interpolation=cv2.INTER_AREA)
+            shape = (self.prefilter[1], self.prefilter[0], *frame.shape[2:])
+            if self._prefiltered is None or self._prefiltered.shape != shape or self._prefiltered.dtype != frame.dtype:
+                self._prefiltered = np.empty(shape, frame.dtype)
+            frame = cv2.resize(frame, self.prefilter, dst=self._prefiltered, interpolation=cv2.INTER_AREA)
+        if self.maps is None:
+            return frame
+        if self.background is None:
+            return cv2.remap(frame, *self.maps, self.interpolation, dst=self._output(frame),
+                             borderMode=cv2.BORDER_CONSTANT, borderValue=self.fill)
+        return cv2.remap(frame, *self.maps, self.interpolation, dst=self._output(frame), borderMode=cv2.BORDER_TRANSPARENT)
+
+def load_steps(steps: Sequence[Union[TransformStep, dict]]) -> List[TransformStep]:
+    if not steps:
+        raise ValueError("A transform needs at least one step")
+    return [step if isinstance(step, TransformStep) else TransformStep.model_validate(step) for step in steps]
+
+def compose(steps: Sequence[Union[TransformStep, dict]], source_size: Tuple[int, int]) -> Plan:
+    """
+    Composes steps (applied in order) for frames of source_size and precomputes the remap table.
+    """
+    steps = load_steps(steps)
+    matrix, size, colors = np.eye(3), tuple(source_size), set()
+    # Every intermediate canvas: what a crop cuts away must stay cut after later steps
+    canvases = []
+    for step in steps:
+        step_matrix, size, fill = _step_matrix(step, size)
+        matrix = step_matrix @ matrix
+        canvases.append((matrix, size))
+        if fill is not None:
+            colors.add(fill)
+    plan = Plan(tuple(source_size), size, matrix)
+
+    # Source axes shrunk by the chain are area-averaged to their final resolution first
+    w, h = source_size
+    sx, sy = np.hypot(matrix[0, 0], matrix[1, 0]), np.hypot(matrix[0, 1], matrix[1, 1])
+    remaining = matrix
+    if sx < 1 - 1e-9 or sy < 1 - 1e-9:
+        plan.prefilter = (max(1, round(w * min(sx, 1))), max(1, round(h * min(sy, 1))))
+        remaining = matrix @ _scale(w / plan.prefilter[0], h / plan.prefilter[1])
+    input_size = plan.prefilter or tuple(source_size)
+    if np.allclose(remaining, np.eye(3)) and input_size == size:
+        return plan
+
+    whole = _is_whole_pixel(remaining)
+    if whole:
+        plan.interpolation = cv2.INTER_NEAREST
+    elif max(sx, sy) > 1 + 1e-9:
+        plan.interpolation = cv2.INTER_CUBIC
+    # For each output pixel centre, the input position it samples (in pixel indices)
+    inverse = np.linalg.inv(remaining)
+    xs, ys = np.meshgrid(np.arange(size[0], dtype=np.float64) + 0.5, np.arange(size[1], dtype=np.float64) + 0.5)
+    map_x = (inverse[0, 0] * xs + inverse[0, 1] * ys + inverse[0, 2] - 0.5).astype(np.float32)
+    map_y = (inverse[1, 0] * xs + inverse[1, 1] * ys + inverse[1, 2] - 0.5).astype(np.float32)
+    to_source = np.linalg.inv(matrix)
+    for canvas_matrix, (canvas_w, canvas_h) in canvases[:-1]:
+        m = canvas_matrix @ to_source
+        cx, cy = m[0, 0] * xs + m[0, 1] * ys + m[0, 2], m[1, 0] * xs + m[1, 1] * ys + m[1, 2]
+        outside = (cx < 0) | (cx >= canvas_w) | (cy < 0) | (cy >= canvas_h)
+        # Far outside the input, so the remap fills them like any uncovered area
+        map_x[outside], map_y[outside] = -(1 << 14), -(1 << 14)
+    if whole:
+        map_x, map_y = np.round(map_x), np.round(map_y)
+    # Fixed-point maps are several times faster to remap with than float ones
+    plan.maps = cv2.convertMaps(map_x, map_y, cv2.CV_16SC2, nninterpolation=whole)
+
+    if len(colors) == 1:
+        plan.fill = colors.pop()
+    elif len(colors) > 1:
+        plan.background = _background(steps, tuple(source_size))
+    return plan
+
+def _background(steps: List[TransformStep], source_size: Tuple[int, int]) -> np.ndarray:
+    # Paints each step's uncovered area by running the chain step by step on a blank frame
+    canvas = np.zeros((source_size[1], source_size[0], 3), dtype=np.uint8)
+    size = source_size
+    for step in steps:
+        step_matrix, size, fill = _step_matrix(step, size)
+        pixels = _translate(-0.5, -0.5) @ step_matrix @ _translate(0.5, 0.5)
+        canvas = cv2.warpAffine(canvas, pixels[:2], size, flags=cv2.INTER_NEAREST,
+                                borderMode=cv2.BORDER_CONSTANT, borderValue=fill or BLACK)
+    return canvas
+
+def apply(clip, steps: Sequence[Union[TransformStep, dict]]):
+    """
+    clip with the chain of steps applied to every frame. A mask goes through the same
+    chain, with the areas the steps uncover left transparent.
+    """
+    plan = compose(steps, tuple(clip.size))
+    transformed = clip.image_transform(plan.apply, apply_to=[])
+    if clip.mask is not None:
+        mask_plan = replace(plan, fill=(0, 0, 0), background=None)
+        transformed = transformed.with_mask(clip.mask.image_transform(
+            lambda mask: mask_plan.apply((mask * 255).astype(np.uint8)) / 255.0, apply_to=[]))
+    return transformed
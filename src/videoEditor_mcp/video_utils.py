@@ -1,20 +1,65 @@
+import hashlib
+import io
+import math
 import os
+import shutil
 import tempfile
 import uuid
+from contextlib import ExitStack
+from fractions import Fraction
 import cv2
+import numpy as np
+import proglog
 from pathlib import Path
 from typing import List, Optional, Tuple, Union
-from moviepy import VideoFileClip, AudioFileClip, CompositeVideoClip, concatenate_videoclips, clips_array, ImageClip, vfx, afx
+from moviepy import AudioClip, AudioFileClip, CompositeVideoClip, CompositeAudioClip, VideoClip, concatenate_videoclips, ImageClip, vfx, afx
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
 from moviepy.video.tools.cuts import detect_scenes
 from PIL import Image, ImageDraw, ImageFont
-
-# Define Safe Directory for storage
-SAFE_DIR = Path(os.environ.get("VIDEO_STORAGE_DIR", os.path.join(os.getcwd(), "storage"))).resolve()
-try:
-    os.makedirs(SAFE_DIR, exist_ok=True)
-except OSError:
-    # Fallback or just continue if we can't create it (might be read-only FS)
-    pass
+from . import audio_analysis, coalesce, cores, effects, frame_ring, jobs, metrics, pipeline, scheduler, smart_render, static_frames, storage, timeline as timelines, transform
+from .readers import open_clips, open_video
+from .storage import SAFE_DIR, ensure_storage_dir
+from .ffmpeg_utils import run_ffmpeg
+
+ensure_storage_dir()
+
+# Frame rate of still-image videos (title cards): every frame is the same picture
+STILL_IMAGE_FPS = 1
+STILL_IMAGE_MAX_FRAMES = 60
+# Rendered title cards kept in SAFE_DIR/TITLE_CARD_CACHE_DIR, keyed by their content
+TITLE_CARD_CACHE_DIR = ".title_cards"
+TITLE_CARD_CACHE_SIZE = 64
+# (height, video kbps) rungs of process_export_ladder
+DEFAULT_LADDER = [(1080, 5000), (720, 2800), (480, 1400), (360, 800)]
+
+# Black-border detection: frames sampled, the width they are decoded at, and the mean
+# luminance (0-255) above which a row or column counts as picture
+CROP_DETECT_SAMPLES = 12
+CROP_DETECT_MAX_SAMPLES = 100
+CROP_DETECT_WIDTH = 640
+CROP_DETECT_LIMIT = 24
+
+# Encodings of in-memory previews, with their PIL format names
+PREVIEW_FORMATS = {"jpeg": "JPEG", "png": "PNG", "webp": "WEBP"}
+# Preview GIFs: the default frame rate at most, and how much of the video they show by default
+PREVIEW_GIF_FPS = 10
+PREVIEW_GIF_MAX_DURATION = 10.0
+PREVIEW_GIF_MAX_FRAMES = 150
+
+# Encoded timeline segments, reused by later renders of the same or an edited timeline
+TIMELINE_CACHE_DIR = ".timeline_segments"
+TIMELINE_CACHE_SIZE = 256
+# Every segment gets the same stream layout so they can be joined without re-encoding
+TIMELINE_AUDIO_FPS = 44100
+TIMELINE_ENCODE_PARAMS = ["-pix_fmt", "yuv420p", "-ac", "2", "-ar", str(TIMELINE_AUDIO_FPS)]
+
+TIMELINE_SEGMENTS = metrics.Counter(
+    "video_timeline_segments_total", "Timeline segments rendered or reused from the cache.", ("result",)
+)
+
+metrics.install_hooks()
+jobs.install_hooks()
 
 def validate_path(path_str: str) -> str:
     """
@@ -40,14 +85,85 @@ def get_unique_output_path(original_path: str, suffix: str, ext: str = None) ->
         ext = original_ext
     return os.path.join(directory, f"{name}_{suffix}_{uuid.uuid4().hex[:8]}{ext}")
 
-def write_video(clip, output_path: str):
-    audio_codec = "aac" if clip.audio else None
-    clip.write_videofile(output_path, codec="libx264", audio_codec=audio_codec)
+def write_video(clip, output_path: str, fps: float = None, ffmpeg_params: List[str] = None, frame_effects: list = None):
+    """
+    Encodes clip to output_path with H.264 (and AAC audio). Frames are decoded, processed and
+    encoded in overlapping pipeline stages (VIDEO_PIPELINE_DEPTH). frame_effects are image-only
+    moviepy effects applied to every frame: with VIDEO_EFFECT_WORKERS > 1 they run in worker
+    processes over a shared-memory frame ring, otherwise as ordinary clip effects. With
+    VIDEO_STATIC_VFR=1, runs of repeated frames are encoded once (static_frames).
+    """
+    workers = frame_ring.EFFECT_WORKERS if frame_effects and clip.mask is None else 0
+    if frame_effects and workers <= 1:
+        clip = clip.with_effects(frame_effects)
+    if workers <= 1 and (pipeline.PIPELINE_DEPTH <= 0 or clip.mask is not None):
+        audio_codec = "aac" if clip.audio else None
+        with metrics.track_render():
+            # moviepy otherwise muxes its temporary audio track in the current directory
+            clip.write_videofile(output_path, fps=fps, codec="libx264", audio_codec=audio_codec, ffmpeg_params=ffmpeg_params,
+                                 threads=cores.encoder_threads(), temp_audiofile_path=tempfile.gettempdir(),
+                                 logger=jobs.progress_logger())
+        return
+    _write_frames(clip, output_path, fps, ffmpeg_params, frame_effects if workers > 1 else None, workers)
 
-def create_text_image(text: str, size: tuple[int, int] = (640, 480), bg_color: str = 'black', text_color: str = 'white', transparent: bool = False, fontsize: int = 40) -> str:
+def _write_frames(clip, output_path: str, fps: float = None, ffmpeg_params: List[str] = None, frame_effects: list = None, workers: int = 0):
+    # What write_videofile does, with the frames going through the effect workers or the pipeline
+    fps = fps or clip.fps
+    logger = proglog.default_bar_logger(jobs.progress_logger())
+    audiofile = intermediate = None
+    try:
+        with metrics.track_render():
+            if clip.audio:
+                fd, audiofile = tempfile.mkstemp(suffix=".m4a")
+                os.close(fd)
+                clip.audio.write_audiofile(audiofile, 44100, codec="aac", logger=logger)
+            if static_frames.ENABLED:
+                # Only the first frame of each static run is encoded, without B-frames, and
+                # the remux moves the frames to their times and adds the audio
+                fd, intermediate = tempfile.mkstemp(suffix=".mp4")
+                os.close(fd)
+                ffmpeg_params = [*(ffmpeg_params or []), "-bf", "0"]
+            with FFMPEG_VideoWriter(intermediate or output_path, clip.size, fps, codec="libx264",
+                                    audiofile=None if intermediate else audiofile,
+                                    audio_codec="copy" if audiofile and not intermediate else None,
+                                    threads=cores.encoder_threads(), ffmpeg_params=ffmpeg_params) as writer:
+                sink = static_frames.DedupWriter(writer) if intermediate else writer
+                if not frame_effects:
+                    pipeline.write_frames(clip, sink, fps, logger, sources=open_clips())
+                else:
+                    total = int(clip.duration * fps)
+                    frames = frame_ring.map_frames(clip.iter_frames(fps=fps, dtype="uint8"), (clip.h, clip.w, 3), frame_effects, workers)
+                    try:
+                        for _, frame in zip(logger.iter_bar(frame_index=range(total)), frames):
+                            sink.write_frame(frame)
+                    finally:
+                        # Stops the workers and frees the ring, also on cancel
+                        frames.close()
+                if intermediate:
+                    sink.flush()
+            if intermediate:
+                static_frames.remux(intermediate, output_path, sink.indices, fps, audiofile)
+                static_frames.record(sink)
+    finally:
+        for path in (audiofile, intermediate):
+            if path and os.path.exists(path):
+                os.remove(path)
+
+def write_edit(clip, output_path: str, source_path: str, changed: List[Tuple[float, float]], inserted: float = 0.0):
     """
-    Creates an image with text using PIL and saves it temporarily.
-    Returns the path to the temporary image file.
+    Writes clip, source_path edited only within the changed (start, end) windows and with
+    inserted seconds of new frames before it: by smart rendering (only the GOPs the edit
+    touches are re-encoded) when the source allows, with write_video otherwise.
+    source_path must be the file clip decodes, the clip's filename: for a conformed source,
+    its mezzanine, so the copied GOPs and the re-encoded ones come from the same encode.
+    """
+    if not smart_render.write(clip, source_path, output_path, changed, inserted):
+        write_video(clip, output_path)
+
+def render_text_image(text: str, size: tuple[int, int] = (640, 480), bg_color: str = 'black', text_color: str = 'white', transparent: bool = False, fontsize: int = 40, position: Union[str, Tuple[int, int]] = "center") -> Image.Image:
+    """
+    Renders text on a background as an in-memory PIL image, centered by default
+    ('top', 'bottom' or an (x, y) position otherwise).
     """
     mode = 'RGBA' if transparent else 'RGB'
     color = (0, 0, 0, 0) if transparent else bg_color
@@ -78,37 +194,102 @@ def create_text_image(text: str, size: tuple[int, int] = (640, 480), bg_color: s
 
     x = (size[0] - text_width) / 2
     y = (size[1] - text_height) / 2
+    if position == 'top':
+        y = 10
+    elif position == 'bottom':
+        y = size[1] - text_height - 10
+    elif isinstance(position, (list, tuple)):
+        x, y = position
 
     d.text((x, y), text, fill=text_color, font=font)
+    return img
+
+def create_text_image(text: str, size: tuple[int, int] = (640, 480), bg_color: str = 'black', text_color: str = 'white', transparent: bool = False, fontsize: int = 40) -> str:
+    """
+    Creates an image with text using PIL and saves it temporarily.
+    Returns the path to the temporary image file.
+    """
+    img = render_text_image(text, size, bg_color, text_color, transparent, fontsize)
 
     # Create a temp file
     fd, temp_path = tempfile.mkstemp(suffix=".png")
     os.close(fd)
-
-    img.save(temp_path)
+    try:
+        img.save(temp_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
     return temp_path
 
-def generate_simple_video(text: str, duration: float = 3.0, output_file: str = "output.mp4") -> str:
+def encode_still_image(img: Image.Image, duration: float, output_path: str, fps: float = STILL_IMAGE_FPS) -> str:
     """
-    Generates a simple video with text on a background.
+    Encodes a single in-memory image as a video of the given duration.
+    The frame is converted and sent to ffmpeg once and cloned there, at a low frame rate
+    (lowered further so long cards stay under STILL_IMAGE_MAX_FRAMES frames), in one GOP
+    tuned for static content, so the cost barely depends on the duration.
     """
-    output_file = validate_path(output_file)
-    img_path = None
-    try:
-        # Create image with text
-        img_path = create_text_image(text)
+    # A whole number of frames spanning exactly the duration
+    frames = max(1, min(math.ceil(duration * fps), STILL_IMAGE_MAX_FRAMES))
+    rate = frames / Fraction(duration).limit_denominator(1000)
+    frame = img.convert("RGB")
+    width, height = frame.size
+    run_ffmpeg([
+        "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{width}x{height}", "-framerate", str(rate), "-i", "pipe:0",
+        # Convert before cloning so it happens once; x264 needs even dimensions
+        "-vf", f"pad=ceil(iw/2)*2:ceil(ih/2)*2,format=yuv420p,tpad=stop_mode=clone:stop_duration={duration}",
+        "-t", str(duration), "-r", str(rate),
+        "-c:v", "libx264", "-preset", "veryfast", "-tune", "stillimage",
+        "-g", str(frames), "-movflags", "+faststart",
+        output_path,
+    ], input=frame.tobytes(), outputs=[output_path])
+    return output_path
 
-        # Create clip from image
-        clip = ImageClip(img_path).with_duration(duration)
+def _title_card_cache_path(*key) -> str:
+    digest = hashlib.sha256(repr(key).encode()).hexdigest()[:32]
+    directory = os.path.join(SAFE_DIR, TITLE_CARD_CACHE_DIR)
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{digest}.mp4")
 
-        # Write video file
-        clip.write_videofile(output_file, fps=24, codec='libx264')
+def _prune_cache(directory: str, keep: int):
+    # Keeps the `keep` most recently used .mp4 files of a cache directory
+    cards = sorted((entry for entry in os.scandir(directory) if entry.name.endswith(".mp4")), key=lambda e: e.stat().st_mtime)
+    for entry in cards[:max(0, len(cards) - keep)]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
 
+def generate_simple_video(text: str, duration: float = 3.0, output_file: str = "output.mp4", still_image: bool = True) -> str:
+    """
+    Generates a simple video with text on a background.
+    With still_image (the default) the card is encoded directly by ffmpeg at STILL_IMAGE_FPS
+    and cached by its content; otherwise every frame goes through moviepy at 24 fps.
+    """
+    output_file = validate_path(output_file)
+    size, bg_color, text_color, fontsize = (640, 480), 'black', 'white', 40
+    img = render_text_image(text, size, bg_color, text_color, fontsize=fontsize)
+
+    if not still_image:
+        clip = ImageClip(np.array(img)).with_duration(duration)
+        clip.write_videofile(output_file, fps=24, codec='libx264', threads=cores.encoder_threads(), logger=jobs.progress_logger())
         return output_file
-    finally:
-        # Cleanup
-        if img_path and os.path.exists(img_path):
-            os.remove(img_path)
+
+    cached = _title_card_cache_path(text, size, bg_color, text_color, fontsize, duration, STILL_IMAGE_FPS)
+    if os.path.exists(cached):
+        os.utime(cached)
+    else:
+        # Encode under a temporary name so a concurrent or cancelled render never leaves a partial card
+        partial = f"{cached}.{uuid.uuid4().hex[:8]}.part.mp4"
+        try:
+            encode_still_image(img, duration, partial)
+            os.replace(partial, cached)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+        _prune_cache(os.path.dirname(cached), TITLE_CARD_CACHE_SIZE)
+    # A copy, not a link: later writes to output_file must not reach the cache (cards are small)
+    shutil.copyfile(cached, output_file)
+    return output_file
 
 def process_detect_highlights(video_path, threshold=5.0):
     cap = cv2.VideoCapture(video_path)
@@ -176,7 +357,7 @@ def process_cut_video(video_path: str, start_time: float, end_time: float, outpu
     if output_path is None:
         output_path = get_unique_output_path(video_path, "cut")
 
-    with VideoFileClip(video_path) as video:
+    with open_video(video_path, t=start_time) as video:
         new_clip = video.subclipped(start_time, end_time)
         write_video(new_clip, output_path)
     return output_path
@@ -185,11 +366,11 @@ def process_concatenate_videos(video_paths: List[str], method: str = "compose",
     video_paths = [validate_path(p) for p in video_paths]
     output_path = validate_path(output_path)
     clips = []
-    try:
+    with ExitStack() as stack:
         for path in video_paths:
             if not os.path.exists(path):
                 raise FileNotFoundError(f"Video file not found: {path}")
-            clips.append(VideoFileClip(path))
+            clips.append(stack.enter_context(open_video(path)))
 
         if not clips:
              raise ValueError("No video paths provided")
@@ -200,9 +381,6 @@ def process_concatenate_videos(video_paths: List[str], method: str = "compose",
         final_clip = concatenate_videoclips(clips, method=method)
         write_video(final_clip, output_path)
         return output_path
-    finally:
-        for clip in clips:
-            clip.close()
 
 def process_resize_video(video_path: str, width: int = None, height: int = None, scale: float = None, output_path: str = None) -> str:
     video_path = validate_path(video_path)
@@ -214,18 +392,11 @@ def process_resize_video(video_path: str, width: int = None, height: int = None,
     if output_path is None:
         output_path = get_unique_output_path(video_path, "resized")
 
-    with VideoFileClip(video_path) as video:
-        if scale:
-            new_clip = video.resized(scale)
-        elif width and height:
-            new_clip = video.resized(newsize=(width, height))
-        elif width:
-            new_clip = video.resized(width=width)
-        elif height:
-            new_clip = video.resized(height=height)
-        else:
-            raise ValueError("Must provide scale, width, or height")
+    if not (scale or width or height):
+        raise ValueError("Must provide scale, width, or height")
 
+    with open_video(video_path) as video:
+        new_clip = transform.apply(video, [{"type": "resize", "width": width, "height": height, "scale": scale}])
         write_video(new_clip, output_path)
     return output_path
 
@@ -239,7 +410,7 @@ def process_speed_video(video_path: str, factor: float, output_path: str = None)
     if output_path is None:
         output_path = get_unique_output_path(video_path, "speed")
 
-    with VideoFileClip(video_path) as video:
+    with open_video(video_path) as video:
         new_clip = video.with_speed_scaled(factor)
         write_video(new_clip, output_path)
     return output_path
@@ -254,7 +425,7 @@ def process_volume_video(video_path: str, factor: float, output_path: str = None
     if output_path is None:
         output_path = get_unique_output_path(video_path, "volume")
 
-    with VideoFileClip(video_path) as video:
+    with open_video(video_path) as video:
         if not video.audio:
             new_clip = video
         else:
@@ -272,30 +443,186 @@ def process_extract_audio(video_path: str, output_path: str = None) -> str:
     if output_path is None:
         output_path = get_unique_output_path(video_path, "audio", ".mp3")
 
-    with VideoFileClip(video_path) as video:
+    with open_video(video_path) as video:
         audio = video.audio
         if not audio:
              raise ValueError("Video has no audio")
-        audio.write_audiofile(output_path)
+        audio.write_audiofile(output_path, logger=jobs.progress_logger())
     return output_path
 
-def process_composite_videos(video_paths: List[str], method: str = "stack", size: tuple[int, int] = None, output_path: str = None) -> str:
+def process_waveform_peaks(video_path: str, start: float = 0.0, end: float = None, max_points: int = 2000) -> dict:
+    """
+    Waveform min/max/RMS peaks of a file's audio for [start, end], at most max_points of them.
+    The first call streams the audio once into a multi-resolution peaks file cached in SAFE_DIR;
+    later calls at any zoom level only read the slice they need.
+    """
+    video_path = validate_path(video_path)
+
+    if not os.path.exists(video_path):
+        raise FileNotFoundError("Video file not found")
+
+    return audio_analysis.waveform_peaks(video_path, start, end, max_points)
+
+def process_detect_silence(video_path: str, threshold_db: float = -40.0, min_silence: float = 0.5, window: float = 0.05) -> List[Tuple[float, float]]:
+    """
+    Finds (start, end) intervals of at least min_silence seconds quieter than threshold_db dBFS.
+    """
+    video_path = validate_path(video_path)
+
+    if not os.path.exists(video_path):
+        raise FileNotFoundError("Video file not found")
+    if not audio_analysis.has_audio(video_path):
+        raise ValueError("Video has no audio")
+    if window <= 0 or min_silence < 0:
+        raise ValueError("window must be positive and min_silence non-negative")
+
+    return audio_analysis.detect_silence(video_path, threshold_db, min_silence, window)
+
+def process_trim_silence(video_path: str, threshold_db: float = -40.0, min_silence: float = 0.5, padding: float = 0.1, output_path: str = None) -> str:
+    """
+    Removes silent intervals (keeping padding seconds of each edge) and joins the remaining
+    segments, decoding and encoding the video once.
+    """
+    video_path = validate_path(video_path)
+    output_path = validate_path(output_path)
+
+    if not os.path.exists(video_path):
+        raise FileNotFoundError("Video file not found")
+    if padding < 0:
+        raise ValueError("padding must be non-negative")
+
+    if output_path is None:
+        output_path = get_unique_output_path(video_path, "trimmed")
+
+    if not audio_analysis.has_audio(video_path):
+        raise ValueError("Video has no audio")
+
+    silences = audio_analysis.detect_silence(video_path, threshold_db, min_silence)
+    with open_video(video_path) as video:
+        keep, position = [], 0.0
+        for start, end in silences:
+            # Silence at the very start or end goes entirely; elsewhere keep padding on both sides
+            cut_start = 0.0 if start <= 0 else start + padding
+            cut_end = video.duration if end >= video.duration - 0.01 else end - padding
+            if cut_end <= cut_start:
+                continue
+            if cut_start > position:
+                keep.append((position, cut_start))
+            position = cut_end
+        if position < video.duration:
+            keep.append((position, video.duration))
+        if not keep:
+            raise ValueError("The whole video is silent")
+        if len(keep) == 1 and keep[0] == (0.0, video.duration):
+            # Nothing to remove: no need to re-encode
+            shutil.copyfile(video_path, output_path)
+            return output_path
+
+        final_clip = concatenate_videoclips([video.subclipped(start, end) for start, end in keep])
+        write_video(final_clip, output_path)
+    return output_path
+
+def grid_layout(source_sizes: List[Tuple[int, int]], rows: int = None, cols: int = None, size: Tuple[int, int] = None):
+    """
+    Computes the tile placement for a rows x cols grid.
+    Each source is scaled to fit its cell (keeping aspect ratio) and centered in it.
+    Returns the (even) canvas size and a list of ((tile_w, tile_h), (x, y)) per source.
+    """
+    count = len(source_sizes)
+    if count == 0:
+        raise ValueError("No video paths provided")
+
+    if rows and cols:
+        if rows * cols < count:
+            raise ValueError(f"A {rows}x{cols} grid cannot hold {count} videos")
+    elif rows:
+        cols = math.ceil(count / rows)
+    elif cols:
+        rows = math.ceil(count / cols)
+    else:
+        cols = math.ceil(math.sqrt(count))
+        rows = math.ceil(count / cols)
+
+    if size is None:
+        size = source_sizes[0]
+    # libx264 with yuv420p needs even dimensions
+    width, height = int(size[0]) // 2 * 2, int(size[1]) // 2 * 2
+    cell_w, cell_h = width // cols, height // rows
+    if cell_w < 1 or cell_h < 1:
+        raise ValueError(f"Output size {size} is too small for a {rows}x{cols} grid")
+
+    tiles = []
+    for index, (src_w, src_h) in enumerate(source_sizes):
+        scale = min(cell_w / src_w, cell_h / src_h)
+        tile_w, tile_h = max(1, int(src_w * scale)), max(1, int(src_h * scale))
+        row, col = divmod(index, cols)
+        x = col * cell_w + (cell_w - tile_w) // 2
+        y = row * cell_h + (cell_h - tile_h) // 2
+        tiles.append(((tile_w, tile_h), (x, y)))
+    return (width, height), tiles
+
+def make_grid_clip(clips, positions: List[Tuple[int, int]], size: Tuple[int, int], fill_color: tuple[int, int, int] = (0, 0, 0), hold_last_frame: bool = True):
+    """
+    Draws already-scaled tiles into preallocated canvases, taken in turn from a ring that
+    outlasts the frames the pipelined encoder still holds. Tiles shorter than the grid
+    either hold their last frame or are painted with fill_color.
+    """
+    width, height = size
+    # Every frame redraws the same tile areas, so the rest of each canvas keeps fill_color
+    canvases = pipeline.CanvasRing((height, width, 3), fill=fill_color)
+    duration = max(clip.duration for clip in clips)
+
+    def frame_function(t):
+        canvas = canvases.next()
+        for clip, (x, y) in zip(clips, positions):
+            tile_w, tile_h = clip.size
+            region = canvas[y:y + tile_h, x:x + tile_w]
+            tile_t = t
+            if tile_t >= clip.duration:
+                if not hold_last_frame:
+                    region[:] = fill_color
+                    continue
+                # The reader returns its last decoded frame without seeking again
+                tile_t = clip.duration - 1.0 / clip.fps
+            region[:] = clip.get_frame(tile_t)[:tile_h, :tile_w, :3]
+        return canvas
+
+    grid = VideoClip(frame_function, duration=duration)
+    grid.fps = max(clip.fps for clip in clips)
+    audios = [clip.audio for clip in clips if clip.audio]
+    if audios:
+        grid = grid.with_audio(CompositeAudioClip(audios))
+    return grid
+
+def process_composite_videos(video_paths: List[str], method: str = "stack", size: tuple[int, int] = None, output_path: str = None, rows: int = None, cols: int = None, fill_color: tuple[int, int, int] = (0, 0, 0), hold_last_frame: bool = True) -> str:
     video_paths = [validate_path(p) for p in video_paths]
     output_path = validate_path(output_path)
     clips = []
-    try:
+    with ExitStack() as stack:
         for path in video_paths:
             if not os.path.exists(path):
                 raise FileNotFoundError(f"Video file not found: {path}")
-            clips.append(VideoFileClip(path))
 
-        if not clips:
+        if not video_paths:
              raise ValueError("No video paths provided")
 
         if method == "stack":
+            for path in video_paths:
+                clips.append(stack.enter_context(open_video(path)))
             final_clip = CompositeVideoClip(clips, size=size)
         elif method == "grid":
-            final_clip = clips_array([clips])
+            source_sizes = []
+            for path in video_paths:
+                infos = ffmpeg_parse_infos(path)
+                src_w, src_h = infos.get("video_size", (1, 1))
+                if abs(infos.get("video_rotation", 0)) in (90, 270):
+                    src_w, src_h = src_h, src_w
+                source_sizes.append((src_w, src_h))
+            canvas_size, tiles = grid_layout(source_sizes, rows, cols, size)
+            # Let ffmpeg scale each tile to its cell while decoding
+            for path, (tile_size, _) in zip(video_paths, tiles):
+                clips.append(stack.enter_context(open_video(path, target_resolution=tile_size)))
+            final_clip = make_grid_clip(clips, [position for _, position in tiles], canvas_size, fill_color, hold_last_frame)
         else:
             raise ValueError("Invalid method. Use 'stack' or 'grid'")
 
@@ -304,12 +631,6 @@ def process_composite_videos(video_paths: List[str], method: str = "stack", size
 
         write_video(final_clip, output_path)
         return output_path
-    finally:
-        for clip in clips:
-            try:
-                clip.close()
-            except:
-                pass
 
 def process_text_overlay(video_path: str, text: str, fontsize: int = 50, color: str = "white", position: Union[str, Tuple[int, int]] = "center", duration: float = None, start_time: float = 0.0, output_path: str = None) -> str:
     video_path = validate_path(video_path)
@@ -323,7 +644,7 @@ def process_text_overlay(video_path: str, text: str, fontsize: int = 50, color:
 
     img_path = None
     try:
-        with VideoFileClip(video_path) as video:
+        with open_video(video_path) as video:
             # Create transparent image with text
             img = Image.new('RGBA', video.size, (0, 0, 0, 0))
             d = ImageDraw.Draw(img)
@@ -366,7 +687,7 @@ def process_text_overlay(video_path: str, text: str, fontsize: int = 50, color:
             txt_clip = ImageClip(img_path).with_duration(duration or video.duration).with_start(start_time)
 
             final_clip = CompositeVideoClip([video, txt_clip])
-            write_video(final_clip, output_path)
+            write_edit(final_clip, output_path, video.filename, [(start_time, start_time + (duration or video.duration))])
 
         return output_path
     finally:
@@ -386,7 +707,7 @@ def process_image_overlay(video_path: str, image_path: str, position: Union[str,
     if output_path is None:
         output_path = get_unique_output_path(video_path, "img_overlay")
 
-    with VideoFileClip(video_path) as video:
+    with open_video(video_path) as video:
         img_clip = ImageClip(image_path)
 
         if scale:
@@ -398,7 +719,7 @@ def process_image_overlay(video_path: str, image_path: str, position: Union[str,
             img_clip = img_clip.with_opacity(opacity)
 
         final_clip = CompositeVideoClip([video, img_clip])
-        write_video(final_clip, output_path)
+        write_edit(final_clip, output_path, video.filename, [(start_time, start_time + (duration or video.duration))])
 
     return output_path
 
@@ -412,19 +733,19 @@ def process_color_effect(video_path: str, effect_type: str, factor: float = 1.0,
     if output_path is None:
         output_path = get_unique_output_path(video_path, f"fx_{effect_type}")
 
-    with VideoFileClip(video_path) as video:
+    with open_video(video_path) as video:
         if effect_type == "blackwhite":
-            new_clip = video.with_effects([vfx.BlackAndWhite()])
+            effect = vfx.BlackAndWhite()
         elif effect_type == "brightness":
-            new_clip = video.with_effects([vfx.MultiplyColor(factor)])
+            effect = vfx.MultiplyColor(factor)
         elif effect_type == "invert":
-            new_clip = video.with_effects([vfx.InvertColors()])
+            effect = vfx.InvertColors()
         elif effect_type == "contrast":
-            new_clip = video.with_effects([vfx.LumContrast(contrast=factor)])
+            effect = vfx.LumContrast(contrast=factor)
         else:
             raise ValueError(f"Unknown effect type: {effect_type}")
 
-        write_video(new_clip, output_path)
+        write_video(video, output_path, frame_effects=[effect])
     return output_path
 
 def process_mirror_video(video_path: str, axis: str = "x", output_path: str = None) -> str:
@@ -437,13 +758,11 @@ def process_mirror_video(video_path: str, axis: str = "x", output_path: str = No
     if output_path is None:
         output_path = get_unique_output_path(video_path, f"mirror_{axis}")
 
-    with VideoFileClip(video_path) as video:
-        if axis == "x":
-            new_clip = video.with_effects([vfx.MirrorX()])
-        elif axis == "y":
-            new_clip = video.with_effects([vfx.MirrorY()])
-        else:
-            raise ValueError("Axis must be 'x' or 'y'")
+    if axis not in ("x", "y"):
+        raise ValueError("Axis must be 'x' or 'y'")
+
+    with open_video(video_path) as video:
+        new_clip = transform.apply(video, [{"type": "mirror", "axis": axis}])
 
         write_video(new_clip, output_path)
     return output_path
@@ -458,23 +777,80 @@ def process_rotate_video(video_path: str, angle: float, output_path: str = None)
     if output_path is None:
         output_path = get_unique_output_path(video_path, "rotate")
 
-    with VideoFileClip(video_path) as video:
-        new_clip = video.rotated(angle)
+    with open_video(video_path) as video:
+        new_clip = transform.apply(video, [{"type": "rotate", "angle": angle}])
         write_video(new_clip, output_path)
     return output_path
 
-def process_crop_video(video_path: str, x1: int = None, y1: int = None, x2: int = None, y2: int = None, width: int = None, height: int = None, output_path: str = None) -> str:
+def _inner_edges(picture: np.ndarray, scale: float, size: int) -> Tuple[int, int]:
+    # [start, end) in source pixels of the picture lines of a profile sampled every scale
+    # pixels, rounded inward to even pixels; a sampled line straddling a border is border
+    first, last = int(np.argmax(picture)), len(picture) - 1 - int(np.argmax(picture[::-1]))
+    start = math.ceil((first + 1) * scale) if first > 0 else 0
+    end = math.floor(last * scale) if last < len(picture) - 1 else size
+    start += start % 2
+    end -= (end - start) % 2
+    return start, end
+
+def detect_crop_rectangle(video_path: str, samples: int = CROP_DETECT_SAMPLES, limit: float = CROP_DETECT_LIMIT) -> dict:
+    """
+    The picture area inside black borders, from samples frames spread over the video and
+    decoded CROP_DETECT_WIDTH wide. A row or column is picture if its mean luminance is
+    over limit in any sample. Each sample is a single seek, so the cost does not depend on the length.
+    """
+    with open_video(video_path, target_resolution=(CROP_DETECT_WIDTH, None)) as video:
+        source_width, source_height = video.reader.infos["video_size"]
+        # Leaves out the first and last 5%, where fades and black leaders are
+        times = [video.duration * (0.05 + 0.9 * (i + 0.5) / samples) for i in range(samples)]
+        luma = np.stack([cv2.cvtColor(video.get_frame(t), cv2.COLOR_RGB2GRAY) for t in times])
+    rows = luma.mean(axis=2).max(axis=0) > limit
+    columns = luma.mean(axis=1).max(axis=0) > limit
+    if not rows.any() or not columns.any():
+        y1, y2, x1, x2 = 0, source_height, 0, source_width
+    else:
+        y1, y2 = _inner_edges(rows, source_height / luma.shape[1], source_height)
+        x1, x2 = _inner_edges(columns, source_width / luma.shape[2], source_width)
+    return {
+        "x1": x1, "y1": y1, "x2": x2, "y2": y2, "width": x2 - x1, "height": y2 - y1,
+        "source_width": source_width, "source_height": source_height,
+        "cropped": (x2 - x1, y2 - y1) != (source_width, source_height),
+    }
+
+def process_detect_crop(video_path: str, samples: int = CROP_DETECT_SAMPLES, limit: float = CROP_DETECT_LIMIT) -> dict:
+    """
+    Finds the black borders (letterbox, pillarbox) of a video; see detect_crop_rectangle.
+    """
+    video_path = validate_path(video_path)
+
+    if not os.path.exists(video_path):
+        raise FileNotFoundError("Video file not found")
+    if not 1 <= samples <= CROP_DETECT_MAX_SAMPLES:
+        raise ValueError(f"samples must be between 1 and {CROP_DETECT_MAX_SAMPLES}")
+    if not 0 <= limit < 255:
+        raise ValueError("limit must be between 0 and 255")
+
+    return detect_crop_rectangle(video_path, samples, limit)
+
+def process_crop_video(video_path: str, x1: int = None, y1: int = None, x2: int = None, y2: int = None, width: int = None, height: int = None, output_path: str = None, auto_crop: bool = False) -> str:
+    """
+    Crops to the given rectangle, or with auto_crop to the picture inside the black borders.
+    """
     video_path = validate_path(video_path)
     output_path = validate_path(output_path)
 
     if not os.path.exists(video_path):
         raise FileNotFoundError("Video file not found")
+    if auto_crop:
+        if any(value is not None for value in (x1, y1, x2, y2, width, height)):
+            raise ValueError("auto_crop cannot be combined with crop coordinates")
+        rectangle = detect_crop_rectangle(video_path)
+        x1, y1, x2, y2 = rectangle["x1"], rectangle["y1"], rectangle["x2"], rectangle["y2"]
 
     if output_path is None:
         output_path = get_unique_output_path(video_path, "crop")
 
-    with VideoFileClip(video_path) as video:
-        new_clip = video.cropped(x1=x1, y1=y1, x2=x2, y2=y2, width=width, height=height)
+    with open_video(video_path) as video:
+        new_clip = transform.apply(video, [{"type": "crop", "x1": x1, "y1": y1, "x2": x2, "y2": y2, "width": width, "height": height}])
         write_video(new_clip, output_path)
     return output_path
 
@@ -488,8 +864,30 @@ def process_margin_video(video_path: str, margin: int, color: tuple[int, int, in
     if output_path is None:
         output_path = get_unique_output_path(video_path, "margin")
 
-    with VideoFileClip(video_path) as video:
-        new_clip = video.with_effects([vfx.Margin(margin_size=margin, color=color, opacity=opacity)])
+    with open_video(video_path) as video:
+        if opacity < 1:
+            # A translucent margin needs a mask, which only moviepy's compositing provides
+            new_clip = video.with_effects([vfx.Margin(margin_size=margin, color=color, opacity=opacity)])
+        else:
+            new_clip = transform.apply(video, [{"type": "margin", "margin": margin, "color": color}])
+        write_video(new_clip, output_path)
+    return output_path
+
+def process_transform_video(video_path: str, steps: List[dict], output_path: str = None) -> str:
+    """
+    Applies a chain of crop/resize/rotate/mirror/margin steps as one warp per frame.
+    """
+    video_path = validate_path(video_path)
+    output_path = validate_path(output_path)
+
+    if not os.path.exists(video_path):
+        raise FileNotFoundError("Video file not found")
+
+    if output_path is None:
+        output_path = get_unique_output_path(video_path, "transform")
+
+    with open_video(video_path) as video:
+        new_clip = transform.apply(video, steps)
         write_video(new_clip, output_path)
     return output_path
 
@@ -503,14 +901,16 @@ def process_fade_video(video_path: str, fade_type: str, duration: float, output_
     if output_path is None:
         output_path = get_unique_output_path(video_path, f"fade_{fade_type}")
 
-    with VideoFileClip(video_path) as video:
+    with open_video(video_path) as video:
         if fade_type == "in":
             new_clip = video.with_effects([vfx.FadeIn(duration)])
+            changed = [(0, duration)]
         elif fade_type == "out":
             new_clip = video.with_effects([vfx.FadeOut(duration)])
+            changed = [(video.duration - duration, video.duration)]
         else:
             raise ValueError("Fade type must be 'in' or 'out'")
-        write_video(new_clip, output_path)
+        write_edit(new_clip, output_path, video.filename, changed)
     return output_path
 
 def process_loop_video(video_path: str, n: int = None, duration: float = None, output_path: str = None) -> str:
@@ -523,7 +923,7 @@ def process_loop_video(video_path: str, n: int = None, duration: float = None, o
     if output_path is None:
         output_path = get_unique_output_path(video_path, "loop")
 
-    with VideoFileClip(video_path) as video:
+    with open_video(video_path) as video:
         new_clip = video.with_effects([vfx.Loop(n=n, duration=duration)])
         write_video(new_clip, output_path)
     return output_path
@@ -538,7 +938,7 @@ def process_time_effect_video(video_path: str, effect_type: str, duration: float
     if output_path is None:
         output_path = get_unique_output_path(video_path, f"time_{effect_type}")
 
-    with VideoFileClip(video_path) as video:
+    with open_video(video_path) as video:
         if effect_type == "reverse":
             new_clip = video.with_effects([vfx.TimeMirror()])
         elif effect_type == "symmetrize":
@@ -546,8 +946,10 @@ def process_time_effect_video(video_path: str, effect_type: str, duration: float
         elif effect_type == "freeze":
             if duration is None:
                 raise ValueError("Duration required for freeze effect")
-            # Freeze at the start
+            # Freeze at the start: new frames before an unchanged source
             new_clip = video.with_effects([vfx.Freeze(t=0, freeze_duration=duration)])
+            write_edit(new_clip, output_path, video.filename, [], inserted=duration)
+            return output_path
         else:
             raise ValueError(f"Unknown time effect: {effect_type}")
         write_video(new_clip, output_path)
@@ -563,7 +965,7 @@ def process_audio_fade_video(video_path: str, fade_type: str, duration: float, o
     if output_path is None:
         output_path = get_unique_output_path(video_path, f"audio_fade_{fade_type}")
 
-    with VideoFileClip(video_path) as video:
+    with open_video(video_path) as video:
         if not video.audio:
              raise ValueError("Video has no audio")
 
@@ -588,7 +990,7 @@ def process_audio_loop_video(video_path: str, n: int = None, duration: float = N
     if output_path is None:
         output_path = get_unique_output_path(video_path, "audio_loop")
 
-    with VideoFileClip(video_path) as video:
+    with open_video(video_path) as video:
         if not video.audio:
              raise ValueError("Video has no audio")
 
@@ -607,7 +1009,7 @@ def process_accel_decel_video(video_path: str, new_duration: float = None, absci
     if output_path is None:
         output_path = get_unique_output_path(video_path, "accel_decel")
 
-    with VideoFileClip(video_path) as video:
+    with open_video(video_path) as video:
         new_clip = video.with_effects([vfx.AccelDecel(new_duration=new_duration, abscissa_fixed=abscissa_fixed)])
         write_video(new_clip, output_path)
     return output_path
@@ -622,7 +1024,7 @@ def process_blink_video(video_path: str, duration_on: float, duration_off: float
     if output_path is None:
         output_path = get_unique_output_path(video_path, "blink")
 
-    with VideoFileClip(video_path) as video:
+    with open_video(video_path) as video:
         new_clip = video.with_effects([vfx.Blink(duration_on=duration_on, duration_off=duration_off)])
         write_video(new_clip, output_path)
     return output_path
@@ -637,24 +1039,24 @@ def process_gamma_correction_video(video_path: str, gamma: float, output_path: s
     if output_path is None:
         output_path = get_unique_output_path(video_path, "gamma")
 
-    with VideoFileClip(video_path) as video:
-        new_clip = video.with_effects([vfx.GammaCorrection(gamma=gamma)])
-        write_video(new_clip, output_path)
+    with open_video(video_path) as video:
+        write_video(video, output_path, frame_effects=[vfx.GammaCorrection(gamma=gamma)])
     return output_path
 
-def process_painting_video(video_path: str, saturation: float = 1.4, black: float = 0.006, output_path: str = None) -> str:
+def process_painting_video(video_path: str, saturation: float = 1.4, black: float = 0.006, output_path: str = None, edge_scale: float = 1.0) -> str:
     video_path = validate_path(video_path)
     output_path = validate_path(output_path)
 
     if not os.path.exists(video_path):
         raise FileNotFoundError("Video file not found")
+    if not 0 < edge_scale <= 1:
+        raise ValueError("edge_scale must be in (0, 1]")
 
     if output_path is None:
         output_path = get_unique_output_path(video_path, "painting")
 
-    with VideoFileClip(video_path) as video:
-        new_clip = video.with_effects([vfx.Painting(saturation=saturation, black=black)])
-        write_video(new_clip, output_path)
+    with open_video(video_path) as video:
+        write_video(video, output_path, frame_effects=[effects.Painting(saturation=saturation, black=black, edge_scale=edge_scale)])
     return output_path
 
 def process_write_gif(video_path: str, fps: int = None, program: str = "imageio", output_path: str = None) -> str:
@@ -667,8 +1069,192 @@ def process_write_gif(video_path: str, fps: int = None, program: str = "imageio"
     if output_path is None:
         output_path = get_unique_output_path(video_path, "gif", ".gif")
 
-    with VideoFileClip(video_path) as video:
-        video.write_gif(output_path, fps=fps, program=program)
+    with open_video(video_path) as video:
+        video.write_gif(output_path, fps=fps, program=program, logger=jobs.progress_logger())
+    return output_path
+
+def process_export_ladder(video_path: str, renditions: List[Tuple[int, int]] = None, hls: bool = True, segment_duration: float = 4.0, output_dir: str = None) -> str:
+    """
+    Exports several renditions (height, video kbps) from a single decode of the source:
+    ffmpeg splits the decoded frames, scales and encodes each rung with its own bitrate.
+    With hls, each rung becomes a VOD playlist of segments next to a master.m3u8;
+    otherwise each rung is written as {height}p.mp4. Returns the output directory.
+    """
+    video_path = validate_path(video_path)
+    output_dir = validate_path(output_dir)
+
+    if not os.path.exists(video_path):
+        raise FileNotFoundError("Video file not found")
+
+    infos = ffmpeg_parse_infos(video_path)
+    src_w, src_h = infos.get("video_size") or (0, 0)
+    if abs(infos.get("video_rotation", 0)) in (90, 270):
+        src_w, src_h = src_h, src_w
+    if not src_h:
+        raise ValueError("Source has no video stream")
+    fps = infos.get("video_fps") or 30
+    has_audio = infos.get("audio_found", False)
+
+    if renditions is None:
+        # Never upscale: keep the rungs the source can fill, or the source itself
+        renditions = [rung for rung in DEFAULT_LADDER if rung[0] <= src_h] or [(src_h - src_h % 2, DEFAULT_LADDER[-1][1])]
+    renditions = sorted({int(height): int(kbps) for height, kbps in renditions}.items(), reverse=True)
+    if any(height <= 0 or height % 2 or kbps <= 0 for height, kbps in renditions):
+        raise ValueError("Rendition heights must be positive even numbers and bitrates positive")
+
+    if output_dir is None:
+        output_dir = get_unique_output_path(video_path, "hls" if hls else "ladder", ext="")
+    os.makedirs(output_dir, exist_ok=True)
+
+    count = len(renditions)
+    graph = f"[0:v]split={count}" + "".join(f"[s{i}]" for i in range(count)) + ";"
+    graph += ";".join(f"[s{i}]scale=-2:{height}[v{i}]" for i, (height, _) in enumerate(renditions))
+    # Keyframes at every segment boundary in every rung, so players can switch between them
+    gop = ["-force_key_frames", f"expr:gte(t,n_forced*{segment_duration})", "-sc_threshold", "0"]
+
+    args = ["-i", video_path, "-filter_complex", graph]
+    outputs = []
+    if hls:
+        for i, (height, kbps) in enumerate(renditions):
+            args += ["-map", f"[v{i}]"]
+            args += [f"-b:v:{i}", f"{kbps}k", f"-maxrate:v:{i}", f"{int(kbps * 1.07)}k", f"-bufsize:v:{i}", f"{kbps * 2}k"]
+            if has_audio:
+                args += ["-map", "0:a:0"]
+        args += ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p", *gop, *cores.thread_args()]
+        if has_audio:
+            args += ["-c:a", "aac", "-b:a", "128k", "-ac", "2"]
+        stream_map = " ".join(
+            f"v:{i},a:{i},name:{height}p" if has_audio else f"v:{i},name:{height}p" for i, (height, _) in enumerate(renditions)
+        )
+        args += [
+            "-f", "hls", "-hls_time", str(segment_duration), "-hls_playlist_type", "vod",
+            "-hls_segment_filename", os.path.join(output_dir, "%v", "segment_%05d.ts"),
+            "-master_pl_name", "master.m3u8", "-var_stream_map", stream_map,
+            os.path.join(output_dir, "%v", "index.m3u8"),
+        ]
+    else:
+        for i, (height, kbps) in enumerate(renditions):
+            path = os.path.join(output_dir, f"{height}p.mp4")
+            args += ["-map", f"[v{i}]", "-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+                     "-b:v", f"{kbps}k", "-maxrate", f"{int(kbps * 1.07)}k", "-bufsize", f"{kbps * 2}k", *gop,
+                     *cores.thread_args()]
+            if has_audio:
+                args += ["-map", "0:a:0", "-c:a", "aac", "-b:a", "128k"]
+            args += ["-movflags", "+faststart", path]
+            outputs.append(path)
+    run_ffmpeg(args, outputs=[output_dir])
+    return output_dir
+
+TIMELINE_EFFECTS = {
+    "fade_in": lambda clip, value: clip.with_effects([vfx.FadeIn(value)]),
+    "fade_out": lambda clip, value: clip.with_effects([vfx.FadeOut(value)]),
+    "audio_fade_in": lambda clip, value: clip.with_audio(clip.audio.with_effects([afx.AudioFadeIn(value)])) if clip.audio else clip,
+    "audio_fade_out": lambda clip, value: clip.with_audio(clip.audio.with_effects([afx.AudioFadeOut(value)])) if clip.audio else clip,
+    "speed": lambda clip, value: clip.with_speed_scaled(value),
+    "volume": lambda clip, value: clip.with_volume_scaled(value) if clip.audio else clip,
+    "brightness": lambda clip, value: clip.with_effects([vfx.MultiplyColor(value)]),
+    "contrast": lambda clip, value: clip.with_effects([vfx.LumContrast(contrast=value)]),
+    "gamma": lambda clip, value: clip.with_effects([vfx.GammaCorrection(gamma=value)]),
+    "blackwhite": lambda clip, value: clip.with_effects([vfx.BlackAndWhite()]),
+    "invert": lambda clip, value: clip.with_effects([vfx.InvertColors()]),
+    "mirror_x": lambda clip, value: clip.with_effects([vfx.MirrorX()]),
+    "mirror_y": lambda clip, value: clip.with_effects([vfx.MirrorY()]),
+}
+
+def _render_timeline_segment(segment: timelines.Segment, size: Tuple[int, int], fps: float, output_path: str):
+    clip = segment.clip
+    with open_video(clip.source, t=clip.start) as video:
+        end = video.duration if clip.end is None else min(clip.end, video.duration)
+        part = video.subclipped(clip.start, end)
+        for effect in clip.effects:
+            part = TIMELINE_EFFECTS[effect.type](part, effect.value)
+        if tuple(part.size) != size:
+            # Letterbox into the timeline's frame
+            part = part.resized(min(size[0] / part.w, size[1] / part.h))
+        layers = [part.with_position("center")]
+
+        for _, overlay in segment.overlays:
+            if overlay.text is not None:
+                img = render_text_image(overlay.text, size, text_color=overlay.color, transparent=True,
+                                        fontsize=overlay.fontsize, position=overlay.position)
+                layer = ImageClip(np.array(img))
+            else:
+                layer = ImageClip(overlay.image_path)
+                if overlay.scale:
+                    layer = layer.resized(overlay.scale)
+                layer = layer.with_position(overlay.position)
+            if overlay.opacity < 1.0:
+                layer = layer.with_opacity(overlay.opacity)
+            layers.append(layer.with_start(overlay.start).with_duration(overlay.duration))
+
+        final_clip = CompositeVideoClip(layers, size=size, bg_color=(0, 0, 0)).with_duration(segment.duration)
+        if part.audio is None:
+            # Silent sources still need an audio stream to be joined with the others
+            final_clip = final_clip.with_audio(
+                AudioClip(lambda t: np.zeros((len(t), 2) if np.ndim(t) else 2), duration=segment.duration, fps=TIMELINE_AUDIO_FPS)
+            )
+        write_video(final_clip, output_path, fps=fps, ffmpeg_params=TIMELINE_ENCODE_PARAMS)
+
+def process_render_timeline(timeline: Union[dict, str], output_path: str = None) -> str:
+    """
+    Renders a timeline document (see timeline.py) segment by segment. Each segment is encoded
+    to a chunk cached under its key, so re-rendering an edited timeline only encodes the segments
+    the edit touched; the chunks are then joined with stream copy.
+    """
+    if isinstance(timeline, str):
+        timeline = validate_path(timeline)
+        if not os.path.exists(timeline):
+            raise FileNotFoundError("Timeline file not found")
+    doc = timelines.load(timeline, lambda path: validate_path(timelines.resolve_path(path)))
+    output_path = validate_path(output_path)
+
+    for path in timelines.input_paths(doc):
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Timeline media not found: {path}")
+
+    def source_duration(path: str) -> float:
+        infos = ffmpeg_parse_infos(path)
+        return infos.get("video_duration") or infos["duration"]
+
+    segments = timelines.plan(doc, source_duration, audio_analysis.source_fingerprint)
+    if output_path is None:
+        output_path = get_unique_output_path(doc.clips[0].source, "timeline")
+
+    cache_dir = os.path.join(SAFE_DIR, TIMELINE_CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+    chunks, rendered = [], 0
+    for segment in segments:
+        chunk = os.path.join(cache_dir, f"{segment.key}.mp4")
+        if os.path.exists(chunk):
+            os.utime(chunk)
+            TIMELINE_SEGMENTS.inc(result="cached")
+        else:
+            # Encode under a temporary name so a concurrent or cancelled render never leaves a partial chunk
+            partial = f"{chunk}.{uuid.uuid4().hex[:8]}.part.mp4"
+            try:
+                _render_timeline_segment(segment, (doc.width, doc.height), doc.fps, partial)
+                os.replace(partial, chunk)
+            finally:
+                if os.path.exists(partial):
+                    os.remove(partial)
+            rendered += 1
+            TIMELINE_SEGMENTS.inc(result="rendered")
+        chunks.append(chunk)
+
+    job = jobs.current_job()
+    if job is not None:
+        job.details["timeline"] = {"segments": len(segments), "rendered": rendered, "cached": len(segments) - rendered}
+
+    fd, list_path = tempfile.mkstemp(suffix=".ffconcat")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write("ffconcat version 1.0\n")
+            f.writelines(f"file '{chunk}'\n" for chunk in chunks)
+        run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", "-movflags", "+faststart", output_path],
+                   outputs=[output_path])
+    finally:
+        os.remove(list_path)
+    _prune_cache(cache_dir, max(TIMELINE_CACHE_SIZE, len(chunks)))
     return output_path
 
 def process_save_frame(video_path: str, t: float, output_path: str = None) -> str:
@@ -681,17 +1267,104 @@ def process_save_frame(video_path: str, t: float, output_path: str = None) -> st
     if output_path is None:
         output_path = get_unique_output_path(video_path, "frame", ".png")
 
-    with VideoFileClip(video_path) as video:
+    with open_video(video_path, t=t) as video:
         video.save_frame(output_path, t=t)
     return output_path
 
+def _fit(img: Image.Image, max_size: Optional[int]) -> Image.Image:
+    # Scaled down (never up) so the longer side is at most max_size
+    if max_size and max(img.size) > max_size:
+        scale = max_size / max(img.size)
+        img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.LANCZOS)
+    return img
+
+def encode_image(frame: np.ndarray, max_size: Optional[int] = None, format: str = "jpeg", quality: Optional[int] = 80) -> bytes:
+    """
+    Encodes an RGB frame in memory, scaled down to fit max_size x max_size if given.
+    quality applies to the lossy formats (jpeg, webp); png is lossless.
+    """
+    buffer = io.BytesIO()
+    options = {"quality": quality} if quality is not None and format != "png" else {}
+    _fit(Image.fromarray(frame), max_size).save(buffer, PREVIEW_FORMATS[format], **options)
+    return buffer.getvalue()
+
+def _check_preview(max_size: Optional[int], quality: Optional[int] = None):
+    if max_size is not None and max_size <= 0:
+        raise ValueError("max_size must be positive")
+    if quality is not None and not 1 <= quality <= 100:
+        raise ValueError("quality must be between 1 and 100")
+
+def _spill(data: bytes, max_bytes: Optional[int], video_path: str, suffix: str, ext: str, output_path: str = None) -> Union[bytes, str]:
+    # Small results stay in memory; larger ones are written out and returned as a path
+    if max_bytes is None or len(data) <= max_bytes:
+        return data
+    if output_path is None:
+        output_path = get_unique_output_path(video_path, suffix, ext)
+    with open(output_path, "wb") as f:
+        f.write(data)
+    return output_path
+
+def process_preview_frame(video_path: str, t: float = 0.0, max_size: Optional[int] = 512, format: str = "jpeg", quality: Optional[int] = 80, max_bytes: Optional[int] = None, output_path: str = None) -> Union[bytes, str]:
+    """
+    The frame at t encoded in memory (no file is written), or, when the encoding is over
+    max_bytes, the path it was saved to instead.
+    """
+    video_path = validate_path(video_path)
+    output_path = validate_path(output_path)
+
+    if not os.path.exists(video_path):
+        raise FileNotFoundError("Video file not found")
+    if format not in PREVIEW_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(PREVIEW_FORMATS)}")
+    _check_preview(max_size, quality)
+
+    with open_video(video_path, t=t) as video:
+        frame = video.get_frame(t)
+    data = encode_image(frame, max_size, format, quality)
+    return _spill(data, max_bytes, video_path, "frame", f".{'jpg' if format == 'jpeg' else format}", output_path)
+
+def process_preview_gif(video_path: str, fps: Optional[float] = None, max_size: Optional[int] = 320, max_bytes: Optional[int] = None, output_path: str = None,
+                        max_duration: Optional[float] = PREVIEW_GIF_MAX_DURATION, max_frames: Optional[int] = PREVIEW_GIF_MAX_FRAMES) -> Union[bytes, str]:
+    """
+    The first max_duration seconds of the video (all of it with None) as an animated GIF of
+    at most max_frames frames, encoded in memory, or, when it is over max_bytes, the path it
+    was saved to instead. fps defaults to the video's, at most PREVIEW_GIF_FPS.
+    """
+    video_path = validate_path(video_path)
+    output_path = validate_path(output_path)
+
+    if not os.path.exists(video_path):
+        raise FileNotFoundError("Video file not found")
+    if fps is not None and fps <= 0:
+        raise ValueError("fps must be positive")
+    if max_duration is not None and max_duration <= 0:
+        raise ValueError("max_duration must be positive")
+    if max_frames is not None and max_frames <= 0:
+        raise ValueError("max_frames must be positive")
+    _check_preview(max_size)
+
+    buffer = io.BytesIO()
+    with open_video(video_path) as video:
+        fps = fps or min(video.fps, PREVIEW_GIF_FPS)
+        clip = video
+        if max_duration is not None and max_duration < video.duration:
+            clip = video.subclipped(0, max_duration)
+        if max_frames is not None and clip.duration * fps > max_frames:
+            clip = clip.with_duration(max_frames / fps)
+        # Frames go to the GIF encoder as they are decoded, scaled down first
+        frames = (_fit(Image.fromarray(frame), max_size)
+                  for frame in clip.iter_frames(fps=fps, dtype="uint8", logger=jobs.progress_logger()))
+        first = next(frames)
+        first.save(buffer, "GIF", save_all=True, append_images=frames, duration=round(1000 / fps), loop=0)
+    return _spill(buffer.getvalue(), max_bytes, video_path, "gif", ".gif", output_path)
+
 def process_detect_scenes(video_path: str, luminosity_threshold: float = 10.0) -> List[Tuple[float, float]]:
     video_path = validate_path(video_path)
     if not os.path.exists(video_path):
         raise FileNotFoundError("Video file not found")
 
-    with VideoFileClip(video_path) as video:
-        cuts, luminosities = detect_scenes(video, luminosity_threshold=luminosity_threshold)
+    with open_video(video_path) as video:
+        cuts, luminosities = detect_scenes(video, luminosity_threshold=luminosity_threshold, logger=jobs.progress_logger())
         return cuts
 
 def process_audio_delay_video(video_path: str, offset: float, output_path: str = None) -> str:
@@ -704,7 +1377,7 @@ def process_audio_delay_video(video_path: str, offset: float, output_path: str =
     if output_path is None:
         output_path = get_unique_output_path(video_path, "audio_delay")
 
-    with VideoFileClip(video_path) as video:
+    with open_video(video_path) as video:
         if not video.audio:
              raise ValueError("Video has no audio")
         new_audio = video.audio.with_effects([afx.AudioDelay(offset=offset)])
@@ -722,10 +1395,23 @@ def process_audio_normalize_video(video_path: str, output_path: str = None) -> s
     if output_path is None:
         output_path = get_unique_output_path(video_path, "audio_norm")
 
-    with VideoFileClip(video_path) as video:
+    with open_video(video_path) as video:
         if not video.audio:
              raise ValueError("Video has no audio")
         new_audio = video.audio.with_effects([afx.AudioNormalize()])
         new_clip = video.with_audio(new_audio)
         write_video(new_clip, output_path)
     return output_path
+
+# Every entry point reports request counts, latency and per-stage render timings
+# (the decode/encode split comes from the reader/writer hooks installed above),
+# records its progress and outcome on the current job, and waits for the scheduler
+# to admit it within the memory/CPU budgets before any frame is decoded. Its inputs
+# are protected from storage eviction meanwhile, and its output is indexed for the quota/TTL.
+# A request identical to one in flight waits for that render's result instead of queueing its own.
+for _name, _func in list(globals().items()):
+    if _name.startswith("process_") or _name == "generate_simple_video":
+        _operation = _name.removeprefix("process_")
+        _func = storage.track_operation(_operation)(scheduler.track_operation(_operation, validate_path)(_func))
+        _func = coalesce.track_operation(_operation, validate_path)(_func)
+        globals()[_name] = metrics.track_operation(_operation)(jobs.track_operation(_operation)(_func))
@@ -0,0 +1,10 @@
+import pytest
+from videoEditor_mcp import audio_analysis, conform, mcp_server, storage, timeline, video_utils
+from videoEditor_mcp.routers import video as video_router
+
+@pytest.fixture(autouse=True)
+def isolated_storage(tmp_path, monkeypatch):
+    # Every test stores its files, and indexes them, in its own tmp_path rather than ./storage
+    for module in (storage, audio_analysis, conform, mcp_server, timeline, video_utils, video_router):
+        monkeypatch.setattr(module, "SAFE_DIR", tmp_path)
+    monkeypatch.setattr(storage, "_manager", storage.StorageManager(tmp_path))
@@ -0,0 +1,15 @@
+from benchmarks.operations import compare
+
+def test_compare_flags_only_regressions_beyond_threshold():
+    baseline = {
+        "cut_video@360p": {"status": "ok", "wall_seconds": 1.0, "peak_rss_mb": 100.0},
+        "resize_video@360p": {"status": "ok", "wall_seconds": 1.0, "peak_rss_mb": 100.0},
+        "write_gif@360p": {"status": "error"},
+    }
+    current = {
+        "cut_video@360p": {"status": "ok", "wall_seconds": 1.1, "peak_rss_mb": 100.0},
+        "resize_video@360p": {"status": "ok", "wall_seconds": 1.5, "peak_rss_mb": 90.0},
+        "write_gif@360p": {"status": "ok", "wall_seconds": 9.0},
+    }
+    regressions = compare(baseline, current, threshold=0.2)
+    assert [(key, metric) for key, metric, *_ in regressions] == [("resize_video@360p", "wall_seconds")]
@@ -0,0 +1,89 @@
+import os
+import threading
+from videoEditor_mcp import coalesce, jobs
+
+def _render(calls, release):
+    def process_resize_video(video_path: str, scale: float = None, output_path: str = None) -> str:
+        calls.append(scale)
+        release.wait(5)
+        if scale == 0:
+            raise ValueError("Must provide scale, width, or height")
+        return f"{video_path}.{scale}.mp4"
+    return coalesce.track_operation("resize_video", lambda path: path)(process_resize_video)
+
+def _coalesced():
+    return coalesce.COALESCED._values.get(("resize_video",), 0)
+
+def _in_threads(*calls):
+    results = [None] * len(calls)
+
+    def run(i, call):
+        try:
+            results[i] = call()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i, call)) for i, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    return threads, results
+
+def test_identical_requests_share_one_render(tmp_path):
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"video")
+    calls, release = [], threading.Event()
+    render = _render(calls, release)
+    before = _coalesced()
+
+    leader, follower = jobs.Job("leader"), jobs.Job("follower")
+
+    def call(job, scale):
+        def run():
+            with jobs.bind(job):
+                return render(str(source), scale=scale)
+        return run
+
+    threads, results = _in_threads(call(leader, 0.5), call(None, 0.25))
+    while len(calls) < 2:
+        threading.Event().wait(0.01)
+    duplicate, duplicate_result = _in_threads(call(follower, 0.5))
+    while _coalesced() == before:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads + duplicate:
+        thread.join()
+
+    assert sorted(calls) == [0.25, 0.5]
+    assert results == [f"{source}.0.5.mp4", f"{source}.0.25.mp4"]
+    assert duplicate_result == [f"{source}.0.5.mp4"]
+    assert follower.details["coalesced_with"] == "leader"
+    assert _coalesced() == before + 1
+
+def test_followers_get_the_leaders_error_and_new_content_renders_again(tmp_path):
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"video")
+    calls, release = [], threading.Event()
+    render = _render(calls, release)
+
+    before = _coalesced()
+    threads, results = _in_threads(lambda: render(str(source), 0), lambda: render(str(source), 0))
+    while _coalesced() == before:
+        threading.Event().wait(0.01)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert all(isinstance(result, ValueError) for result in results)
+    # The follower raises its own exception, chained to the leader's
+    leader_error, follower_error = sorted(results, key=lambda error: error.__cause__ is not None)
+    assert follower_error is not leader_error and follower_error.__cause__ is leader_error
+    assert follower_error.args == leader_error.args
+
+    key = coalesce.request_key("resize_video", {"video_path": str(source), "scale": 0.5}, lambda path: path)
+    source.write_bytes(b"edited video")
+    assert coalesce.request_key("resize_video", {"video_path": str(source), "scale": 0.5}, lambda path: path) != key
+    # Rewritten in place at the same size: a later modification time is a different request
+    stat = source.stat()
+    key = coalesce.request_key("resize_video", {"video_path": str(source), "scale": 0.5}, lambda path: path)
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert coalesce.request_key("resize_video", {"video_path": str(source), "scale": 0.5}, lambda path: path) != key
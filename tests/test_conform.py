@@ -0,0 +1,52 @@
+import os
+import subprocess
+import time
+from videoEditor_mcp import conform, readers, storage
+from videoEditor_mcp.ffmpeg_utils import ffmpeg_binary
+
+def _wait(path):
+    deadline = time.monotonic() + 60
+    while conform.status(path)["status"] in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return conform.status(path)
+
+def test_long_gop_vfr_source_is_read_from_a_conformed_mezzanine(tmp_path):
+    source = str(tmp_path / "phone.mp4")
+    # One keyframe for 4 s of video that drops from 30 to 15 fps halfway through
+    subprocess.run([ffmpeg_binary(), "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc=size=160x120:rate=30:duration=4",
+                    "-vf", "select='lt(n,60)+not(mod(n,2))'", "-fps_mode", "vfr",
+                    "-c:v", "libx264", "-g", "1000", "-pix_fmt", "yuv420p", source], check=True)
+
+    analysis = conform.analyze(source)
+    assert set(analysis["reasons"]) == {"long_gop", "variable_frame_rate"}
+
+    assert conform.request(source)["status"] in ("queued", "running")
+    record = _wait(source)
+    assert record["status"] == "ready"
+    assert record["analysis"] == analysis
+    mezzanine = record["mezzanine"]
+    assert conform.analyze(mezzanine)["reasons"] == []
+    assert conform.analyze(mezzanine)["max_gop_seconds"] <= conform.GOP_SECONDS + 0.05
+    assert storage.get_manager().file_info(mezzanine)["source"] == source
+
+    with readers.open_video(source) as clip:
+        assert clip.filename == mezzanine
+        assert clip.fps == 30
+        assert storage.get_manager().file_info(mezzanine)["in_use"]
+
+    # An edited source no longer matches its mezzanine
+    os.utime(source, ns=(0, 0))
+    assert conform.status(source)["status"] == "none"
+    with readers.open_video(source) as clip:
+        assert clip.filename == source
+
+def test_edit_friendly_source_is_left_alone(tmp_path):
+    source = str(tmp_path / "camera.mp4")
+    subprocess.run([ffmpeg_binary(), "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc=size=160x120:rate=25:duration=2",
+                    "-c:v", "libx264", "-g", "25", "-pix_fmt", "yuv420p", source], check=True)
+
+    conform.request(source)
+    assert _wait(source)["status"] == "not_needed"
+    assert conform.request(source)["status"] == "not_needed"
+    with readers.open_video(source) as clip:
+        assert clip.filename == source
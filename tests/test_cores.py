@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+import pytest
+from videoEditor_mcp import cores, jobs
+
+def test_split_is_proportional_disjoint_and_covers_every_core():
+    shares = cores.split([1, 3], list(range(16)))
+    assert [len(share) for share in shares] == [4, 12]
+    assert sorted(shares[0] + shares[1]) == list(range(16))
+    assert cores.split([2, 2, 2], list(range(4))) == [[0, 1], [2], [3]]
+    # More renders than cores: one core each, shared
+    assert cores.split([1] * 5, [0, 1]) == [[0], [1], [0], [1], [0]]
+
+def test_allocations_rebalance_as_renders_start_and_finish():
+    allocator = cores.CoreAllocator(list(range(8)), mode="threads")
+    first, second = jobs.Job("first"), jobs.Job("second")
+    a = allocator.add(1, first)
+    assert first.details["cores"] == {"threads": 8, "cores": None}
+    b = allocator.add(3, second)
+    assert (first.details["cores"]["threads"], second.details["cores"]["threads"]) == (2, 6)
+    allocator.remove(a)
+    assert allocator.allocation(b).threads == 8
+    assert second.details["cores"]["threads"] == 8
+
+@pytest.mark.skipif(not hasattr(os, "sched_setaffinity"), reason="no CPU affinity on this platform")
+def test_job_pins_its_running_and_later_processes():
+    job = jobs.Job("pinned")
+    target = [sorted(os.sched_getaffinity(0))[-1]]
+
+    class Handle:
+        def __init__(self):
+            self.proc = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)"])
+
+    running, later = Handle(), Handle()
+    try:
+        job.track_resource(running)
+        job.set_affinity(target)
+        job.track_resource(later)
+        assert os.sched_getaffinity(running.proc.pid) == set(target)
+        assert os.sched_getaffinity(later.proc.pid) == set(target)
+    finally:
+        for handle in (running, later):
+            handle.proc.kill()
+            handle.proc.wait()
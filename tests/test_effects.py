@@ -0,0 +1,48 @@
+import threading
+import numpy as np
+from PIL import Image, ImageFilter
+from videoEditor_mcp import cores, effects
+
+def reference_painting(frame, saturation=1.4, black=0.006):
+    # vfx.Painting's recipe, in float64 throughout
+    image = Image.fromarray(frame).filter(ImageFilter.EDGE_ENHANCE_MORE)
+    edges = np.array(image.convert("L").filter(ImageFilter.FIND_EDGES), dtype=np.float64)
+    painting = saturation * np.array(image, dtype=np.float64) - black * 255 * np.dstack(3 * [edges])
+    return np.clip(painting, 0, 255).astype(np.uint8)
+
+def test_opencv_painting_matches_the_pil_effect():
+    rng = np.random.default_rng(0)
+    # Smooth gradients with sharp-edged blocks, like a real frame
+    y, x = np.mgrid[0:270, 0:480]
+    frame = np.dstack([x * 255 // 480, y * 255 // 270, (x + y) % 256]).astype(np.uint8)
+    for _ in range(20):
+        top, left = rng.integers(0, 240), rng.integers(0, 440)
+        frame[top:top + 30, left:left + 40] = rng.integers(0, 256, 3)
+
+    expected = reference_painting(frame, 1.6, 0.01)
+    single = effects.paint(frame, 1.6, 0.01, threads=1)
+    banded = effects.paint(frame, 1.6, 0.01, threads=4)
+
+    assert np.array_equal(single, banded)
+    diff = np.abs(single.astype(int) - expected)
+    # OpenCV rounds where the float version truncates, and weighs RGB into luma in different fixed point
+    assert diff.mean() < 0.5
+    assert np.mean(diff > 1) < 0.005
+    assert effects.paint(frame, edge_scale=0.5).shape == frame.shape
+
+def test_paint_splits_frames_across_the_renders_share_of_the_cores(monkeypatch):
+    monkeypatch.setattr(cores, "MODE", "threads")
+    monkeypatch.setattr(cores, "allocator", cores.CoreAllocator(list(range(8)), mode="threads"))
+    monkeypatch.setattr(effects, "EFFECT_THREADS", 8)
+    painters = []
+    paint_band = effects._paint_band
+    monkeypatch.setattr(effects, "_paint_band", lambda *args: painters.append(threading.current_thread()) or paint_band(*args))
+    frame = np.zeros((1080, 64, 3), dtype=np.uint8)
+
+    effects.paint(frame)
+    assert len(painters) == 8
+    painters.clear()
+    # Of two renders with equal weights, each splits its frames in four, one band painted by the caller
+    with cores.allocate(1), cores.allocate(1):
+        effects.paint(frame)
+    assert len(painters) == 4 and painters.count(threading.current_thread()) == 1
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+from moviepy import vfx
+from videoEditor_mcp import cores, frame_ring
+
+def test_workers_transform_frames_in_order_like_the_in_process_effects():
+    rng = np.random.default_rng(0)
+    frames = [rng.integers(0, 256, (36, 64, 3), dtype=np.uint8) for _ in range(12)]
+    effects = [vfx.GammaCorrection(gamma=0.7), vfx.InvertColors()]
+    filters = frame_ring.frame_filters(effects)
+
+    expected = []
+    for frame in frames:
+        for apply in filters:
+            frame = apply(frame)
+        expected.append(frame)
+    results = [frame.copy() for frame in frame_ring.map_frames(iter(frames), (36, 64, 3), effects, workers=2)]
+
+    assert len(results) == len(frames)
+    assert all(np.array_equal(result, frame) for result, frame in zip(results, expected))
+
+def test_worker_errors_are_raised_in_the_encoder():
+    frames = [np.zeros((8, 8, 3), dtype=np.uint8)] * 3
+    with pytest.raises(RuntimeError, match="Frame effect failed"):
+        list(frame_ring.map_frames(iter(frames), (8, 8, 3), [vfx.GammaCorrection(gamma="bad")], workers=2))
+
+def test_workers_split_the_renders_cores(monkeypatch):
+    monkeypatch.setattr(cores, "encoder_threads", lambda: 5)
+    assert frame_ring.worker_threads(2) == [3, 2]
+    monkeypatch.setattr(cores, "encoder_threads", lambda: 2)
+    assert frame_ring.worker_threads(3) == [1, 1, 1]
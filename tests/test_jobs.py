@@ -0,0 +1,53 @@
+import time
+import pytest
+from videoEditor_mcp import jobs
+
+def test_cancelled_job_is_reported_distinctly_and_cleans_outputs(tmp_path):
+    partial = tmp_path / "partial.mp4"
+
+    @jobs.track_operation("fake_render")
+    def render():
+        job = jobs.current_job()
+        partial.write_bytes(b"half a video")
+        job.track_output(str(partial))
+        job.cancel("cancelled")
+        # moviepy sees the killed ffmpeg as a broken pipe
+        raise BrokenPipeError("ffmpeg went away")
+
+    job = jobs.create_job()
+    with jobs.bind(job), pytest.raises(jobs.RenderCancelled) as excinfo:
+        render()
+    assert excinfo.value.status_code == 499
+    assert job.status == "cancelled"
+    assert not partial.exists()
+
+def test_time_limit_cancels_running_job(monkeypatch):
+    monkeypatch.setitem(jobs.TIME_LIMITS, "slow_render", 0.05)
+
+    @jobs.track_operation("slow_render")
+    def render():
+        # Same bar moviepy's iter_frames drives
+        for _ in jobs.progress_logger().iter_bar(frame_index=range(100)):
+            time.sleep(0.01)
+
+    job = jobs.create_job()
+    with jobs.bind(job), pytest.raises(jobs.RenderCancelled) as excinfo:
+        render()
+    assert excinfo.value.reason == "timeout"
+    assert job.to_dict()["status"] == "cancelled"
+
+def test_job_id_of_a_running_job_is_not_shared():
+    from fastapi.testclient import TestClient
+    from videoEditor_mcp.main import app
+
+    job = jobs.create_job("shared-id")
+    assert jobs.create_job("shared-id") is job
+    job.start("fake_render")
+    with pytest.raises(jobs.JobIdInUse):
+        jobs.create_job("shared-id")
+    response = TestClient(app).post("/video/save-frame", headers={"X-Job-ID": "shared-id"}, json={"video_path": "in.mp4", "t": 0})
+    assert response.status_code == 409
+    assert not job.cancel_reason
+
+    job.finish()
+    assert jobs.create_job("shared-id") is not job
@@ -1,3 +1,6 @@
+import asyncio
+import subprocess
+import sys
 from fastapi.testclient import TestClient
 from videoEditor_mcp.main import app
 
@@ -7,3 +10,53 @@ def test_read_main():
     response = client.get("/")
     assert response.status_code == 200
     assert response.json() == {"message": "Welcome to Video Generation Service"}
+
+def test_metrics_endpoint():
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert "# TYPE video_operation_duration_seconds histogram" in response.text
+    assert "video_worker_threads_total" in response.text
+
+def test_metrics_are_collected_when_scraped(monkeypatch):
+    from videoEditor_mcp import mcp_server, metrics
+    monkeypatch.setattr(metrics, "_registry", list(metrics._registry))
+    monkeypatch.setattr(metrics, "_collectors", [])
+    scrapes = metrics.Gauge("test_scrapes", "Scrapes seen by a collector.")
+    metrics.add_collector(lambda: scrapes.inc())
+    metrics.add_collector(mcp_server._collect_worker_pool)
+
+    assert "test_scrapes 1.0" in metrics.render()
+    # The MCP server reports its worker pool without any HTTP route running
+    text = client.get("/metrics").text
+    assert "test_scrapes 2.0" in text
+    assert f"video_worker_threads_total {float(mcp_server.WORKER_THREADS)}" in text
+
+def test_servers_start_without_media_libraries():
+    # Run in a fresh interpreter: this test session may already have imported them
+    code = (
+        "import asyncio, sys\n"
+        "import videoEditor_mcp.main\n"
+        "from videoEditor_mcp.mcp_server import mcp\n"
+        "assert asyncio.run(mcp.get_tools())\n"
+        "print(sorted(m for m in ('moviepy', 'cv2', 'PIL') if m in sys.modules))\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
+
+def test_preview_frame_tool_returns_image_content(tmp_path):
+    from fastmcp import Client
+    from videoEditor_mcp import mcp_server
+    from videoEditor_mcp.ffmpeg_utils import ffmpeg_binary
+    source = str(tmp_path / "in.mp4")
+    subprocess.run([ffmpeg_binary(), "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc=size=320x240:rate=10:duration=1",
+                    "-pix_fmt", "yuv420p", source], check=True)
+
+    async def call():
+        async with Client(mcp_server.mcp) as mcp_client:
+            preview = await mcp_client.call_tool("preview_frame", {"video_path": source, "t": 0.5, "max_size": 160})
+            frame = await mcp_client.call_tool("save_frame", {"video_path": source, "t": 0.5})
+            return preview.content, frame.content
+
+    preview, frame = asyncio.run(call())
+    assert (preview[0].type, preview[0].mimeType) == ("image", "image/jpeg")
+    assert frame[0].type == "text" and frame[0].text.endswith(".png")
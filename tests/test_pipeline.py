@@ -0,0 +1,127 @@
+import time
+import numpy as np
+import proglog
+import pytest
+from videoEditor_mcp import metrics, pipeline
+
+class FakeReader:
+    # Frame n is filled with n; counts frames decoded and seeks like FFMPEG_VideoReader
+    fps = 10
+    n_frames = 50
+
+    def __init__(self):
+        self.pos = 0
+        self.decoded = 0
+        self.seeks = 0
+
+    def get_frame_number(self, t):
+        return int(self.fps * t + 0.00001)
+
+    def get_frame(self, t):
+        pos = self.get_frame_number(t) + 1
+        if not self.pos < pos <= self.pos + 100:
+            self.seeks += 1
+            self.pos = pos - 1
+        self.decoded += pos - self.pos
+        self.pos = pos
+        return np.full((2, 2, 3), pos - 1, dtype=np.uint8)
+
+class FakeClip:
+    def __init__(self):
+        self.reader = FakeReader()
+
+    def get_frame(self, t):
+        return self.reader.get_frame(t)
+
+class FakeWriter:
+    def __init__(self, fail_at=None):
+        self.frames = []
+        self.fail_at = fail_at
+
+    def write_frame(self, frame):
+        if len(self.frames) == self.fail_at:
+            raise BrokenPipeError("encoder died")
+        self.frames.append(int(frame[0, 0, 0]))
+
+def test_prefetched_frames_match_direct_reads_in_any_order():
+    clip = FakeClip()
+    reader = clip.reader
+    stalls = pipeline.Stalls()
+    times = [0.0, 0.1, 0.1, 0.2, 0.5, 0.6, 2.0, 0.3, 4.9]
+    with pipeline.prefetching([clip], depth=4, stalls=stalls):
+        values = [int(clip.get_frame(t)[0, 0, 0]) for t in times]
+    assert values == [round(t * 10) for t in times]
+    assert clip.reader is reader
+    # Forward jumps read through the prefetched frames, only going back seeks
+    assert reader.seeks == 1
+
+def test_write_frames_keeps_order_and_raises_encoder_errors():
+    clip = FakeClip()
+    clip.duration = 3.0
+    writer = FakeWriter()
+    stalls = pipeline.write_frames(clip, writer, 10, proglog.MuteProgressBarLogger(), sources=[clip], depth=2)
+    assert writer.frames == list(range(30))
+    assert set(stalls.to_dict()) >= {"effects_blocked", "encode_starved"}
+
+    with pytest.raises(BrokenPipeError):
+        pipeline.write_frames(clip, FakeWriter(fail_at=5), 10, proglog.MuteProgressBarLogger(), sources=[clip], depth=2)
+
+def test_stage_times_are_measured_while_the_stages_overlap():
+    # Each stage takes 10ms a frame; overlapped, the render takes about as long as one stage
+    class SlowReader(FakeReader):
+        def get_frame(self, t):
+            with metrics._timed("decode_seconds"):
+                time.sleep(0.01)
+                return super().get_frame(t)
+
+    class SlowClip(FakeClip):
+        duration = 2.0
+
+        def __init__(self):
+            self.reader = SlowReader()
+
+        def get_frame(self, t):
+            time.sleep(0.01)
+            return super().get_frame(t)
+
+    class SlowWriter(FakeWriter):
+        def write_frame(self, frame):
+            with metrics._timed("encode_seconds"):
+                time.sleep(0.01)
+                super().write_frame(frame)
+
+    @metrics.track_operation("test_stages")
+    def render():
+        clip = SlowClip()
+        with metrics.track_render():
+            pipeline.write_frames(clip, SlowWriter(), 10, proglog.MuteProgressBarLogger(), sources=[clip], depth=4)
+        return metrics.current_stats()
+
+    stats = render()
+    for stage in ("decode_seconds", "effect_seconds", "encode_seconds"):
+        assert 0.18 <= getattr(stats, stage) < 0.4, stage
+    # Less than the sum of the stages, which is what subtracting the others from it assumed
+    assert stats.render_seconds < stats.decode_seconds + stats.effect_seconds + stats.encode_seconds
+
+def test_canvas_ring_frames_outlast_the_pipeline():
+    depth = 2
+    canvases = pipeline.CanvasRing((2, 2, 3), fill=255, count=depth + 2)
+    assert all((frame == 255).all() for frame in canvases.frames)
+
+    class CanvasClip:
+        duration = 3.0
+
+        def get_frame(self, t):
+            canvas = canvases.next()
+            canvas[:] = round(t * 10)
+            return canvas
+
+    class SlowWriter(FakeWriter):
+        def write_frame(self, frame):
+            # The effects stage runs ahead until the queue is full
+            time.sleep(0.002)
+            super().write_frame(frame)
+
+    writer = SlowWriter()
+    pipeline.write_frames(CanvasClip(), writer, 10, proglog.MuteProgressBarLogger(), depth=depth)
+    assert writer.frames == list(range(30))
@@ -0,0 +1,63 @@
+import moviepy
+import pytest
+from videoEditor_mcp import jobs
+from videoEditor_mcp.readers import ReaderPool
+
+class FakeReader:
+    fps = 10
+
+    def __init__(self):
+        self.pos = 1
+        self.proc = None
+
+    def get_frame_number(self, t):
+        return int(self.fps * t + 0.00001)
+
+class FakeClip:
+    opened = 0
+
+    def __init__(self, path, target_resolution=None):
+        FakeClip.opened += 1
+        self.reader = FakeReader()
+        self.audio = None
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def pool(monkeypatch, tmp_path):
+    monkeypatch.setattr(moviepy, "VideoFileClip", FakeClip)
+    FakeClip.opened = 0
+    source = tmp_path / "in.mp4"
+    source.write_bytes(b"video")
+    return ReaderPool(size=2, idle_seconds=0), str(source)
+
+def test_returned_reader_is_reused_and_nearest_position_wins(pool):
+    pool, path = pool
+    first, second = pool.acquire(path), pool.acquire(path)
+    first.reader.pos, second.reader.pos = 10, 50
+    pool.release(first)
+    pool.release(second)
+    # Frame 55 is just ahead of the second reader, so it reads forward instead of restarting
+    assert pool.acquire(path, t=5.5) is second
+    assert pool.acquire(path, t=1.5) is first
+    assert FakeClip.opened == 2
+
+def test_cap_closes_least_recently_used(pool):
+    pool, path = pool
+    clips = [pool.acquire(path) for _ in range(3)]
+    for clip in clips:
+        pool.release(clip)
+    assert clips[0].closed and not clips[2].closed
+
+def test_readers_of_cancelled_job_are_not_reused(pool, monkeypatch):
+    pool, path = pool
+    from videoEditor_mcp import readers
+    monkeypatch.setattr(readers, "pool", pool)
+    job = jobs.create_job()
+    with jobs.bind(job):
+        with readers.open_video(path) as clip:
+            job.cancel("cancelled")
+    assert clip.closed
+    assert pool.acquire(path) is not clip
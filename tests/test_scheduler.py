@@ -0,0 +1,74 @@
+import threading
+import time
+import pytest
+from videoEditor_mcp import jobs, scheduler
+from videoEditor_mcp.scheduler import Cost, Scheduler, AdmissionRejected
+
+MB = scheduler.MB
+
+def test_request_that_can_never_fit_is_rejected():
+    pool = Scheduler(memory_budget=100 * MB, cpu_budget=2)
+    with pytest.raises(AdmissionRejected):
+        pool.acquire(Cost(200 * MB, 1))
+    assert pool.running == 0
+
+def test_requests_queue_until_budget_frees():
+    pool = Scheduler(memory_budget=100 * MB, cpu_budget=4)
+    first = pool.acquire(Cost(80 * MB, 1))
+    admitted = threading.Event()
+
+    def second():
+        pool.release(pool.acquire(Cost(50 * MB, 1)))
+        admitted.set()
+
+    thread = threading.Thread(target=second)
+    thread.start()
+    assert not admitted.wait(0.2)
+    assert pool.status()["queued"] == 1
+    pool.release(first)
+    assert admitted.wait(2)
+    thread.join()
+    assert pool.status()["memory_in_use_mb"] == 0
+
+def test_time_limit_counts_from_admission(monkeypatch):
+    monkeypatch.setitem(jobs.TIME_LIMITS, "queued_render", 0.2)
+    pool = Scheduler(memory_budget=100 * MB, cpu_budget=4)
+
+    @jobs.track_operation("queued_render")
+    def render(frames):
+        cost = pool.acquire(Cost(50 * MB, 1), jobs.current_job())
+        try:
+            for _ in jobs.progress_logger().iter_bar(frame_index=range(frames)):
+                time.sleep(0.01)
+        finally:
+            pool.release(cost)
+        return "done"
+
+    # Queued for longer than its limit, then quick enough once admitted
+    first = pool.acquire(Cost(80 * MB, 1))
+    threading.Timer(0.4, pool.release, args=(first,)).start()
+    job = jobs.create_job()
+    with jobs.bind(job):
+        assert render(5) == "done"
+    assert job.status == "succeeded" and not job.cancel_reason
+
+    job = jobs.create_job()
+    with jobs.bind(job), pytest.raises(jobs.RenderCancelled) as excinfo:
+        render(100)
+    assert excinfo.value.reason == "timeout"
+
+def test_estimate_grows_with_resolution_and_inputs(monkeypatch):
+    sizes = {"sd": (640, 360), "uhd": (3840, 2160)}
+    monkeypatch.setattr(scheduler, "probe", lambda path: scheduler.MediaInfo(*sizes[path], 10.0, 30.0))
+    sd = scheduler.estimate_cost("cut_video", {}, ["sd"])
+    uhd = scheduler.estimate_cost("cut_video", {}, ["uhd"])
+    stacked = scheduler.estimate_cost("composite_videos", {"method": "stack"}, ["uhd"] * 4)
+    assert sd.memory < uhd.memory < stacked.memory
+    assert sd.cpu < uhd.cpu
+
+def test_preview_gif_is_costed_by_the_frames_it_keeps(monkeypatch):
+    monkeypatch.setattr(scheduler, "probe", lambda path: scheduler.MediaInfo(1920, 1080, 3600.0, 30.0))
+    short = scheduler.estimate_cost("preview_gif", {"max_size": 320, "max_duration": 10.0, "max_frames": 150}, ["hd"])
+    whole = scheduler.estimate_cost("preview_gif", {"max_size": 320, "max_duration": None, "max_frames": None}, ["hd"])
+    assert short.cpu == 1
+    assert short.memory < scheduler.estimate_cost("cut_video", {}, ["hd"]).memory < whole.memory
@@ -0,0 +1,73 @@
+import subprocess
+import threading
+import numpy as np
+import pytest
+from videoEditor_mcp import jobs, smart_render, video_utils
+from videoEditor_mcp.ffmpeg_utils import ffmpeg_binary, run_ffmpeg
+
+def _frames(path):
+    raw = run_ffmpeg(["-i", path, "-vf", "scale=80:60", "-pix_fmt", "gray", "-f", "rawvideo", "-"])
+    return np.frombuffer(raw, np.uint8).reshape(-1, 60, 80).astype(int)
+
+# edit -> (run, seconds re-encoded, frames inserted, source frames left untouched)
+EDITS = {
+    "fade_out": (lambda source, output: video_utils.process_fade_video(source, "out", 0.5, output), 1.0, 0, range(125)),
+    "freeze": (lambda source, output: video_utils.process_time_effect_video(source, "freeze", 0.4, output), 0.4, 10, range(150)),
+    "timed_text": (lambda source, output: video_utils.process_text_overlay(source, "Hi", 40, duration=1.0, start_time=2.2, output_path=output),
+                   2.0, 0, [*range(50), *range(100, 150)]),
+}
+
+@pytest.mark.parametrize("edit", EDITS)
+def test_smart_render_matches_a_full_render(tmp_path, monkeypatch, edit):
+    source = str(tmp_path / "source.mp4")
+    # 6 s at 25 fps in 1 s GOPs
+    subprocess.run([ffmpeg_binary(), "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc2=size=320x240:rate=25:duration=6",
+                    "-f", "lavfi", "-i", "sine=duration=6", "-c:v", "libx264", "-g", "25", "-pix_fmt", "yuv420p",
+                    "-c:a", "aac", "-shortest", source], check=True)
+    run, rendered, inserted, untouched = EDITS[edit]
+
+    job = jobs.Job(edit)
+    with jobs.bind(job):
+        smart = run(source, str(tmp_path / "smart.mp4"))
+    assert job.details["smart_render"]["rendered_seconds"] == pytest.approx(rendered)
+    monkeypatch.setattr(smart_render, "ENABLED", False)
+    full = run(source, str(tmp_path / "full.mp4"))
+
+    smart_frames, full_frames = _frames(smart), _frames(full)
+    assert len(smart_frames) == len(full_frames)
+    # Only encoding noise between the two, frame for frame
+    assert np.abs(smart_frames - full_frames).mean(axis=(1, 2)).max() < 2
+    # The GOPs the edit does not touch are the source's own
+    untouched = np.array(untouched)
+    assert (smart_frames[untouched + inserted] == _frames(source)[untouched]).all()
+
+def test_cut_points_skip_open_gops():
+    # (dts, pts, duration, keyframe) in decode order: the keyframe at pts 5 is followed by
+    # a frame shown before it (open GOP), the one at pts 8 is not
+    packets = [(0, 0, 1, True), (1, 2, 1, False), (2, 1, 1, False), (3, 3, 1, False),
+               (4, 5, 1, True), (5, 4, 1, False), (6, 6, 1, False), (7, 7, 1, False),
+               (8, 8, 1, True), (9, 9, 1, False)]
+    assert smart_render.cut_points(packets) == [0, 8]
+    assert smart_render.plan(packets, 0.5, [(4.2, 4.4)]) == [(0, 8, False), (8, 10, True)]
+
+def test_conformed_source_is_smart_rendered_from_its_mezzanine(tmp_path):
+    from videoEditor_mcp import conform
+    source = str(tmp_path / "phone.mp4")
+    # One keyframe for 4 s of video that drops from 30 to 15 fps halfway: never smart-rendered itself
+    subprocess.run([ffmpeg_binary(), "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc2=size=160x120:rate=30:duration=4",
+                    "-vf", "select='lt(n,60)+not(mod(n,2))'", "-fps_mode", "vfr",
+                    "-c:v", "libx264", "-g", "1000", "-pix_fmt", "yuv420p", source], check=True)
+    conform.request(source)
+    while conform.status(source)["status"] in ("queued", "running"):
+        threading.Event().wait(0.05)
+    mezzanine = conform.status(source)["mezzanine"]
+
+    job = jobs.Job("fade")
+    with jobs.bind(job):
+        output = video_utils.process_fade_video(source, "out", 0.5, str(tmp_path / "out.mp4"))
+    # Whole 0.5 s GOPs of the mezzanine around the fade, not a fallback to a full render
+    assert 0.5 <= job.details["smart_render"]["rendered_seconds"] <= 1.0
+    # The copied GOPs are the mezzanine's, the ones the clip was decoded from
+    output_frames, mezzanine_frames = _frames(output), _frames(mezzanine)
+    assert len(output_frames) == len(mezzanine_frames)
+    assert (output_frames[:90] == mezzanine_frames[:90]).all()
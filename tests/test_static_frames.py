@@ -0,0 +1,51 @@
+import numpy as np
+from moviepy import ColorClip, VideoClip, concatenate_videoclips
+from videoEditor_mcp import jobs, static_frames, video_utils
+from videoEditor_mcp.ffmpeg_utils import run_ffmpeg
+
+def _levels(path, fps):
+    # Mean gray level of every frame, resampled at a constant rate
+    raw = run_ffmpeg(["-i", path, "-vf", f"fps={fps}", "-f", "rawvideo", "-pix_fmt", "gray", "-"])
+    return np.frombuffer(raw, np.uint8).reshape(-1, 48 * 64).mean(axis=1)
+
+def test_static_runs_are_encoded_once_at_their_original_times(tmp_path, monkeypatch):
+    monkeypatch.setattr(static_frames, "ENABLED", True)
+    size = (64, 48)
+    # 1 s still, 10 frames of motion, 1 s still
+    moving = VideoClip(lambda t: np.full((48, 64, 3), 60 + int(round(t * 10)) * 10, np.uint8), duration=1)
+    clip = concatenate_videoclips([ColorClip(size, (0, 0, 0), duration=1), moving,
+                                   ColorClip(size, (255, 255, 255), duration=1)]).with_fps(10)
+    output = str(tmp_path / "out.mp4")
+
+    job = jobs.Job("static")
+    with jobs.bind(job):
+        video_utils.write_video(clip, output, fps=10)
+
+    # First frame of each still, the 10 moving frames and the very last frame
+    assert job.details["static_frames"] == {"frames": 30, "encoded": 13}
+    lines = run_ffmpeg(["-i", output, "-c", "copy", "-f", "framecrc", "-"]).decode().splitlines()
+    ticks = int(next(line for line in lines if line.startswith("#tb 0:")).split("/")[1]) // 10
+    assert sorted(int(line.split(",")[2]) // ticks for line in lines if not line.startswith("#")) == [0, *range(10, 21), 29]
+    levels = _levels(output, 10)
+    assert len(levels) == 30
+    assert (levels[:10] < 20).all() and (levels[20:] > 235).all()
+    assert np.allclose(levels[10:20], [clip.get_frame(i / 10).mean() for i in range(10, 20)], atol=6)
+
+def test_near_duplicates_within_tolerance_are_dropped():
+    written = []
+
+    class Writer:
+        def write_frame(self, frame):
+            written.append(frame)
+
+    writer = static_frames.DedupWriter(Writer(), tolerance=2)
+    base = np.full((36, 64, 3), 100, np.uint8)
+    noisy = base.copy()
+    noisy[0, 0] = 101
+    cursor = base.copy()
+    cursor[10:14, 20:24] = 255
+    for frame in (base, noisy, base, cursor, cursor):
+        writer.write_frame(frame)
+    writer.flush()
+    assert writer.indices == [0, 3, 4]
+    assert static_frames.timestamp_expression([0, 3, 4], 10) == "st(0,TS*TB*10);TS+(2*gte(ld(0),0.5))/(TB*10)"
@@ -0,0 +1,34 @@
+import os
+import time
+from videoEditor_mcp.storage import StorageManager
+
+def _output(directory, name, size):
+    path = directory / name
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+def test_quota_evicts_least_recently_used_but_not_pinned_or_in_use(tmp_path):
+    manager = StorageManager(tmp_path, quota_bytes=250)
+    oldest, pinned, busy, newest = (_output(tmp_path, f"{n}.mp4", 100) for n in ("a", "b", "c", "d"))
+    for path in (oldest, pinned, busy, newest):
+        manager.register(path, "cut_video")
+        time.sleep(0.01)
+    manager.set_retention(pinned, pinned=True)
+    manager.acquire([busy])
+
+    deleted = manager.sweep()
+
+    assert deleted == [oldest, newest]
+    assert not os.path.exists(oldest) and os.path.exists(pinned) and os.path.exists(busy)
+    assert manager.usage()["bytes"] == 200
+
+def test_expired_outputs_are_deleted_and_unmanaged_files_kept(tmp_path):
+    manager = StorageManager(tmp_path, default_ttl=60)
+    upload = _output(tmp_path, "upload.mp4", 10)
+    stale = _output(tmp_path, "stale.mp4", 10)
+    manager.register(stale, "resize_video", upload)
+    manager.set_retention(stale, ttl_seconds=0.01)
+    time.sleep(0.05)
+
+    assert manager.sweep() == [stale]
+    assert os.path.exists(upload)
@@ -0,0 +1,18 @@
+from videoEditor_mcp import timeline
+
+def _plan(doc):
+    loaded = timeline.load(doc, resolve=lambda path: path)
+    return timeline.plan(loaded, source_duration=lambda path: 10.0, fingerprint=lambda path: path)
+
+def test_overlays_are_split_per_segment_and_only_touched_keys_change():
+    doc = {
+        "clips": [{"source": "a.mp4", "end": 4}, {"source": "b.mp4", "effects": [{"type": "speed", "value": 2}]}, {"source": "c.mp4", "end": 3}],
+        "overlay_tracks": [[{"start": 3, "duration": 2, "text": "Caption"}]],
+    }
+    before = _plan(doc)
+    assert [(s.start, s.duration) for s in before] == [(0.0, 4.0), (4.0, 5.0), (9.0, 3.0)]
+    assert [[(o.start, o.duration) for _, o in s.overlays] for s in before] == [[(3.0, 1.0)], [(0.0, 1.0)], []]
+
+    doc["overlay_tracks"][0][0]["text"] = "Edited caption"
+    after = _plan(doc)
+    assert [b.key != a.key for b, a in zip(before, after)] == [True, True, False]
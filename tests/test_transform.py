@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+from videoEditor_mcp import pipeline, transform
+
+@pytest.fixture
+def frame():
+    return np.random.default_rng(0).integers(0, 256, (90, 160, 3), dtype=np.uint8)
+
+def test_whole_pixel_chain_is_lossless(frame):
+    steps = [
+        {"type": "crop", "x1": 10, "y1": 5, "width": 100, "height": 60},
+        {"type": "mirror", "axis": "x"},
+        {"type": "rotate", "angle": 90},
+        {"type": "margin", "margin": 4, "color": [255, 0, 0]},
+    ]
+    plan = transform.compose(steps, (160, 90))
+
+    expected = np.rot90(frame[5:65, 10:110][:, ::-1])
+    expected = cv2.copyMakeBorder(expected, 4, 4, 4, 4, cv2.BORDER_CONSTANT, value=(255, 0, 0))
+    assert plan.size == (68, 108)
+    assert plan.interpolation == cv2.INTER_NEAREST
+    assert np.array_equal(plan.apply(frame), expected)
+
+def test_chained_resizes_resample_once(frame):
+    plan = transform.compose([{"type": "resize", "scale": 0.5}, {"type": "resize", "width": 40}], (160, 90))
+    assert plan.size == (40, 22)
+    assert plan.maps is None
+    assert np.array_equal(plan.apply(frame), cv2.resize(frame, (40, 22), interpolation=cv2.INTER_AREA))
+
+def test_rotation_expands_like_pil_and_fills_each_step_with_its_color(frame):
+    plan = transform.compose([{"type": "rotate", "angle": 30}, {"type": "margin", "margin": 2, "color": [0, 255, 0]}], (160, 90))
+    rotated = Image.fromarray(frame).rotate(30, expand=True, resample=Image.BILINEAR)
+    assert plan.size == (rotated.width + 4, rotated.height + 4)
+
+    out = plan.apply(frame)
+    assert out[0, 0].tolist() == [0, 255, 0]
+    assert out[2, 2].tolist() == [0, 0, 0]
+    diff = np.abs(out[2:-2, 2:-2].astype(int) - np.array(rotated))[10:-10, 10:-10]
+    assert diff.mean() < 2
+
+def test_invalid_steps_are_rejected():
+    with pytest.raises(ValueError, match="Unknown transform step"):
+        transform.compose([{"type": "shear"}], (160, 90))
+    with pytest.raises(ValueError, match="Crop region is empty"):
+        transform.compose([{"type": "crop", "x1": 200}], (160, 90))
+
+def test_apply_draws_into_a_ring_of_preallocated_frames(frame):
+    plan = transform.compose([{"type": "rotate", "angle": 30}, {"type": "margin", "margin": 2, "color": [0, 255, 0]}], (160, 90))
+    count = pipeline.PIPELINE_DEPTH + 2
+    outputs = [plan.apply(frame) for _ in range(2 * count)]
+    # Consecutive frames are distinct buffers, reused in turn rather than allocated per call
+    assert len({id(out) for out in outputs}) == count
+    assert all(not np.shares_memory(a, b) for a, b in zip(outputs, outputs[1:]))
+    assert all(a is b for a, b in zip(outputs, outputs[count:]))
+    assert all(np.array_equal(out, outputs[0]) for out in outputs)
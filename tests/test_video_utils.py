@@ -0,0 +1,164 @@
+import io
+import os
+import subprocess
+import pytest
+from PIL import Image
+from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+from videoEditor_mcp import storage, video_utils
+from videoEditor_mcp.ffmpeg_utils import ffmpeg_binary
+from videoEditor_mcp.video_utils import grid_layout
+
+def test_grid_layout_defaults_to_square_grid():
+    size, tiles = grid_layout([(1920, 1080)] * 16, size=(1920, 1080))
+    assert size == (1920, 1080)
+    assert [tile_size for tile_size, _ in tiles] == [(480, 270)] * 16
+    assert tiles[5][1] == (480, 270)
+
+def test_grid_layout_fits_and_centers_tiles():
+    size, tiles = grid_layout([(640, 480), (1280, 720)], rows=1, cols=2, size=(1281, 481))
+    assert size == (1280, 480)
+    assert tiles[0] == ((640, 480), (0, 0))
+    assert tiles[1] == ((640, 360), (640, 60))
+
+def test_grid_layout_rejects_too_small_grid():
+    with pytest.raises(ValueError):
+        grid_layout([(640, 480)] * 5, rows=2, cols=2)
+
+def test_still_title_card_has_exact_duration_and_is_cached(tmp_path):
+    first = video_utils.generate_simple_video("Title", 600, str(tmp_path / "first.mp4"))
+    infos = ffmpeg_parse_infos(first)
+    assert infos["duration"] == pytest.approx(600, abs=0.1)
+    assert infos["video_size"] == [640, 480]
+
+    cards = list((tmp_path / video_utils.TITLE_CARD_CACHE_DIR).iterdir())
+    second = video_utils.generate_simple_video("Title", 600, str(tmp_path / "second.mp4"))
+    assert list((tmp_path / video_utils.TITLE_CARD_CACHE_DIR).iterdir()) == cards
+    assert open(first, "rb").read() == open(second, "rb").read()
+
+def test_export_ladder_packages_hls_without_upscaling(tmp_path):
+    source = video_utils.generate_simple_video("Ladder", 2, str(tmp_path / "source.mp4"))
+    output_dir = video_utils.process_export_ladder(source, segment_duration=1)
+
+    master = open(f"{output_dir}/master.m3u8").read()
+    assert "RESOLUTION=640x480" in master and "RESOLUTION=480x360" in master
+    assert "1080p" not in master and "720p" not in master
+    assert any(name.endswith(".ts") for name in os.listdir(f"{output_dir}/360p"))
+
+def test_waveform_peaks_are_cached_and_served_per_zoom_level(tmp_path):
+    from videoEditor_mcp import audio_analysis
+    source = tmp_path / "tone.wav"
+    subprocess.run([ffmpeg_binary(), "-v", "error", "-f", "lavfi", "-i", "sine=frequency=440:duration=30", str(source)], check=True)
+
+    overview = video_utils.process_waveform_peaks(str(source), max_points=500)
+    assert len(overview["min"]) <= 500 and overview["peaks_per_second"] < 100
+    assert overview["duration"] == pytest.approx(30, abs=0.01)
+    assert len(list((tmp_path / audio_analysis.PEAKS_CACHE_DIR).iterdir())) == 1
+    cached = str(next((tmp_path / audio_analysis.PEAKS_CACHE_DIR).iterdir()))
+    assert storage.get_manager().file_info(cached)["operation"] == "waveform"
+
+    detail = video_utils.process_waveform_peaks(str(source), start=10, end=11)
+    assert detail["peaks_per_second"] == 100 and len(detail["max"]) == 100
+    # lavfi's sine source has an amplitude of 1/8
+    assert max(detail["max"]) == pytest.approx(0.125, abs=0.01)
+    assert max(detail["rms"]) == pytest.approx(0.125 / 2 ** 0.5, abs=0.01)
+
+    # Rewritten in place with the same size, even within one timestamp tick: the cache misses
+    stat = source.stat()
+    with open(source, "r+b") as f:
+        f.seek(stat.st_size // 2)
+        byte = f.read(1)
+        f.seek(stat.st_size // 2)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    video_utils.process_waveform_peaks(str(source), max_points=500)
+    assert len(list((tmp_path / audio_analysis.PEAKS_CACHE_DIR).iterdir())) == 2
+
+def test_silences_are_detected_and_trimmed_in_one_render(tmp_path):
+    source = tmp_path / "talk.mp4"
+    # Tone with silence at 2-4s and from 7s to the end
+    tone = "aevalsrc='if(between(t,2,4)+gte(t,7),0,0.5*sin(2*PI*440*t))':s=44100:d=10"
+    subprocess.run([
+        ffmpeg_binary(), "-v", "error", "-f", "lavfi", "-i", "color=size=64x64:rate=10:duration=10",
+        "-f", "lavfi", "-i", tone, "-c:v", "libx264", "-c:a", "aac", "-shortest", str(source),
+    ], check=True)
+
+    silences = video_utils.process_detect_silence(str(source))
+    assert [start for start, _ in silences] == pytest.approx([2.0, 7.0], abs=0.06)
+    assert silences[0][1] == pytest.approx(4.0, abs=0.06)
+
+    output = video_utils.process_trim_silence(str(source), padding=0.1)
+    # 0-2.1s and 3.9-7s are kept
+    assert ffmpeg_parse_infos(output)["duration"] == pytest.approx(5.2, abs=0.15)
+
+def test_timeline_rerender_reuses_unchanged_segments(tmp_path):
+    from videoEditor_mcp import jobs
+    for name, color in (("red.mp4", "red"), ("blue.mp4", "blue")):
+        subprocess.run([ffmpeg_binary(), "-v", "error", "-f", "lavfi", "-i", f"color={color}:size=160x120:rate=10:duration=1",
+                        "-c:v", "libx264", str(tmp_path / name)], check=True)
+    doc = {
+        "width": 160, "height": 120, "fps": 10,
+        "clips": [{"source": "red.mp4"}, {"source": "blue.mp4"}],
+        "overlay_tracks": [[{"start": 1.2, "duration": 0.5, "text": "Hi", "fontsize": 20}]],
+    }
+
+    def render():
+        job = jobs.create_job()
+        with jobs.bind(job):
+            output = video_utils.process_render_timeline(doc, str(tmp_path / "out.mp4"))
+        return output, job.details["timeline"]
+
+    output, first = render()
+    assert first == {"segments": 2, "rendered": 2, "cached": 0}
+    assert ffmpeg_parse_infos(output)["duration"] == pytest.approx(2.0, abs=0.1)
+
+    doc["overlay_tracks"][0][0]["text"] = "Bye"
+    _, second = render()
+    assert second == {"segments": 2, "rendered": 1, "cached": 1}
+
+def test_preview_frame_is_encoded_in_memory_and_spills_over_the_cap(tmp_path):
+    source = str(tmp_path / "in.mp4")
+    subprocess.run([ffmpeg_binary(), "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc=size=640x360:rate=10:duration=1",
+                    "-pix_fmt", "yuv420p", source], check=True)
+
+    data = video_utils.process_preview_frame(source, 0.5, max_size=320, format="webp", quality=60)
+    image = Image.open(io.BytesIO(data))
+    assert (image.format, image.size) == ("WEBP", (320, 180))
+    assert [name for name in os.listdir(tmp_path) if not name.startswith(".")] == ["in.mp4"]
+
+    path = video_utils.process_preview_frame(source, 0.5, max_size=None, format="png", max_bytes=100)
+    assert Image.open(path).size == (640, 360)
+    assert storage.get_manager().file_info(path)["operation"] == "preview_frame"
+    with pytest.raises(ValueError):
+        video_utils.process_preview_frame(source, 0.5, format="bmp")
+
+def test_preview_gif_is_bounded_in_duration_and_frames(tmp_path):
+    source = str(tmp_path / "in.mp4")
+    subprocess.run([ffmpeg_binary(), "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc=size=320x180:rate=25:duration=6",
+                    "-pix_fmt", "yuv420p", source], check=True)
+
+    # The default frame rate is capped, and only max_duration seconds are read
+    image = Image.open(io.BytesIO(video_utils.process_preview_gif(source, max_size=160, max_duration=2)))
+    assert (image.format, image.size, image.n_frames, image.info["duration"]) == ("GIF", (160, 90), 20, 100)
+    image = Image.open(io.BytesIO(video_utils.process_preview_gif(source, fps=5, max_size=160, max_frames=7)))
+    assert image.n_frames == 7
+    with pytest.raises(ValueError):
+        video_utils.process_preview_gif(source, max_duration=0)
+
+def test_black_borders_are_detected_and_cropped(tmp_path):
+    source = str(tmp_path / "letterboxed.mp4")
+    # A 1040x500 picture inside black borders (window-boxed) in a 1280x720 frame, with a dark scene in between
+    subprocess.run([ffmpeg_binary(), "-v", "error", "-y", "-f", "lavfi", "-i", "testsrc2=size=1040x500:rate=10:duration=4",
+                    "-vf", "eq=brightness='if(between(t,1,2),-0.8,0)':eval=frame,pad=1280:720:120:110",
+                    "-c:v", "libx264", "-pix_fmt", "yuv420p", source], check=True)
+
+    rectangle = video_utils.process_detect_crop(source, samples=8)
+    assert rectangle["cropped"] and (rectangle["source_width"], rectangle["source_height"]) == (1280, 720)
+    # Never into the border, at most a sampled line (2 px here) into the picture
+    assert 120 <= rectangle["x1"] <= 124 and 1156 <= rectangle["x2"] <= 1160
+    assert 110 <= rectangle["y1"] <= 114 and 606 <= rectangle["y2"] <= 610
+    assert rectangle["width"] % 2 == 0 and rectangle["height"] % 2 == 0
+
+    output = video_utils.process_crop_video(source, auto_crop=True)
+    assert ffmpeg_parse_infos(output)["video_size"] == [rectangle["width"], rectangle["height"]]
+    with pytest.raises(ValueError):
+        video_utils.process_crop_video(source, x1=10, auto_crop=True)